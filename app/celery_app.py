@@ -1,6 +1,10 @@
+import logging
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_process_init
 from config import settings
 
+logger = logging.getLogger(__name__)
+
 celery_app = Celery(
     "test_platform",
     broker=settings.CELERY_BROKER_URL,
@@ -26,3 +30,41 @@ celery_app.conf.update(
 # 自动发现任务（可选，但更可靠）
 celery_app.autodiscover_tasks(['app'])
 
+# 定时任务（需要运行 celery beat）
+if settings.REPORT_BLOB_SWEEP_INTERVAL_HOURS > 0:
+    celery_app.conf.beat_schedule = {
+        "sweep-report-blobs": {
+            "task": "app.tasks.sweep_report_blobs_task",
+            "schedule": settings.REPORT_BLOB_SWEEP_INTERVAL_HOURS * 3600,
+        },
+    }
+
+
+
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    """prefork 子进程启动时丢弃从父进程继承的数据库连接池"""
+    from app.database import dispose_engine_after_fork
+    dispose_engine_after_fork()
+
+
+# 正在执行的任务的数据库统计上下文（task_id -> contextvar token）
+_task_query_stats = {}
+
+
+@task_prerun.connect
+def start_task_query_stats(task_id=None, **kwargs):
+    from app.database import start_query_stats
+    _, token = start_query_stats()
+    _task_query_stats[task_id] = token
+
+
+@task_postrun.connect
+def finish_task_query_stats(task_id=None, task=None, **kwargs):
+    from app.database import finish_query_stats
+    token = _task_query_stats.pop(task_id, None)
+    if token is None:
+        return
+    stats = finish_query_stats(token, f"Task {task.name}[{task_id}]")
+    if stats.queries:
+        logger.info(f"[DB] Task {task.name}[{task_id}] database usage: {stats.to_dict()}")
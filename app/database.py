@@ -1,19 +1,175 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from contextvars import ContextVar, Token
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.services.latency_histogram import LatencyHistogram
 from config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=settings.DATABASE_ECHO,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-)
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """一个请求或一个 Celery 任务内的数据库访问统计"""
+
+    __slots__ = ("queries", "query_time", "checkouts", "checkout_wait")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0  # 毫秒
+        self.checkouts = 0
+        self.checkout_wait = 0.0  # 毫秒
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "queries": self.queries,
+            "query_time_ms": round(self.query_time, 1),
+            "checkouts": self.checkouts,
+            "checkout_wait_ms": round(self.checkout_wait, 1),
+        }
+
+
+class DBMetrics:
+    """进程级的数据库指标：连接池取连接的等待时间、SQL 耗时、慢查询和取连接超时次数"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """清空指标（fork 后在子进程中调用，同时重建可能被父进程其他线程持有的锁）"""
+        self._lock = threading.Lock()
+        self.checkout_wait = LatencyHistogram()
+        self.query_time = LatencyHistogram()
+        self.slow_queries = 0
+        self.checkout_timeouts = 0
+
+    def record_checkout(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkout_wait.record(wait_ms)
+
+    def record_checkout_timeout(self) -> None:
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def record_query(self, elapsed_ms: float, slow: bool) -> None:
+        with self._lock:
+            self.query_time.record(elapsed_ms)
+            if slow:
+                self.slow_queries += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkout_wait.count,
+                "checkout_wait_ms": _histogram_summary(self.checkout_wait),
+                "checkout_timeouts": self.checkout_timeouts,
+                "queries": self.query_time.count,
+                "query_time_ms": _histogram_summary(self.query_time),
+                "slow_queries": self.slow_queries,
+            }
+
+
+db_metrics = DBMetrics()
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("db_query_stats", default=None)
+
+
+class _TimedCheckoutMixin:
+    """统计从连接池取连接的等待时间（池耗尽时在此阻塞，直到有连接归还或超时）"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            db_metrics.record_checkout_timeout()
+            logger.warning(f"[DB] Connection pool exhausted: {self.status()}")
+            raise
+        wait_ms = (time.perf_counter() - start) * 1000
+        db_metrics.record_checkout(wait_ms)
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.checkouts += 1
+            stats.checkout_wait += wait_ms
+        return connection
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _engine_options(url: str, poolclass) -> Dict[str, Any]:
+    options = {
+        "echo": settings.DATABASE_ECHO,
+        "pool_pre_ping": True,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    # SQLite 只用于本地测试，沿用方言默认的连接池
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            poolclass=poolclass,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def _instrument(sync_engine: Engine) -> None:
+    """记录每条 SQL 的耗时，累加到进程指标和当前请求/任务的统计中"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        slow = elapsed_ms >= settings.DB_SLOW_QUERY_MS
+        db_metrics.record_query(elapsed_ms, slow)
+        if slow:
+            logger.warning(f"[DB] Slow query ({elapsed_ms:.0f}ms): {statement[:500]}")
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_time += elapsed_ms
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_start"):
+            context.connection.info["query_start"].pop()
+
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL, TimedQueuePool))
+_instrument(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步会话：提交后不过期对象，便于在响应序列化时访问属性而不触发隐式 IO
+AsyncSessionLocal = async_sessionmaker(class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# 同步驱动对应的异步驱动
+ASYNC_DRIVERS = {
+    "mssql": "mssql+aioodbc",
+    "mssql+pyodbc": "mssql+aioodbc",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
 Base = declarative_base()
 
+_async_engine: Optional[AsyncEngine] = None
+
 
 def get_db():
     """Dependency for getting database session"""
@@ -23,3 +179,91 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependency for getting async database session（用于 async def 接口，不占用线程池）"""
+    async with AsyncSessionLocal(bind=get_async_engine()) as db:
+        yield db
+
+
+def get_async_engine() -> AsyncEngine:
+    """获取异步引擎，首次调用时创建（异步驱动只在使用异步接口时才需要安装）"""
+    global _async_engine
+    if _async_engine is None:
+        url = async_database_url()
+        _async_engine = create_async_engine(url, **_engine_options(url, TimedAsyncAdaptedQueuePool))
+        _instrument(_async_engine.sync_engine)
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+
+
+def dispose_engine_after_fork() -> None:
+    """
+    在 fork 出的子进程中调用：丢弃从父进程继承的连接池，子进程按需建立自己的连接
+
+    close=False 不关闭继承来的连接（这些 socket 仍由父进程使用），只让子进程不再复用它们
+    """
+    engine.dispose(close=False)
+    db_metrics.reset()
+
+
+def async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    if url.drivername not in ASYNC_DRIVERS:
+        raise RuntimeError(
+            f"No async driver known for {url.drivername}, set ASYNC_DATABASE_URL explicitly"
+        )
+    return url.set(drivername=ASYNC_DRIVERS[url.drivername]).render_as_string(hide_password=False)
+
+
+def start_query_stats() -> Tuple[QueryStats, Token]:
+    """开始统计当前请求/任务的数据库访问（同一上下文中派生的线程池调用也会计入）"""
+    stats = QueryStats()
+    return stats, _current_stats.set(stats)
+
+
+def finish_query_stats(token: Token, label: str) -> QueryStats:
+    """结束统计，SQL 数过多时记录警告日志"""
+    stats = _current_stats.get()
+    _current_stats.reset(token)
+    if stats.queries > settings.DB_QUERY_COUNT_WARN:
+        logger.warning(f"[DB] {label} issued {stats.queries} queries ({stats.query_time:.0f}ms)")
+    return stats
+
+
+def pool_status() -> Dict[str, Any]:
+    """连接池当前状态和进程级数据库指标"""
+    pools = {"sync": _pool_counts(engine)}
+    if _async_engine is not None:
+        pools["async"] = _pool_counts(_async_engine.sync_engine)
+    return {"pools": pools, **db_metrics.snapshot()}
+
+
+def _pool_counts(sync_engine: Engine) -> Dict[str, Any]:
+    pool = sync_engine.pool
+    if not isinstance(pool, QueuePool):
+        return {"status": pool.status()}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "timeout": pool.timeout(),
+    }
+
+
+def _histogram_summary(histogram: LatencyHistogram) -> Dict[str, float]:
+    return {
+        "mean": round(histogram.mean, 2),
+        "p50": histogram.percentile(0.5),
+        "p99": histogram.percentile(0.99),
+        "max": histogram.max or 0.0,
+    }
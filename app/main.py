@@ -1,7 +1,7 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from app.database import engine, Base
+from app.database import engine, Base, dispose_async_engine, start_query_stats, finish_query_stats, pool_status
 from app.routers import projects, api_tests, ui_tests, performance_tests, reports, tasks
 from config import settings
 import os
@@ -18,8 +18,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 列表接口的游标分页响应头
 )
 
+
+@app.middleware("http")
+async def record_db_stats(request: Request, call_next):
+    """统计每个请求的 SQL 数、SQL 耗时和取连接的等待时间，写入响应头"""
+    stats, token = start_query_stats()
+    try:
+        response = await call_next(request)
+    finally:
+        finish_query_stats(token, f"{request.method} {request.url.path}")
+    response.headers["X-DB-Queries"] = str(stats.queries)
+    response.headers["X-DB-Time-Ms"] = f"{stats.query_time:.1f}"
+    response.headers["X-DB-Checkout-Wait-Ms"] = f"{stats.checkout_wait:.1f}"
+    return response
+
+
 # 注册路由
 app.include_router(projects.router)
 app.include_router(api_tests.router)
@@ -33,6 +49,11 @@ os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 
+@app.on_event("shutdown")
+async def close_async_engine():
+    await dispose_async_engine()
+
+
 @app.get("/")
 def root():
     return {
@@ -46,3 +67,9 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+
+
+@app.get("/health/db")
+def db_health():
+    """数据库连接池状态和本进程的数据库指标（取连接等待、SQL 耗时、慢查询、取连接超时）"""
+    return pool_status()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Float, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Float, Boolean, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -17,6 +17,7 @@ class Project(Base):
     api_cases = relationship("APITestCase", back_populates="project", cascade="all, delete-orphan")
     api_suites = relationship("APITestSuite", back_populates="project", cascade="all, delete-orphan")
     ui_cases = relationship("UITestCase", back_populates="project", cascade="all, delete-orphan")
+    ui_suites = relationship("UITestSuite", back_populates="project", cascade="all, delete-orphan")
     performance_tests = relationship("PerformanceTest", back_populates="project", cascade="all, delete-orphan")
     reports = relationship("TestReport", back_populates="project", cascade="all, delete-orphan")
 
@@ -39,6 +40,24 @@ class APITestCase(Base):
     # Relationships
     project = relationship("Project", back_populates="api_cases")
     suite_cases = relationship("APITestSuiteCase", back_populates="test_case")
+    datasets = relationship("APITestDataset", back_populates="test_case", cascade="all, delete-orphan")
+
+
+class APITestDataset(Base):
+    """数据驱动执行的数据集：每一行是一组变量，替换用例字段中的 {{变量名}}"""
+    __tablename__ = "api_test_datasets"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    case_id = Column(Integer, ForeignKey("api_test_cases.id"), nullable=False, index=True)
+    name = Column(String(255), nullable=False)
+    format = Column(String(10), nullable=False)  # csv, jsonl
+    file_path = Column(String(500), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    columns = Column(JSON, nullable=True)  # 变量名列表
+    created_at = Column(DateTime, server_default=func.now())
+    
+    # Relationships
+    test_case = relationship("APITestCase", back_populates="datasets")
 
 
 class APITestSuite(Base):
@@ -47,12 +66,18 @@ class APITestSuite(Base):
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     name = Column(String(255), nullable=False)
+    sequential = Column(Boolean, default=False, nullable=False)  # 用例间有依赖时按顺序串行执行
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
     
     # Relationships
     project = relationship("Project", back_populates="api_suites")
-    suite_cases = relationship("APITestSuiteCase", back_populates="test_suite", cascade="all, delete-orphan")
+    suite_cases = relationship(
+        "APITestSuiteCase",
+        back_populates="test_suite",
+        cascade="all, delete-orphan",
+        order_by="APITestSuiteCase.order"
+    )
 
 
 class APITestSuiteCase(Base):
@@ -60,7 +85,7 @@ class APITestSuiteCase(Base):
     __tablename__ = "api_test_suite_cases"
     
     id = Column(Integer, primary_key=True, index=True)
-    suite_id = Column(Integer, ForeignKey("api_test_suites.id"), nullable=False)
+    suite_id = Column(Integer, ForeignKey("api_test_suites.id"), nullable=False, index=True)
     case_id = Column(Integer, ForeignKey("api_test_cases.id"), nullable=False)
     order = Column(Integer, default=0)  # 执行顺序
     
@@ -81,6 +106,40 @@ class UITestCase(Base):
     
     # Relationships
     project = relationship("Project", back_populates="ui_cases")
+    suite_cases = relationship("UITestSuiteCase", back_populates="test_case")
+
+
+class UITestSuite(Base):
+    __tablename__ = "ui_test_suites"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    name = Column(String(255), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, onupdate=func.now())
+    
+    # Relationships
+    project = relationship("Project", back_populates="ui_suites")
+    suite_cases = relationship(
+        "UITestSuiteCase",
+        back_populates="test_suite",
+        cascade="all, delete-orphan",
+        order_by="UITestSuiteCase.order"
+    )
+
+
+class UITestSuiteCase(Base):
+    """关联表：UI测试套件和UI测试用例的多对多关系"""
+    __tablename__ = "ui_test_suite_cases"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    suite_id = Column(Integer, ForeignKey("ui_test_suites.id"), nullable=False, index=True)
+    case_id = Column(Integer, ForeignKey("ui_test_cases.id"), nullable=False)
+    order = Column(Integer, default=0)  # 执行顺序
+    
+    # Relationships
+    test_suite = relationship("UITestSuite", back_populates="suite_cases")
+    test_case = relationship("UITestCase", back_populates="suite_cases")
 
 
 class PerformanceTest(Base):
@@ -91,6 +150,8 @@ class PerformanceTest(Base):
     name = Column(String(255), nullable=False)
     jmx_file_path = Column(String(500), nullable=True)
     status = Column(String(20), default="ready")  # ready, running, completed, failed
+    abort_error_rate = Column(Float, nullable=True)  # 滚动错误率（%）超过该值时提前终止
+    abort_p99_response_time = Column(Float, nullable=True)  # 滚动p99响应时间（毫秒）超过该值时提前终止
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
     
@@ -100,13 +161,22 @@ class PerformanceTest(Base):
 
 class TestReport(Base):
     __tablename__ = "test_reports"
+    __table_args__ = (
+        # 报告列表按项目/类型筛选并按创建时间倒序分页
+        Index("ix_test_reports_project_type_created", "project_id", "type", "created_at", "id"),
+        Index("ix_test_reports_project_created", "project_id", "created_at", "id"),
+        Index("ix_test_reports_created", "created_at", "id"),
+        # 清理 report_blobs 时检查 blob 是否仍被引用
+        Index("ix_test_reports_result_ref", "result_ref"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
     name = Column(String(255), nullable=False)
     type = Column(String(20), nullable=False)  # api, ui, performance
     task_id = Column(String(255), nullable=True)  # Celery任务ID
-    result_data = Column(JSON, nullable=True)  # 详细的测试结果
+    result_data = Column(JSON, nullable=True)  # 详细的测试结果（较大时只保留摘要，完整内容见 result_ref）
+    result_ref = Column(String(64), nullable=True)  # 完整结果在 report_blobs 中的 SHA-256
     pass_rate = Column(Float, nullable=True)  # 通过率
     start_time = Column(DateTime, nullable=True)
     duration = Column(Float, nullable=True)  # 耗时（秒）
@@ -114,4 +184,73 @@ class TestReport(Base):
     
     # Relationships
     project = relationship("Project", back_populates="reports")
+    case_results = relationship("TestCaseResult", cascade="all, delete-orphan")
+
+
+class TestCaseResult(Base):
+    """单个用例在一次执行中的结果（从报告中拆出，便于用 SQL 统计用例的失败率和耗时）"""
+    __tablename__ = "test_case_results"
+    __table_args__ = (
+        # 按用例查询历史结果和趋势
+        Index("ix_test_case_results_case_created", "case_type", "case_id", "created_at"),
+        Index("ix_test_case_results_project_created", "project_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    report_id = Column(Integer, ForeignKey("test_reports.id"), nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    case_type = Column(String(20), nullable=False)  # api, ui
+    case_id = Column(Integer, nullable=False)
+    success = Column(Boolean, nullable=False)
+    status_code = Column(Integer, nullable=True)  # API 用例的响应状态码
+    duration = Column(Float, nullable=True)  # 耗时（秒）
+    error = Column(String(500), nullable=True)  # 错误摘要
+    created_at = Column(DateTime, server_default=func.now())
 
+
+class ReportRollup(Base):
+    """按项目、报告类型和小时汇总的报告统计，写入报告时增量更新"""
+    __tablename__ = "report_rollups"
+    __table_args__ = (
+        UniqueConstraint("project_id", "type", "bucket_start", name="uq_report_rollups_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    type = Column(String(20), nullable=False)  # api, ui, performance
+    bucket_start = Column(DateTime, nullable=False)  # 小时起点
+    report_count = Column(Integer, default=0, nullable=False)
+    passed_reports = Column(Integer, default=0, nullable=False)  # 通过率为100%的报告数
+    pass_rate_sum = Column(Float, default=0.0, nullable=False)  # 通过率之和，除以 report_count 为平均通过率
+    duration_histogram = Column(JSON, nullable=True)  # 报告耗时（毫秒）的 LatencyHistogram
+
+
+class CaseRollup(Base):
+    """按用例和天汇总的执行统计，写入用例结果时增量更新"""
+    __tablename__ = "case_rollups"
+    __table_args__ = (
+        UniqueConstraint("case_type", "case_id", "bucket_start", name="uq_case_rollups_bucket"),
+        Index("ix_case_rollups_project_bucket", "project_id", "bucket_start"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    case_type = Column(String(20), nullable=False)  # api, ui
+    case_id = Column(Integer, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)  # 当天零点
+    runs = Column(Integer, default=0, nullable=False)
+    failures = Column(Integer, default=0, nullable=False)
+    flips = Column(Integer, default=0, nullable=False)  # 相邻两次执行结果在成功/失败之间翻转的次数
+    last_success = Column(Boolean, nullable=True)  # 最近一次执行结果
+    duration_histogram = Column(JSON, nullable=True)  # 用例耗时（毫秒）的 LatencyHistogram
+
+
+class ReportBlob(Base):
+    """压缩存储的大报告内容，以未压缩 JSON 的 SHA-256 作为键，相同内容只存一份"""
+    __tablename__ = "report_blobs"
+    
+    digest = Column(String(64), primary_key=True)
+    codec = Column(String(10), nullable=False)  # zstd, zlib
+    size = Column(Integer, nullable=False)  # 未压缩的字节数
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
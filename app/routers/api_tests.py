@@ -1,10 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from celery import group
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+import os
+import uuid
+from app.database import get_db, get_async_db
 from app import models, schemas
-from app.tasks import run_api_case_task, run_api_suite_task
-from app.schemas import TaskStatus
+from app.services.api_case_import import (
+    IMPORT_FORMATS, bulk_create_api_cases, bulk_update_api_cases, parse_import_file
+)
+from app.services.api_dataset import DATASET_FORMATS, inspect_dataset
+from app.services.case_cache import publish_case_invalidation
+from app.services.uploads import save_upload_file
+from app.tasks import run_api_case_task, run_api_case_batch_task, run_api_suite_task, run_api_dataset_task
+from app.schemas import BulkRunStatus, TaskStatus
+from config import settings
 
 router = APIRouter(prefix="/api_tests", tags=["api_tests"])
 
@@ -28,14 +41,61 @@ def create_api_case(case: schemas.APITestCaseCreate, db: Session = Depends(get_d
     return db_case
 
 
+@router.post("/cases/bulk", response_model=schemas.BulkOperationResult, status_code=201)
+def bulk_create_api_cases_endpoint(request: schemas.APITestCaseBulkCreate, db: Session = Depends(get_db)):
+    """批量创建API测试用例，校验失败的行在 errors 中按行号返回，其余行照常创建"""
+    _get_project_or_404(db, request.project_id)
+    return bulk_create_api_cases(db, request.project_id, enumerate(request.cases))
+
+
+@router.put("/cases/bulk", response_model=schemas.BulkOperationResult)
+def bulk_update_api_cases_endpoint(request: schemas.APITestCaseBulkUpdate, db: Session = Depends(get_db)):
+    """批量更新API测试用例，每行必须包含 id，只更新给出的字段"""
+    result = bulk_update_api_cases(db, request.cases)
+    publish_case_invalidation(result.updated_ids)
+    return result
+
+
+@router.post("/cases/import", response_model=schemas.BulkOperationResult, status_code=201)
+def import_api_cases(
+    project_id: int,
+    format: str = Query(..., pattern=f"^({'|'.join(IMPORT_FORMATS)})$"),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    从文件导入API测试用例
+    
+    - ndjson: 每行一个用例 JSON 对象（按行流式读取）
+    - postman: Postman Collection v2.0/v2.1
+    - har: 浏览器导出的 HAR 文件
+    - openapi: OpenAPI 3.x / Swagger 2.0（JSON，安装 PyYAML 后支持 YAML）
+    """
+    _get_project_or_404(db, project_id)
+    try:
+        return bulk_create_api_cases(db, project_id, parse_import_file(file.file, format))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.get("/cases", response_model=List[schemas.APITestCase])
-def get_api_cases(project_id: int = None, db: Session = Depends(get_db)):
-    """获取API测试用例列表"""
-    query = db.query(models.APITestCase)
+async def get_api_cases(
+    response: Response,
+    project_id: int = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取API测试用例列表（按ID升序）
+    
+    指定 limit 时分页返回，还有下一页时响应头 X-Next-Cursor 为下一页的 cursor 参数；
+    不指定时返回全部用例
+    """
+    stmt = select(models.APITestCase)
     if project_id:
-        query = query.filter(models.APITestCase.project_id == project_id)
-    cases = query.all()
-    return cases
+        stmt = stmt.where(models.APITestCase.project_id == project_id)
+    return await _paginate_by_id(db, stmt, models.APITestCase, cursor, limit, response)
 
 
 @router.get("/cases/{case_id}", response_model=schemas.APITestCase)
@@ -64,6 +124,8 @@ def update_api_case(
     
     db.commit()
     db.refresh(case)
+    # 通知 worker 淘汰缓存的旧用例定义
+    publish_case_invalidation([case_id])
     return case
 
 
@@ -76,9 +138,125 @@ def delete_api_case(case_id: int, db: Session = Depends(get_db)):
     
     db.delete(case)
     db.commit()
+    publish_case_invalidation([case_id])
+    return None
+
+
+# ============ API Test Datasets ============
+@router.post("/cases/{case_id}/datasets", response_model=schemas.APITestDataset, status_code=201)
+async def upload_api_dataset(
+    case_id: int,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern=f"^({'|'.join(DATASET_FORMATS)})$"),
+    name: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    上传数据驱动执行的数据集
+    
+    - csv: 第一行为变量名
+    - jsonl: 每行一个 JSON 对象，键为变量名
+    
+    用例的 url、headers、params、body、assertions 中的 {{变量名}} 在执行时替换为每行的值；
+    不指定 format 时按文件扩展名判断
+    """
+    case = await db.scalar(select(models.APITestCase).where(models.APITestCase.id == case_id))
+    if not case:
+        raise HTTPException(status_code=404, detail="API test case not found")
+    
+    dataset_format = format or _dataset_format_from_filename(file.filename or "")
+    if not dataset_format:
+        raise HTTPException(status_code=400, detail="Cannot infer dataset format, specify format=csv|jsonl")
+    
+    file_path = os.path.join(settings.UPLOAD_DIR, "datasets", f"{case_id}_{uuid.uuid4().hex}.{dataset_format}")
+    await save_upload_file(file, file_path)
+    try:
+        # 逐行校验并统计行数和变量名
+        row_count, columns = await run_in_threadpool(inspect_dataset, file_path, dataset_format)
+    except (ValueError, UnicodeDecodeError) as e:
+        os.remove(file_path)
+        raise HTTPException(status_code=400, detail=f"Invalid dataset: {e}")
+    
+    dataset = models.APITestDataset(
+        case_id=case_id,
+        name=name or file.filename or f"dataset.{dataset_format}",
+        format=dataset_format,
+        file_path=file_path,
+        row_count=row_count,
+        columns=columns
+    )
+    db.add(dataset)
+    await db.commit()
+    await db.refresh(dataset)
+    return dataset
+
+
+@router.get("/cases/{case_id}/datasets", response_model=List[schemas.APITestDataset])
+async def get_api_datasets(case_id: int, db: AsyncSession = Depends(get_async_db)):
+    """获取用例的数据集列表"""
+    datasets = await db.scalars(
+        select(models.APITestDataset).where(models.APITestDataset.case_id == case_id).order_by(models.APITestDataset.id)
+    )
+    return datasets.all()
+
+
+@router.delete("/datasets/{dataset_id}", status_code=204)
+def delete_api_dataset(dataset_id: int, db: Session = Depends(get_db)):
+    """删除数据集及其文件"""
+    dataset = db.query(models.APITestDataset).filter(models.APITestDataset.id == dataset_id).first()
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    file_path = dataset.file_path
+    db.delete(dataset)
+    db.commit()
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    return None
+
+
+def _dataset_format_from_filename(filename: str) -> Optional[str]:
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
     return None
 
 
+def _get_project_or_404(db: Session, project_id: int) -> models.Project:
+    project = db.query(models.Project).filter(
+        models.Project.id == project_id,
+        models.Project.is_deleted == False
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+
+async def _paginate_by_id(
+    db: AsyncSession,
+    stmt: Select,
+    model,
+    cursor: Optional[int],
+    limit: Optional[int],
+    response: Response
+) -> list:
+    """按主键的游标分页：cursor 为上一页最后一条记录的ID，还有下一页时设置 X-Next-Cursor"""
+    stmt = stmt.order_by(model.id)
+    if cursor is not None:
+        stmt = stmt.where(model.id > cursor)
+    if limit is None:
+        return (await db.scalars(stmt)).all()
+    
+    # 多取一条用于判断是否还有下一页
+    rows = (await db.scalars(stmt.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return rows
+
+
 # ============ API Test Suite CRUD ============
 @router.post("/suites", response_model=schemas.APITestSuite, status_code=201)
 def create_api_suite(suite: schemas.APITestSuiteCreate, db: Session = Depends(get_db)):
@@ -101,7 +279,8 @@ def create_api_suite(suite: schemas.APITestSuiteCreate, db: Session = Depends(ge
     
     db_suite = models.APITestSuite(
         name=suite.name,
-        project_id=suite.project_id
+        project_id=suite.project_id,
+        sequential=suite.sequential
     )
     db.add(db_suite)
     db.flush()
@@ -125,22 +304,29 @@ def create_api_suite(suite: schemas.APITestSuiteCreate, db: Session = Depends(ge
 
 
 @router.get("/suites", response_model=List[schemas.APITestSuite])
-def get_api_suites(project_id: int = None, db: Session = Depends(get_db)):
-    """获取API测试套件列表"""
-    query = db.query(models.APITestSuite)
+async def get_api_suites(
+    response: Response,
+    project_id: int = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    获取API测试套件列表（按ID升序，分页方式同用例列表）
+    
+    套件的用例关联通过 selectinload 一次 IN 查询批量加载，查询次数与套件数量无关
+    """
+    stmt = select(models.APITestSuite).options(selectinload(models.APITestSuite.suite_cases))
     if project_id:
-        query = query.filter(models.APITestSuite.project_id == project_id)
-    suites = query.all()
+        stmt = stmt.where(models.APITestSuite.project_id == project_id)
+    suites = await _paginate_by_id(db, stmt, models.APITestSuite, cursor, limit, response)
     
     # 填充case_ids
     result = []
     for suite in suites:
-        suite_dict = schemas.APITestSuite.model_validate(suite).model_dump()
-        case_ids = [
-            sc.case_id for sc in sorted(suite.suite_cases, key=lambda x: x.order)
-        ]
-        suite_dict["case_ids"] = case_ids
-        result.append(schemas.APITestSuite(**suite_dict))
+        suite_result = schemas.APITestSuite.model_validate(suite)
+        suite_result.case_ids = [sc.case_id for sc in suite.suite_cases]
+        result.append(suite_result)
     
     return result
 
@@ -153,7 +339,7 @@ def get_api_suite(suite_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="API test suite not found")
     
     result = schemas.APITestSuite.model_validate(suite)
-    case_ids = [sc.case_id for sc in sorted(suite.suite_cases, key=lambda x: x.order)]
+    case_ids = [sc.case_id for sc in suite.suite_cases]
     result.case_ids = case_ids
     return result
 
@@ -175,6 +361,10 @@ def update_api_suite(
     if "name" in update_data:
         suite.name = update_data["name"]
     
+    # 更新执行模式
+    if update_data.get("sequential") is not None:
+        suite.sequential = update_data["sequential"]
+    
     # 更新用例列表
     if "case_ids" in update_data:
         # 删除旧的关联
@@ -195,7 +385,7 @@ def update_api_suite(
     db.refresh(suite)
     
     result = schemas.APITestSuite.model_validate(suite)
-    case_ids = [sc.case_id for sc in sorted(suite.suite_cases, key=lambda x: x.order)]
+    case_ids = [sc.case_id for sc in suite.suite_cases]
     result.case_ids = case_ids
     return result
 
@@ -225,6 +415,51 @@ def run_api_case(case_id: int, db: Session = Depends(get_db)):
     return TaskStatus(task_id=task.id, status="PENDING")
 
 
+@router.post("/run_bulk", response_model=BulkRunStatus)
+def run_api_cases_bulk(request: schemas.APIBulkRunRequest, db: Session = Depends(get_db)):
+    """
+    批量执行API用例（异步）
+    
+    用例按 chunk_size 分组，作为一个 Celery group 提交（每组一条消息、一个任务），
+    每组的测试报告在同一事务中写入；返回的 group_id 用于 GET /tasks/groups/{group_id} 查询整体进度
+    """
+    if request.case_ids is not None:
+        case_ids = list(dict.fromkeys(request.case_ids))
+    elif request.project_id is not None:
+        query = db.query(models.APITestCase.id).filter(models.APITestCase.project_id == request.project_id)
+        if request.method:
+            query = query.filter(models.APITestCase.method == request.method.upper())
+        if request.name_contains:
+            query = query.filter(models.APITestCase.name.contains(request.name_contains))
+        case_ids = [case_id for (case_id,) in query.order_by(models.APITestCase.id).limit(
+            settings.API_BULK_RUN_MAX_CASES + 1
+        )]
+    else:
+        raise HTTPException(status_code=400, detail="Either case_ids or project_id is required")
+    
+    if not case_ids:
+        raise HTTPException(status_code=400, detail="No API test cases to run")
+    if len(case_ids) > settings.API_BULK_RUN_MAX_CASES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many API test cases, at most {settings.API_BULK_RUN_MAX_CASES} per bulk run"
+        )
+    
+    # 提交Celery任务，保存 group 以便之后按 group_id 查询
+    chunk_size = request.chunk_size or settings.API_BULK_RUN_CHUNK_SIZE
+    job = group(
+        run_api_case_batch_task.s(case_ids[offset:offset + chunk_size])
+        for offset in range(0, len(case_ids), chunk_size)
+    ).apply_async()
+    job.save()
+    return BulkRunStatus(
+        group_id=job.id,
+        status="PENDING",
+        task_ids=[result.id for result in job.results],
+        total_cases=len(case_ids)
+    )
+
+
 @router.post("/run_suite/{suite_id}", response_model=TaskStatus)
 def run_api_suite(suite_id: int, db: Session = Depends(get_db)):
     """执行测试套件（异步）"""
@@ -236,3 +471,17 @@ def run_api_suite(suite_id: int, db: Session = Depends(get_db)):
     task = run_api_suite_task.delay(suite_id)
     return TaskStatus(task_id=task.id, status="PENDING")
 
+
+@router.post("/run/{case_id}/dataset/{dataset_id}", response_model=TaskStatus)
+def run_api_case_with_dataset(case_id: int, dataset_id: int, db: Session = Depends(get_db)):
+    """用数据集的每一行变量执行用例（异步，所有行汇总为一份报告）"""
+    dataset = db.query(models.APITestDataset).filter(
+        models.APITestDataset.id == dataset_id,
+        models.APITestDataset.case_id == case_id
+    ).first()
+    if not dataset:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    
+    # 提交Celery任务
+    task = run_api_dataset_task.delay(case_id, dataset_id)
+    return TaskStatus(task_id=task.id, status="PENDING")
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
+from datetime import datetime
 import os
-import shutil
-from app.database import get_db
+from celery import chord
+from app.database import get_db, get_async_db
 from app import models, schemas
-from app.tasks import run_performance_test_task
+from app.tasks import run_performance_test_task, run_performance_shard_task, merge_performance_shards_task
+from app.services.performance_test_service import split_jmx_for_shards
+from app.services.uploads import save_upload_file
 from app.schemas import TaskStatus
 from config import settings
 
@@ -98,35 +103,40 @@ def delete_performance_test(test_id: int, db: Session = Depends(get_db)):
 async def upload_jmx_file(
     test_id: int,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """上传JMeter的JMX脚本文件"""
-    test = db.query(models.PerformanceTest).filter(
+    """上传JMeter的JMX脚本文件（分块异步写入磁盘，不阻塞事件循环）"""
+    test = await db.scalar(select(models.PerformanceTest).where(
         models.PerformanceTest.id == test_id
-    ).first()
+    ))
     if not test:
         raise HTTPException(status_code=404, detail="Performance test not found")
     
-    # 确保上传目录存在
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    
     # 保存文件
     file_path = os.path.join(settings.UPLOAD_DIR, f"{test_id}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    await save_upload_file(file, file_path)
     
     # 更新数据库
     test.jmx_file_path = file_path
     test.status = "ready"
-    db.commit()
-    db.refresh(test)
+    await db.commit()
+    await db.refresh(test)
     
     return test
 
 
 @router.post("/run/{test_id}", response_model=TaskStatus)
-def run_performance_test(test_id: int, db: Session = Depends(get_db)):
-    """执行性能测试（异步）"""
+def run_performance_test(
+    test_id: int,
+    workers: int = Query(1, ge=1, le=settings.PERF_MAX_WORKERS),
+    db: Session = Depends(get_db)
+):
+    """
+    执行性能测试（异步）
+    
+    workers > 1 时拆分测试计划，分发到多个 Celery Worker 同时施压，
+    返回的任务ID为合并各节点结果的任务
+    """
     test = db.query(models.PerformanceTest).filter(
         models.PerformanceTest.id == test_id
     ).first()
@@ -141,6 +151,22 @@ def run_performance_test(test_id: int, db: Session = Depends(get_db)):
     db.commit()
     
     # 提交Celery任务
-    task = run_performance_test_task.delay(test_id)
+    if workers == 1:
+        task = run_performance_test_task.delay(test_id)
+        return TaskStatus(task_id=task.id, status="PENDING")
+    
+    try:
+        shards = split_jmx_for_shards(test.jmx_file_path, workers)
+    except Exception as e:
+        test.status = "failed"
+        db.commit()
+        raise HTTPException(status_code=400, detail=f"Failed to split JMX file: {str(e)}")
+    
+    shard_options = {"queue": settings.PERF_SHARD_QUEUE} if settings.PERF_SHARD_QUEUE else {}
+    header = [
+        run_performance_shard_task.signature((test_id, index, content), **shard_options)
+        for index, content in enumerate(shards)
+    ]
+    task = chord(header)(merge_performance_shards_task.s(test_id, datetime.now().isoformat()))
     return TaskStatus(task_id=task.id, status="PENDING")
 
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app import models, schemas
 
 router = APIRouter(prefix="/projects", tags=["projects"])
@@ -18,30 +20,30 @@ def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)
 
 
 @router.get("", response_model=List[schemas.Project])
-def get_projects(
+async def get_projects(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=1000),
     name: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目列表，支持按项目名分页查询"""
-    query = db.query(models.Project).filter(models.Project.is_deleted == False)
+    stmt = select(models.Project).where(models.Project.is_deleted == False)
     
     if name:
-        query = query.filter(models.Project.name.like(f"%{name}%"))
+        stmt = stmt.where(models.Project.name.like(f"%{name}%"))
     
     # SQL Server 要求使用 OFFSET/LIMIT 时必须要有 ORDER BY
-    projects = query.order_by(models.Project.id.desc()).offset(skip).limit(limit).all()
-    return projects
+    projects = await db.scalars(stmt.order_by(models.Project.id.desc()).offset(skip).limit(limit))
+    return projects.all()
 
 
 @router.get("/{project_id}", response_model=schemas.Project)
-def get_project(project_id: int, db: Session = Depends(get_db)):
+async def get_project(project_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取项目详情"""
-    project = db.query(models.Project).filter(
+    project = await db.scalar(select(models.Project).where(
         models.Project.id == project_id,
         models.Project.is_deleted == False
-    ).first()
+    ))
     
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
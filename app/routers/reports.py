@@ -1,40 +1,191 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+import base64
+from app.database import get_db, get_async_db
 from app import models, schemas
+from app.services.latency_histogram import percentiles_from_dicts
+from app.services.report_storage import load_result_data
+from app.services.report_analytics import get_trend, get_flaky_cases
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
+# 报告列表只查询的字段（不含 result_data）
+REPORT_SUMMARY_COLUMNS = [
+    models.TestReport.id,
+    models.TestReport.project_id,
+    models.TestReport.name,
+    models.TestReport.type,
+    models.TestReport.task_id,
+    models.TestReport.pass_rate,
+    models.TestReport.start_time,
+    models.TestReport.duration,
+    models.TestReport.created_at,
+]
 
-@router.get("", response_model=List[schemas.TestReport])
-def get_reports(
+
+@router.get("", response_model=List[schemas.TestReportSummary])
+async def get_reports(
+    response: Response,
     project_id: Optional[int] = None,
     report_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取报告列表"""
-    query = db.query(models.TestReport)
+    """
+    获取报告列表（按创建时间倒序，游标分页）
+    
+    只返回报告摘要，不加载 result_data，详细结果通过 GET /reports/{report_id} 获取。
+    每页 limit 条（默认 50），还有下一页时响应头 X-Next-Cursor 为下一页的 cursor 参数
+    """
+    # 只加载摘要字段，result_data 不会被查询
+    stmt = select(models.TestReport).options(load_only(*REPORT_SUMMARY_COLUMNS))
     
     if project_id:
-        query = query.filter(models.TestReport.project_id == project_id)
+        stmt = stmt.where(models.TestReport.project_id == project_id)
     
     if report_type:
-        query = query.filter(models.TestReport.type == report_type)
+        stmt = stmt.where(models.TestReport.type == report_type)
+    
+    # 游标分页：从上一页最后一条记录之后继续，避免 OFFSET 随页数增长的扫描开销
+    if cursor:
+        created_at, report_id = _decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            models.TestReport.created_at < created_at,
+            and_(models.TestReport.created_at == created_at, models.TestReport.id < report_id)
+        ))
     
-    reports = query.order_by(models.TestReport.created_at.desc()).all()
+    # 多取一条用于判断是否还有下一页
+    stmt = stmt.order_by(models.TestReport.created_at.desc(), models.TestReport.id.desc())
+    reports = (await db.scalars(stmt.limit(limit + 1))).all()
+    
+    if len(reports) > limit:
+        reports = reports[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(reports[-1])
     return reports
 
 
+@router.get("/performance/percentiles", response_model=schemas.LatencyPercentiles)
+def get_performance_percentiles(
+    report_ids: List[int] = Query(...),
+    percentiles: List[float] = Query([50, 90, 95, 99]),
+    label: Optional[str] = None,
+    window_start: Optional[int] = None,
+    window_end: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    合并一个或多个性能报告的响应时间直方图，计算任意百分位数
+    
+    - label: 只统计指定采样标签
+    - window_start / window_end: 只统计该时间范围（Unix 秒）内的时间窗口
+    """
+    if label is not None and (window_start is not None or window_end is not None):
+        raise HTTPException(status_code=400, detail="label and time window filters cannot be combined")
+    if any(p < 0 or p > 100 for p in percentiles):
+        raise HTTPException(status_code=400, detail="Percentiles must be between 0 and 100")
+    
+    reports = db.query(models.TestReport).filter(
+        models.TestReport.id.in_(report_ids),
+        models.TestReport.type == "performance"
+    ).all()
+    if len(reports) != len(set(report_ids)):
+        raise HTTPException(status_code=404, detail="Some performance reports not found")
+    
+    histograms = []
+    for report in reports:
+        sketches = ((load_result_data(db, report) or {}).get("metrics") or {}).get("sketches")
+        if not sketches:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Report {report.id} has no latency histogram, re-run the test to collect it"
+            )
+        
+        if label is not None:
+            if label in sketches["labels"]:
+                histograms.append(sketches["labels"][label])
+        elif window_start is not None or window_end is not None:
+            windows = sketches["windows"]
+            for start, histogram in zip(windows["starts"], windows["histograms"]):
+                if window_start is not None and start < window_start:
+                    continue
+                if window_end is not None and start >= window_end:
+                    continue
+                histograms.append(histogram)
+        else:
+            histograms.append(sketches["overall"])
+    
+    result = percentiles_from_dicts(histograms, percentiles)
+    return schemas.LatencyPercentiles(report_ids=sorted(set(report_ids)), label=label, **result)
+
+
+@router.get("/analytics/trend", response_model=List[schemas.ReportTrendPoint])
+async def get_report_trend(
+    project_id: int,
+    report_type: Optional[str] = None,
+    bucket: str = Query("day", pattern="^(hour|day|week)$"),
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    报告通过率和耗时趋势
+    
+    基于写入报告时增量维护的小时汇总表计算，不扫描历史报告
+    """
+    end = datetime.now()
+    # run_sync 在异步连接上执行同步的统计代码，不占用线程池
+    return await db.run_sync(get_trend, project_id, report_type, bucket, end - timedelta(days=days), end)
+
+
+@router.get("/analytics/flaky_cases", response_model=List[schemas.FlakyCase])
+async def get_flaky_case_ranking(
+    project_id: int,
+    case_type: Optional[str] = Query(None, pattern="^(api|ui)$"),
+    days: int = Query(30, ge=1, le=366),
+    min_runs: int = Query(5, ge=2),
+    limit: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    不稳定用例排行
+    
+    按最近 days 天内相邻两次执行结果翻转的比例排序，基于每日用例汇总表计算
+    """
+    return await db.run_sync(
+        get_flaky_cases, project_id, case_type, datetime.now() - timedelta(days=days), min_runs, limit
+    )
+
+
 @router.get("/{report_id}", response_model=schemas.TestReport)
-def get_report(report_id: int, db: Session = Depends(get_db)):
+async def get_report(report_id: int, db: AsyncSession = Depends(get_async_db)):
     """获取详细报告"""
-    report = db.query(models.TestReport).filter(
+    report = await db.scalar(select(models.TestReport).where(
         models.TestReport.id == report_id
-    ).first()
+    ))
     
     if not report:
         raise HTTPException(status_code=404, detail="Test report not found")
     
-    return report
+    # 大报告的完整内容在读取详情时才解压
+    result = schemas.TestReport.model_validate(report)
+    result.result_data = await db.run_sync(load_result_data, report)
+    return result
+
+
+def _encode_cursor(report: models.TestReport) -> str:
+    """把报告的 (created_at, id) 编码为不透明的游标字符串"""
+    raw = f"{report.created_at.isoformat()}|{report.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
 
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, report_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(report_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -1,46 +1,200 @@
-from fastapi import APIRouter, HTTPException
-from celery.result import AsyncResult
+import asyncio
+import json
+from typing import List
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from celery import states
+from celery.result import GroupResult
+from celery.backends.base import BaseKeyValueStoreBackend
 from app.celery_app import celery_app
-from app.schemas import TaskStatus
+from app.schemas import BulkRunStatus, TaskStatus, TaskStatusBatchRequest
+from app.services.task_events import get_task_event_hub
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
+SSE_KEEPALIVE_SECONDS = 15  # 无状态变化时发送 SSE 注释行，防止代理断开空闲连接
+
+
+@router.get("/events")
+async def stream_task_status(task_ids: List[str] = Query(...)):
+    """
+    通过 Server-Sent Events 推送多个任务的状态变化
+    
+    连接建立后先推送每个任务的当前状态，之后每次状态变化推送一条 status 事件
+    （data 为 TaskStatus），所有任务结束（SUCCESS/FAILURE/REVOKED）后关闭连接
+    """
+    task_ids = list(dict.fromkeys(task_ids))
+    
+    async def event_stream():
+        hub = get_task_event_hub()
+        queue: asyncio.Queue = asyncio.Queue()
+        pending = set(task_ids)
+        await hub.subscribe(queue, task_ids)
+        try:
+            # 先订阅再读取快照，避免遗漏两者之间发生的状态变化
+            for task_status in await run_in_threadpool(_get_task_statuses, task_ids):
+                yield _sse_event(task_status)
+                if task_status.status in states.READY_STATES:
+                    pending.discard(task_status.task_id)
+            
+            while pending:
+                try:
+                    task_id, meta = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                task_status = _build_task_status(task_id, meta)
+                yield _sse_event(task_status)
+                if task_status.status in states.READY_STATES:
+                    pending.discard(task_id)
+        finally:
+            await hub.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def task_status_websocket(websocket: WebSocket):
+    """
+    通过 WebSocket 推送任务状态，一个连接可同时订阅多个任务
+    
+    客户端发送 {"subscribe": [task_id, ...]} 或 {"unsubscribe": [task_id, ...]}，
+    订阅时先推送每个任务的当前状态，之后每次状态变化推送一条 TaskStatus
+    """
+    await websocket.accept()
+    hub = get_task_event_hub()
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def receive_commands():
+        while True:
+            command = await websocket.receive_json()
+            subscribe = [str(task_id) for task_id in command.get("subscribe") or []]
+            unsubscribe = [str(task_id) for task_id in command.get("unsubscribe") or []]
+            if unsubscribe:
+                await hub.unsubscribe(queue, unsubscribe)
+            if subscribe:
+                await hub.subscribe(queue, subscribe)
+                for task_status in await run_in_threadpool(_get_task_statuses, subscribe):
+                    await websocket.send_json(task_status.model_dump())
+    
+    async def send_events():
+        while True:
+            task_id, meta = await queue.get()
+            await websocket.send_json(_build_task_status(task_id, meta).model_dump())
+    
+    tasks = [asyncio.ensure_future(receive_commands()), asyncio.ensure_future(send_events())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+        await hub.unsubscribe(queue)
+
+
+@router.post("/status:batch", response_model=List[TaskStatus])
+def get_task_status_batch(request: TaskStatusBatchRequest):
+    """
+    批量查询异步任务的状态和结果
+    
+    Redis 等键值型结果后端只需一次 MGET 即可取回所有任务的元数据，
+    返回顺序与请求中的 task_ids 一致
+    """
+    return _get_task_statuses(request.task_ids)
+
+
+@router.get("/groups/{group_id}", response_model=BulkRunStatus)
+def get_group_status(group_id: str):
+    """
+    查询批量执行（Celery group）的整体状态
+    
+    一次 MGET 读取所有分组任务的状态，汇总已执行和通过的用例数
+    """
+    group_result = GroupResult.restore(group_id, app=celery_app)
+    if group_result is None:
+        raise HTTPException(status_code=404, detail="Task group not found")
+    
+    status = BulkRunStatus(group_id=group_id, status=states.PENDING, task_ids=[r.id for r in group_result.results])
+    started = False
+    for task_status in _get_task_statuses(status.task_ids):
+        if task_status.status != states.PENDING:
+            started = True
+        if task_status.status == states.SUCCESS:
+            status.completed_tasks += 1
+            result = task_status.result or {}
+            status.executed_cases += result.get("total_cases", 0)
+            status.passed_cases += result.get("passed_cases", 0)
+            status.missing_case_ids.extend(result.get("missing_case_ids", []))
+        elif task_status.status in states.READY_STATES:
+            status.completed_tasks += 1
+            status.failed_tasks += 1
+    
+    total = len(status.task_ids)
+    status.progress = int(status.completed_tasks * 100 / total) if total else 100
+    if status.completed_tasks == total:
+        status.status = states.FAILURE if status.failed_tasks else states.SUCCESS
+    elif started:
+        status.status = "PROGRESS"
+    return status
+
 
 @router.get("/{task_id}", response_model=TaskStatus)
 def get_task_status(task_id: str):
     """查询异步任务的状态和结果"""
-    task_result = AsyncResult(task_id, app=celery_app)
-    
-    # 强制从 backend 获取最新状态
-    status = task_result.state
-    task_info = None
-    
+    # 使用 backend 的 get_task_meta 方法获取最新状态
+    # backend_meta 结构: {'status': 'PROGRESS', 'result': {...}, 'traceback': None, ...}
     try:
-        # 使用 backend 的 get_task_meta 方法获取最新状态
         backend_meta = celery_app.backend.get_task_meta(task_id)
-        if backend_meta:
-            # backend_meta 结构: {'status': 'PROGRESS', 'result': {...}, 'traceback': None, ...}
-            backend_status = backend_meta.get('status')
-            if backend_status:
-                status = backend_status
-            
-            # 获取 result（对于 PROGRESS 状态，result 包含 meta 信息）
-            backend_result = backend_meta.get('result')
-            if backend_result:
-                task_info = backend_result
-    except Exception as e:
-        # 如果 backend 获取失败，使用默认方式
-        pass
-    
-    # 如果从 backend 没获取到，使用 AsyncResult 的方式
-    if not task_info:
-        task_info = task_result.info
+    except Exception:
+        backend_meta = {"status": states.PENDING, "result": None}
+    return _build_task_status(task_id, backend_meta)
+
+
+def _get_task_statuses(task_ids: List[str]) -> List[TaskStatus]:
+    """批量读取任务元数据，键值型结果后端使用一次 MGET，其他后端逐个查询"""
+    backend = celery_app.backend
+    if not task_ids:
+        return []
+    if not isinstance(backend, BaseKeyValueStoreBackend):
+        return [get_task_status(task_id) for task_id in task_ids]
+    
+    try:
+        values = backend.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    except Exception:
+        values = [None] * len(task_ids)
+    
+    statuses = []
+    for task_id, value in zip(task_ids, values):
+        meta = {"status": states.PENDING, "result": None}
+        if value:
+            try:
+                meta = backend.decode_result(value)
+            except Exception:
+                pass
+        statuses.append(_build_task_status(task_id, meta))
+    return statuses
+
+
+def _build_task_status(task_id: str, meta: dict) -> TaskStatus:
+    """根据结果后端中的任务元数据构造 TaskStatus"""
+    status = meta.get("status") or states.PENDING
+    # 对于 PROGRESS 状态，result 包含 meta 信息；失败时为异常对象
+    task_info = meta.get("result")
     
     result = None
     error = None
     progress = None
     current_step = None
     status_message = None
+    metrics = None
     
     # 获取任务元数据（包含进度信息）
     if task_info:
@@ -48,9 +202,10 @@ def get_task_status(task_id: str):
             progress = task_info.get("progress")
             current_step = task_info.get("current_step")
             status_message = task_info.get("status")
-            # 如果状态是 PROGRESS，从 info 中获取错误信息
+            # 如果状态是 PROGRESS，从 info 中获取错误信息和实时指标
             if status == "PROGRESS":
                 error = task_info.get("error")
+                metrics = task_info.get("metrics")
         elif status != "PROGRESS":
             # 如果不是进度状态，info 可能是错误信息
             error = str(task_info)
@@ -59,12 +214,11 @@ def get_task_status(task_id: str):
     if status == "PENDING" and not status_message:
         status_message = "任务已提交，等待 Celery Worker 处理..."
     
-    if task_result.ready():
-        if task_result.successful():
-            result = task_result.result
-        else:
-            if not error:
-                error = str(task_result.info) if task_result.info else "任务执行失败"
+    if status in states.READY_STATES:
+        if status == states.SUCCESS:
+            result = task_info
+        elif not error:
+            error = str(task_info) if task_info else "任务执行失败"
     
     return TaskStatus(
         task_id=task_id,
@@ -73,6 +227,10 @@ def get_task_status(task_id: str):
         error=error,
         progress=progress,
         current_step=current_step,
-        status_message=status_message
+        status_message=status_message,
+        metrics=metrics
     )
 
+
+def _sse_event(task_status: TaskStatus) -> str:
+    return f"event: status\ndata: {json.dumps(task_status.model_dump(), ensure_ascii=False, default=str)}\n\n"
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session, selectinload
 from typing import List
+from datetime import datetime
+from celery import chord
 from app.database import get_db
 from app import models, schemas
-from app.tasks import run_ui_case_task
+from app.tasks import run_ui_case_task, run_ui_suite_task, run_ui_suite_shard_task, merge_ui_suite_shards_task
 from app.schemas import TaskStatus
+from config import settings
 
 router = APIRouter(prefix="/ui_tests", tags=["ui_tests"])
 
@@ -78,6 +81,132 @@ def delete_ui_case(case_id: int, db: Session = Depends(get_db)):
     return None
 
 
+# ============ UI Test Suites ============
+def _check_suite_case_ids(db: Session, project_id: int, case_ids: List[int]) -> None:
+    """验证套件中的用例都存在且属于套件所在的项目"""
+    if not case_ids:
+        return
+    existing_cases = db.query(models.UITestCase).filter(
+        models.UITestCase.id.in_(case_ids),
+        models.UITestCase.project_id == project_id
+    ).count()
+    if existing_cases != len(set(case_ids)):
+        raise HTTPException(status_code=400, detail="Some test cases not found")
+
+
+@router.post("/suites", response_model=schemas.UITestSuite, status_code=201)
+def create_ui_suite(suite: schemas.UITestSuiteCreate, db: Session = Depends(get_db)):
+    """创建UI测试套件"""
+    # 验证项目存在
+    project = db.query(models.Project).filter(
+        models.Project.id == suite.project_id,
+        models.Project.is_deleted == False
+    ).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    # 验证用例存在
+    _check_suite_case_ids(db, suite.project_id, suite.case_ids)
+    
+    db_suite = models.UITestSuite(name=suite.name, project_id=suite.project_id)
+    db.add(db_suite)
+    db.flush()
+    
+    # 添加用例到套件
+    for order, case_id in enumerate(suite.case_ids):
+        db.add(models.UITestSuiteCase(suite_id=db_suite.id, case_id=case_id, order=order))
+    
+    db.commit()
+    db.refresh(db_suite)
+    
+    # 返回时包含case_ids
+    result = schemas.UITestSuite.model_validate(db_suite)
+    result.case_ids = suite.case_ids
+    return result
+
+
+@router.get("/suites", response_model=List[schemas.UITestSuite])
+def get_ui_suites(project_id: int = None, db: Session = Depends(get_db)):
+    """获取UI测试套件列表"""
+    # 用例关联通过 selectinload 批量加载，避免逐个套件查询
+    query = db.query(models.UITestSuite).options(selectinload(models.UITestSuite.suite_cases))
+    if project_id:
+        query = query.filter(models.UITestSuite.project_id == project_id)
+    suites = query.all()
+    
+    # 填充case_ids
+    result = []
+    for suite in suites:
+        suite_result = schemas.UITestSuite.model_validate(suite)
+        suite_result.case_ids = [sc.case_id for sc in suite.suite_cases]
+        result.append(suite_result)
+    
+    return result
+
+
+@router.get("/suites/{suite_id}", response_model=schemas.UITestSuite)
+def get_ui_suite(suite_id: int, db: Session = Depends(get_db)):
+    """获取UI测试套件详情"""
+    suite = db.query(models.UITestSuite).filter(models.UITestSuite.id == suite_id).first()
+    if not suite:
+        raise HTTPException(status_code=404, detail="UI test suite not found")
+    
+    result = schemas.UITestSuite.model_validate(suite)
+    result.case_ids = [sc.case_id for sc in suite.suite_cases]
+    return result
+
+
+@router.put("/suites/{suite_id}", response_model=schemas.UITestSuite)
+def update_ui_suite(
+    suite_id: int,
+    suite_update: schemas.UITestSuiteUpdate,
+    db: Session = Depends(get_db)
+):
+    """更新UI测试套件"""
+    suite = db.query(models.UITestSuite).filter(models.UITestSuite.id == suite_id).first()
+    if not suite:
+        raise HTTPException(status_code=404, detail="UI test suite not found")
+    
+    update_data = suite_update.dict(exclude_unset=True)
+    
+    # 更新名称
+    if "name" in update_data:
+        suite.name = update_data["name"]
+    
+    # 更新用例列表
+    if update_data.get("case_ids") is not None:
+        _check_suite_case_ids(db, suite.project_id, update_data["case_ids"])
+        
+        # 删除旧的关联
+        db.query(models.UITestSuiteCase).filter(
+            models.UITestSuiteCase.suite_id == suite_id
+        ).delete()
+        
+        # 添加新的关联
+        for order, case_id in enumerate(update_data["case_ids"]):
+            db.add(models.UITestSuiteCase(suite_id=suite_id, case_id=case_id, order=order))
+    
+    db.commit()
+    db.refresh(suite)
+    
+    result = schemas.UITestSuite.model_validate(suite)
+    result.case_ids = [sc.case_id for sc in suite.suite_cases]
+    return result
+
+
+@router.delete("/suites/{suite_id}", status_code=204)
+def delete_ui_suite(suite_id: int, db: Session = Depends(get_db)):
+    """删除UI测试套件"""
+    suite = db.query(models.UITestSuite).filter(models.UITestSuite.id == suite_id).first()
+    if not suite:
+        raise HTTPException(status_code=404, detail="UI test suite not found")
+    
+    db.delete(suite)
+    db.commit()
+    return None
+
+
+# ============ Test Execution ============
 @router.post("/run/{case_id}", response_model=TaskStatus)
 def run_ui_case(case_id: int, db: Session = Depends(get_db)):
     """执行单个UI用例（异步）"""
@@ -107,3 +236,37 @@ def run_ui_case(case_id: int, db: Session = Depends(get_db)):
             detail=f"Failed to start test execution: {str(e)}"
         )
 
+
+@router.post("/run_suite/{suite_id}", response_model=TaskStatus)
+def run_ui_suite(
+    suite_id: int,
+    shards: int = Query(1, ge=1, le=settings.UI_SUITE_MAX_SHARDS),
+    db: Session = Depends(get_db)
+):
+    """
+    执行UI测试套件（异步）
+    
+    用例按顺序轮流分配到 shards 个分片，分发到多个 Celery Worker 同时执行，
+    每个分片内最多并发 UI_SUITE_CONCURRENCY 个用例；
+    shards > 1 时返回的任务ID为合并各分片结果的任务
+    """
+    suite = db.query(models.UITestSuite).filter(models.UITestSuite.id == suite_id).first()
+    if not suite:
+        raise HTTPException(status_code=404, detail="UI test suite not found")
+    
+    case_ids = [sc.case_id for sc in suite.suite_cases]
+    if not case_ids:
+        raise HTTPException(status_code=400, detail="Test suite is empty")
+    
+    # 提交Celery任务
+    shards = min(shards, len(case_ids))
+    if shards == 1:
+        task = run_ui_suite_task.delay(suite_id)
+        return TaskStatus(task_id=task.id, status="PENDING")
+    
+    header = [
+        run_ui_suite_shard_task.s(suite_id, index, case_ids[index::shards])
+        for index in range(shards)
+    ]
+    task = chord(header)(merge_ui_suite_shards_task.s(suite_id, datetime.now().isoformat()))
+    return TaskStatus(task_id=task.id, status="PENDING")
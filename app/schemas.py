@@ -61,9 +61,43 @@ class APITestCase(APITestCaseBase):
         from_attributes = True
 
 
+class APITestCaseBulkCreate(BaseModel):
+    project_id: int
+    cases: List[Dict[str, Any]]  # 每行的字段同 APITestCaseBase，逐行校验
+
+
+class APITestCaseBulkUpdate(BaseModel):
+    cases: List[Dict[str, Any]]  # 每行必须包含 id，其余字段同 APITestCaseUpdate
+
+
+class BulkRowError(BaseModel):
+    index: int  # 出错的行号（从0开始）
+    error: str
+
+
+class BulkOperationResult(BaseModel):
+    created_ids: List[int] = []
+    updated_ids: List[int] = []
+    errors: List[BulkRowError] = []
+
+
+class APITestDataset(BaseModel):
+    id: int
+    case_id: int
+    name: str
+    format: str  # csv, jsonl
+    row_count: int
+    columns: Optional[List[str]] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
 # ============ API Test Suite Schemas ============
 class APITestSuiteBase(BaseModel):
     name: str
+    sequential: bool = False  # 用例间存在依赖时按顺序串行执行
 
 
 class APITestSuiteCreate(APITestSuiteBase):
@@ -73,6 +107,7 @@ class APITestSuiteCreate(APITestSuiteBase):
 
 class APITestSuiteUpdate(BaseModel):
     name: Optional[str] = None
+    sequential: Optional[bool] = None
     case_ids: Optional[List[int]] = None
 
 
@@ -112,9 +147,37 @@ class UITestCase(UITestCaseBase):
         from_attributes = True
 
 
+# ============ UI Test Suite Schemas ============
+class UITestSuiteBase(BaseModel):
+    name: str
+
+
+class UITestSuiteCreate(UITestSuiteBase):
+    project_id: int
+    case_ids: List[int] = []
+
+
+class UITestSuiteUpdate(BaseModel):
+    name: Optional[str] = None
+    case_ids: Optional[List[int]] = None
+
+
+class UITestSuite(UITestSuiteBase):
+    id: int
+    project_id: int
+    case_ids: List[int] = []
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
 # ============ Performance Test Schemas ============
 class PerformanceTestBase(BaseModel):
     name: str
+    abort_error_rate: Optional[float] = None  # 滚动错误率（%）超过该值时提前终止
+    abort_p99_response_time: Optional[float] = None  # 滚动p99响应时间（毫秒）超过该值时提前终止
 
 
 class PerformanceTestCreate(PerformanceTestBase):
@@ -124,6 +187,8 @@ class PerformanceTestCreate(PerformanceTestBase):
 class PerformanceTestUpdate(BaseModel):
     name: Optional[str] = None
     status: Optional[str] = None
+    abort_error_rate: Optional[float] = None
+    abort_p99_response_time: Optional[float] = None
 
 
 class PerformanceTest(PerformanceTestBase):
@@ -149,11 +214,11 @@ class TestReportCreate(TestReportBase):
     task_id: Optional[str] = None
 
 
-class TestReport(TestReportBase):
+class TestReportSummary(TestReportBase):
+    """报告列表使用的摘要（不含 result_data）"""
     id: int
     project_id: int
     task_id: Optional[str] = None
-    result_data: Optional[Dict[str, Any]] = None
     pass_rate: Optional[float] = None
     start_time: Optional[datetime] = None
     duration: Optional[float] = None
@@ -163,6 +228,49 @@ class TestReport(TestReportBase):
         from_attributes = True
 
 
+class TestReport(TestReportSummary):
+    result_data: Optional[Dict[str, Any]] = None
+
+
+class LatencyPercentiles(BaseModel):
+    """由一个或多个性能报告的响应时间直方图合并计算出的百分位数"""
+    report_ids: List[int]
+    label: Optional[str] = None
+    count: int
+    average: float
+    min: float
+    max: float
+    percentiles: Dict[str, float]  # 如 {"p50": 120.0, "p99": 830.5}
+
+
+class ReportTrendPoint(BaseModel):
+    """一个时间桶内的报告统计（耗时单位为秒）"""
+    bucket_start: datetime
+    report_count: int
+    passed_reports: int
+    average_pass_rate: float
+    average_duration: float
+    p50_duration: float
+    p95_duration: float
+    p99_duration: float
+
+
+class FlakyCase(BaseModel):
+    """统计区间内结果在成功/失败之间反复翻转的用例（比率为百分比，耗时单位为秒）"""
+    case_type: str
+    case_id: int
+    case_name: Optional[str] = None
+    runs: int
+    failures: int
+    flips: int
+    failure_rate: float
+    flip_rate: float
+    average_duration: float
+    p50_duration: float
+    p95_duration: float
+    p99_duration: float
+
+
 # ============ Task Schemas ============
 class TaskStatus(BaseModel):
     task_id: str
@@ -172,6 +280,34 @@ class TaskStatus(BaseModel):
     progress: Optional[int] = None  # 进度百分比 0-100
     current_step: Optional[str] = None  # 当前步骤
     status_message: Optional[str] = None  # 状态消息
+    metrics: Optional[Dict[str, Any]] = None  # 性能测试运行中的实时指标
+
+
+class TaskStatusBatchRequest(BaseModel):
+    task_ids: List[str] = Field(..., max_length=1000)  # 单次最多查询1000个任务
+
+
+class APIBulkRunRequest(BaseModel):
+    """批量执行API用例：指定 case_ids，或按项目（可再按请求方法、名称过滤）选择用例"""
+    case_ids: Optional[List[int]] = None
+    project_id: Optional[int] = None
+    method: Optional[str] = None
+    name_contains: Optional[str] = None
+    chunk_size: Optional[int] = Field(None, ge=1, le=1000)  # 每个 Celery 任务执行的用例数，默认 API_BULK_RUN_CHUNK_SIZE
+
+
+class BulkRunStatus(BaseModel):
+    """批量执行的整体状态（由多个分组任务组成的 Celery group）"""
+    group_id: str
+    status: str  # PENDING, PROGRESS, SUCCESS, FAILURE（有分组任务失败）
+    task_ids: List[str] = []  # 各分组任务的ID，可用 /tasks/status:batch 或 /tasks/events 查询
+    total_cases: Optional[int] = None  # 只在提交时返回
+    completed_tasks: int = 0
+    failed_tasks: int = 0
+    executed_cases: int = 0
+    passed_cases: int = 0
+    missing_case_ids: List[int] = []  # 执行时已不存在的用例
+    progress: Optional[int] = None  # 已完成的分组任务百分比 0-100
 
 
 # ============ Test Execution Result Schemas ============
@@ -181,6 +317,8 @@ class APITestResult(BaseModel):
     response_data: Optional[Dict[str, Any]] = None
     status_code: Optional[int] = None
     assertion_errors: List[str] = []
+    response_size: Optional[int] = None  # 响应体字节数
+    response_sha256: Optional[str] = None  # 完整响应体的 SHA-256（response_data 被截断时可用于比对）
 
 
 class UITestStepResult(BaseModel):
@@ -0,0 +1,337 @@
+import json
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from app import models, schemas
+from config import settings
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+IMPORT_FORMATS = ("ndjson", "postman", "har", "openapi")
+
+HTTP_METHODS = ("get", "post", "put", "patch", "delete", "head", "options")
+
+# 导入时不保留的请求头（由 HTTP 客户端自动生成）
+SKIPPED_HEADERS = {"host", "content-length", "connection"}
+
+# 解析结果：(行号, 用例字段) 或 (行号, 错误信息)
+ParsedRow = Tuple[int, Any]
+
+
+def bulk_create_api_cases(
+    db: Session,
+    project_id: int,
+    rows: Iterable[ParsedRow]
+) -> schemas.BulkOperationResult:
+    """
+    批量创建API测试用例
+
+    逐行校验，校验失败的行记录到 errors 中；有效的行每 API_CASE_BULK_CHUNK_SIZE 条
+    使用一次 executemany 插入并提交，返回新建用例的ID（与有效行的顺序一致）
+    """
+    result = schemas.BulkOperationResult()
+    chunk: List[Dict[str, Any]] = []
+
+    for index, row in rows:
+        if isinstance(row, str):
+            result.errors.append(schemas.BulkRowError(index=index, error=row))
+            continue
+        try:
+            case = schemas.APITestCaseBase.model_validate(row)
+        except ValidationError as e:
+            result.errors.append(schemas.BulkRowError(index=index, error=_format_validation_error(e)))
+            continue
+
+        chunk.append({**case.model_dump(), "project_id": project_id})
+        if len(chunk) >= settings.API_CASE_BULK_CHUNK_SIZE:
+            result.created_ids.extend(_insert_chunk(db, chunk))
+            chunk = []
+
+    if chunk:
+        result.created_ids.extend(_insert_chunk(db, chunk))
+    return result
+
+
+def bulk_update_api_cases(db: Session, rows: List[Dict[str, Any]]) -> schemas.BulkOperationResult:
+    """
+    批量更新API测试用例（每行必须包含 id，只更新给出的字段）
+
+    不存在的用例和校验失败的行记录到 errors 中，有效的行按主键分批 executemany 更新
+    """
+    result = schemas.BulkOperationResult()
+    valid: List[Tuple[int, Dict[str, Any]]] = []
+
+    for index, row in enumerate(rows):
+        case_id = row.get("id") if isinstance(row, dict) else None
+        if not isinstance(case_id, int):
+            result.errors.append(schemas.BulkRowError(index=index, error="id: field required"))
+            continue
+        try:
+            case_update = schemas.APITestCaseUpdate.model_validate(
+                {key: value for key, value in row.items() if key != "id"}
+            )
+        except ValidationError as e:
+            result.errors.append(schemas.BulkRowError(index=index, error=_format_validation_error(e)))
+            continue
+        valid.append((index, {"id": case_id, **case_update.model_dump(exclude_unset=True)}))
+
+    chunk_size = settings.API_CASE_BULK_CHUNK_SIZE
+    for offset in range(0, len(valid), chunk_size):
+        chunk = valid[offset:offset + chunk_size]
+        existing = {
+            case_id for (case_id,) in db.query(models.APITestCase.id).filter(
+                models.APITestCase.id.in_([row["id"] for _, row in chunk])
+            )
+        }
+        mappings = []
+        for index, row in chunk:
+            if row["id"] not in existing:
+                result.errors.append(schemas.BulkRowError(index=index, error=f"API test case {row['id']} not found"))
+                continue
+            mappings.append({**row, "updated_at": datetime.now()})
+        if mappings:
+            db.execute(update(models.APITestCase), mappings)
+            db.commit()
+            result.updated_ids.extend(row["id"] for row in mappings)
+
+    result.errors.sort(key=lambda error: error.index)
+    return result
+
+
+def parse_import_file(file: BinaryIO, import_format: str) -> Iterator[ParsedRow]:
+    """按格式解析导入文件，逐条返回用例字段；NDJSON 按行流式读取，其他格式读取整个文档"""
+    if import_format == "ndjson":
+        yield from _parse_ndjson(file)
+        return
+
+    document = _load_document(file)
+    if import_format == "postman":
+        yield from enumerate(_parse_postman(document))
+    elif import_format == "har":
+        yield from enumerate(_parse_har(document))
+    elif import_format == "openapi":
+        yield from enumerate(_parse_openapi(document))
+    else:
+        raise ValueError(f"Unsupported import format: {import_format}")
+
+
+def _insert_chunk(db: Session, chunk: List[Dict[str, Any]]) -> List[int]:
+    """一次 executemany 插入一批用例并提交，按参数顺序返回新建的ID"""
+    ids = db.scalars(
+        insert(models.APITestCase).returning(models.APITestCase.id, sort_by_parameter_order=True),
+        chunk
+    ).all()
+    db.commit()
+    return list(ids)
+
+
+def _parse_ndjson(file: BinaryIO) -> Iterator[ParsedRow]:
+    for index, line in enumerate(file):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            yield index, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield index, "Each line must be a JSON object"
+            continue
+        yield index, row
+
+
+def _load_document(file: BinaryIO) -> Dict[str, Any]:
+    content = file.read()
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        # OpenAPI 文档常用 YAML 格式
+        if yaml is None:
+            raise ValueError("File is not valid JSON (install PyYAML to import YAML documents)")
+        try:
+            document = yaml.safe_load(content)
+        except yaml.YAMLError as e:
+            raise ValueError(f"File is neither valid JSON nor YAML: {e}")
+        if not isinstance(document, dict):
+            raise ValueError("Document must be a JSON or YAML object")
+        return document
+
+
+def _parse_postman(collection: Dict[str, Any], prefix: str = "") -> Iterator[Any]:
+    """Postman Collection v2.0/v2.1，文件夹名称作为用例名前缀"""
+    for item in collection.get("item", []):
+        name = f"{prefix}{item.get('name', '')}"
+        if "item" in item:
+            yield from _parse_postman(item, f"{name} / ")
+            continue
+
+        request = item.get("request")
+        if not isinstance(request, dict):
+            yield f"{name}: missing request"
+            continue
+
+        url = request.get("url")
+        params = {}
+        if isinstance(url, dict):
+            params = {
+                query["key"]: query.get("value")
+                for query in url.get("query", [])
+                if query.get("key") and not query.get("disabled")
+            }
+            url = url.get("raw", "")
+        url, url_params = _split_query(url or "")
+
+        body = None
+        body_spec = request.get("body") or {}
+        if body_spec.get("mode") == "raw" and body_spec.get("raw"):
+            body = _json_object_body(body_spec["raw"])
+            if body is None:
+                yield f"{name}: only JSON object request bodies are supported"
+                continue
+
+        yield {
+            "name": name,
+            "method": request.get("method", "GET").upper(),
+            "url": url,
+            "headers": _header_dict(
+                (header.get("key"), header.get("value"))
+                for header in request.get("header", [])
+                if not header.get("disabled")
+            ),
+            "params": {**url_params, **params} or None,
+            "body": body,
+        }
+
+
+def _parse_har(har: Dict[str, Any]) -> Iterator[Any]:
+    """HAR 1.2（浏览器开发者工具导出的请求记录）"""
+    for entry in har.get("log", {}).get("entries", []):
+        request = entry.get("request") or {}
+        method = request.get("method", "GET").upper()
+        url, url_params = _split_query(request.get("url", ""))
+        name = f"{method} {urlsplit(url).path or '/'}"
+
+        params = {
+            query["name"]: query.get("value")
+            for query in request.get("queryString", [])
+            if query.get("name")
+        }
+
+        body = None
+        post_data = request.get("postData") or {}
+        if post_data.get("text"):
+            body = _json_object_body(post_data["text"])
+            if body is None:
+                yield f"{name}: only JSON object request bodies are supported"
+                continue
+
+        yield {
+            "name": name,
+            "method": method,
+            "url": url,
+            "headers": _header_dict(
+                (header.get("name"), header.get("value"))
+                for header in request.get("headers", [])
+            ),
+            "params": {**url_params, **params} or None,
+            "body": body,
+        }
+
+
+def _parse_openapi(spec: Dict[str, Any]) -> Iterator[Any]:
+    """OpenAPI 3.x / Swagger 2.0，每个 path + method 生成一个用例，参数取 example 或 default"""
+    if "servers" in spec:
+        base_url = (spec.get("servers") or [{}])[0].get("url", "")
+    else:
+        scheme = (spec.get("schemes") or ["https"])[0]
+        base_url = f"{scheme}://{spec['host']}{spec.get('basePath', '')}" if spec.get("host") else spec.get("basePath", "")
+
+    for path, operations in (spec.get("paths") or {}).items():
+        if not isinstance(operations, dict):
+            continue
+        shared_parameters = operations.get("parameters", [])
+        for method in HTTP_METHODS:
+            operation = operations.get(method)
+            if not isinstance(operation, dict):
+                continue
+
+            params = {}
+            headers = {}
+            body = None
+            for parameter in shared_parameters + operation.get("parameters", []):
+                value = _example_value(parameter)
+                if value is None:
+                    continue
+                if parameter.get("in") == "query":
+                    params[parameter["name"]] = value
+                elif parameter.get("in") == "header":
+                    headers[parameter["name"]] = str(value)
+                elif parameter.get("in") == "body" and isinstance(value, dict):
+                    body = value
+
+            content = ((operation.get("requestBody") or {}).get("content") or {}).get("application/json") or {}
+            example = _example_value(content)
+            if isinstance(example, dict):
+                body = example
+
+            yield {
+                "name": operation.get("operationId") or operation.get("summary") or f"{method.upper()} {path}",
+                "method": method.upper(),
+                "url": f"{base_url.rstrip('/')}{path}",
+                "headers": headers or None,
+                "params": params or None,
+                "body": body,
+            }
+
+
+def _example_value(spec: Dict[str, Any]) -> Any:
+    if "example" in spec:
+        return spec["example"]
+    examples = spec.get("examples")
+    if isinstance(examples, dict) and examples:
+        first = next(iter(examples.values()))
+        return first.get("value") if isinstance(first, dict) else first
+    schema = spec.get("schema") or {}
+    if "example" in schema:
+        return schema["example"]
+    return spec.get("default", schema.get("default"))
+
+
+def _split_query(url: str) -> Tuple[str, Dict[str, str]]:
+    """把 URL 中的查询参数拆到 params 中"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url, {}
+    return urlunsplit(parts._replace(query="")), dict(parse_qsl(parts.query, keep_blank_values=True))
+
+
+def _header_dict(headers: Iterable[Tuple[Optional[str], Any]]) -> Optional[Dict[str, str]]:
+    result = {
+        name: value
+        for name, value in headers
+        # 跳过 HTTP/2 伪首部（:authority 等）
+        if name and not name.startswith(":") and name.lower() not in SKIPPED_HEADERS
+    }
+    return result or None
+
+
+def _json_object_body(text: str) -> Optional[Dict[str, Any]]:
+    try:
+        body = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}"
+        for detail in error.errors()
+    )
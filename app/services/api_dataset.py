@@ -0,0 +1,169 @@
+import base64
+import csv
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.models import APITestCase
+from app.schemas import APITestResult
+from app.services.latency_histogram import LatencyHistogram
+from config import settings
+
+DATASET_FORMATS = ("csv", "jsonl")
+
+# 用例中可以使用变量的字段
+TEMPLATE_FIELDS = ("method", "url", "headers", "params", "body", "assertions")
+
+# {{变量名}}，变量名为数据集的列名（CSV 表头或 JSON 对象的键）
+VARIABLE_PATTERN = re.compile(r"\{\{\s*([A-Za-z_][\w.-]*)\s*\}\}")
+
+
+def inspect_dataset(file_path: str, dataset_format: str) -> Tuple[int, List[str]]:
+    """校验数据集文件并返回 (行数, 变量名列表)，格式错误时抛出 ValueError"""
+    row_count = 0
+    columns: Dict[str, None] = {}
+    for row in iter_dataset_rows(file_path, dataset_format):
+        row_count += 1
+        columns.update(dict.fromkeys(row))
+    if row_count == 0:
+        raise ValueError("Dataset is empty")
+    return row_count, list(columns)
+
+
+def iter_dataset_rows(file_path: str, dataset_format: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取数据集，不把整个文件加载到内存"""
+    if dataset_format == "csv":
+        # utf-8-sig 兼容 Excel 导出的带 BOM 的 CSV
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames:
+                raise ValueError("CSV dataset must have a header row")
+            for row in reader:
+                yield row
+    elif dataset_format == "jsonl":
+        with open(file_path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Line {line_number}: invalid JSON: {e}")
+                if not isinstance(row, dict):
+                    raise ValueError(f"Line {line_number}: each line must be a JSON object")
+                yield row
+    else:
+        raise ValueError(f"Unsupported dataset format: {dataset_format}")
+
+
+def case_template(case: APITestCase) -> Dict[str, Any]:
+    """提取用例中可以使用变量的字段，执行期间不再访问数据库会话"""
+    return {field: getattr(case, field) for field in TEMPLATE_FIELDS}
+
+
+def render_case(template: Dict[str, Any], variables: Dict[str, Any]) -> APITestCase:
+    """
+    用一行数据替换模板中的 {{变量名}}，返回不关联会话的临时用例
+
+    整个字符串只有一个变量时保留变量的原始类型（如 JSONL 中的数字、布尔值），
+    否则按字符串拼接；引用不存在的变量时抛出 ValueError
+    """
+    return APITestCase(**{field: _render(value, variables) for field, value in template.items()})
+
+
+def _render(value: Any, variables: Dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        if "{{" not in value:
+            return value
+        match = VARIABLE_PATTERN.fullmatch(value.strip())
+        if match:
+            return _lookup(variables, match.group(1))
+        return VARIABLE_PATTERN.sub(lambda m: _to_text(_lookup(variables, m.group(1))), value)
+    # 不含变量的字典和列表原样返回（同一个对象），断言的编译结果可以按对象直接复用
+    if isinstance(value, dict):
+        items = [(_render(key, variables), _render(item, variables)) for key, item in value.items()]
+        if all(new[0] is key and new[1] is item for new, (key, item) in zip(items, value.items())):
+            return value
+        return dict(items)
+    if isinstance(value, list):
+        items = [_render(item, variables) for item in value]
+        if all(new is item for new, item in zip(items, value)):
+            return value
+        return items
+    return value
+
+
+def _lookup(variables: Dict[str, Any], name: str) -> Any:
+    if name not in variables:
+        raise ValueError(f"Undefined variable: {name}")
+    return variables[name]
+
+
+def _to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+class DatasetRunSummary:
+    """
+    数据驱动执行的紧凑结果
+
+    每行的通过/失败记录为位图（每行 1 bit），响应时间记录到直方图，
+    状态码只计数；只保留前 API_DATASET_MAX_FAILURE_DETAILS 个失败行的详情
+    """
+
+    def __init__(self, total_rows: int):
+        self.total_rows = total_rows
+        self.executed_rows = 0
+        self.passed_rows = 0
+        self.passed_bitmap = bytearray((total_rows + 7) // 8)
+        self.status_codes: Counter = Counter()
+        self.durations = LatencyHistogram()
+        self.failures: List[Dict[str, Any]] = []
+        self.omitted_failures = 0
+
+    def add(self, index: int, result: APITestResult, variables: Optional[Dict[str, Any]]) -> None:
+        self.executed_rows += 1
+        self.durations.record(result.duration * 1000)
+        self.status_codes[str(result.status_code) if result.status_code is not None else "error"] += 1
+        if result.success:
+            self.passed_rows += 1
+            if index < self.total_rows:
+                self.passed_bitmap[index // 8] |= 1 << (index % 8)
+            return
+
+        if len(self.failures) < settings.API_DATASET_MAX_FAILURE_DETAILS:
+            self.failures.append({
+                "row": index,
+                "variables": variables,
+                "status_code": result.status_code,
+                "assertion_errors": result.assertion_errors,
+            })
+        else:
+            self.omitted_failures += 1
+
+    @property
+    def pass_rate(self) -> float:
+        return self.passed_rows / self.executed_rows * 100 if self.executed_rows else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_rows": self.executed_rows,
+            "passed_rows": self.passed_rows,
+            "failed_rows": self.executed_rows - self.passed_rows,
+            "pass_rate": self.pass_rate,
+            "status_codes": dict(self.status_codes),
+            "average_duration": self.durations.mean / 1000,
+            "p50_duration": self.durations.percentile(0.5) / 1000,
+            "p95_duration": self.durations.percentile(0.95) / 1000,
+            "p99_duration": self.durations.percentile(0.99) / 1000,
+            "durations": self.durations.to_dict(),
+            # 第 i 行通过时，第 i // 8 个字节的第 i % 8 位为 1
+            "passed_bitmap": base64.b64encode(bytes(self.passed_bitmap)).decode(),
+            "failures": self.failures,
+            "omitted_failures": self.omitted_failures,
+        }
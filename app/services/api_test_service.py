@@ -1,48 +1,61 @@
 import requests
 import time
-from typing import Dict, Any, List
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, List, Iterable, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
 from app.models import APITestCase
 from app.schemas import APITestResult
+from app.services.assertions import compile_assertions
+from app.services.response_capture import RESPONSE_CHUNK_SIZE, capture_response, parse_json
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 每个 worker 进程内按 scheme+host 复用的 HTTP 会话，跨 Celery 任务保持 keep-alive 连接
+_sessions: Dict[str, Any] = {}
+_sessions_lock = threading.Lock()
 
 
 def run_api_case(case: APITestCase) -> APITestResult:
     """
     执行单个API测试用例
     
-    使用requests库发送请求，并根据assertions进行验证
+    使用按主机复用的HTTP会话发送请求，流式读取响应体（见 capture_response），
+    并根据assertions进行验证（规则见 CompiledAssertions）
     """
     start_time = time.time()
     assertion_errors = []
     response_data = None
     status_code = None
+    captured = None
     
     try:
-        # 准备请求参数
-        headers = case.headers or {}
-        params = case.params or {}
-        json_data = case.body if case.method.upper() in ["POST", "PUT", "PATCH"] else None
-        
-        # 发送HTTP请求
-        response = requests.request(
-            method=case.method.upper(),
-            url=case.url,
-            headers=headers,
-            params=params,
-            json=json_data,
-            timeout=30
-        )
+        # 相同的断言规则只编译一次
+        evaluator = compile_assertions(case.assertions) if case.assertions else None
         
-        status_code = response.status_code
+        # 发送HTTP请求（复用同一主机的连接池），边读取响应边计算大小和哈希
+        with _open_response(case) as (status_code, chunks, encoding):
+            captured = capture_response(status_code, chunks, encoding, evaluator.needles if evaluator else ())
+        elapsed_ms = (time.time() - start_time) * 1000
         
-        # 尝试解析响应为JSON
-        try:
-            response_data = response.json()
-        except:
-            response_data = {"text": response.text}
+        # 只在需要保存完整响应或有 JSON 断言时解析响应（与断言共用同一份解码后的文本）
+        parsed = None
+        if not captured.truncated or (evaluator is not None and evaluator.needs_json):
+            parsed = parse_json(captured)
         
         # 执行断言
-        if case.assertions:
-            assertion_errors = _execute_assertions(case.assertions, response, response_data)
+        if evaluator is not None:
+            assertion_errors = evaluator.evaluate(
+                captured,
+                parsed if parsed is not None else {"text": captured.text},
+                elapsed_ms
+            )
+        response_data = captured.summary(parsed)
         
         duration = time.time() - start_time
         success = len(assertion_errors) == 0
@@ -52,7 +65,9 @@ def run_api_case(case: APITestCase) -> APITestResult:
             duration=duration,
             response_data=response_data,
             status_code=status_code,
-            assertion_errors=assertion_errors
+            assertion_errors=assertion_errors,
+            response_size=captured.size,
+            response_sha256=captured.sha256
         )
         
     except Exception as e:
@@ -64,69 +79,121 @@ def run_api_case(case: APITestCase) -> APITestResult:
             duration=duration,
             response_data=response_data,
             status_code=status_code,
-            assertion_errors=assertion_errors
+            assertion_errors=assertion_errors,
+            response_size=captured.size if captured else None,
+            response_sha256=captured.sha256 if captured else None
         )
 
 
-def _execute_assertions(
-    assertions: Dict[str, Any],
-    response: requests.Response,
-    response_data: Any
-) -> List[str]:
+def run_api_cases(
+    cases: Iterable[APITestCase],
+    max_workers: Optional[int] = None,
+    sequential: bool = False
+) -> List[APITestResult]:
     """
-    执行断言规则
+    批量执行API测试用例，返回结果的顺序与传入用例的顺序一致
     
-    assertions格式示例:
-    {
-        "status_code": 200,
-        "response_contains": "success",
-        "response_json": {
-            "code": 0,
-            "data.id": 123
-        }
-    }
+    sequential=True 时逐个执行（适用于用例之间存在依赖的套件），
+    否则使用有界线程池并发执行，并发数默认取 API_SUITE_CONCURRENCY
     """
-    errors = []
+    cases = list(cases)
+    workers = max_workers or settings.API_SUITE_CONCURRENCY
     
-    # 检查状态码
-    if "status_code" in assertions:
-        expected_status = assertions["status_code"]
-        if response.status_code != expected_status:
-            errors.append(
-                f"Status code assertion failed: expected {expected_status}, got {response.status_code}"
-            )
+    if sequential or workers <= 1 or len(cases) <= 1:
+        return [run_api_case(case) for case in cases]
     
-    # 检查响应体是否包含特定文本
-    if "response_contains" in assertions:
-        expected_text = assertions["response_contains"]
-        response_text = response.text
-        if expected_text not in response_text:
-            errors.append(
-                f"Response contains assertion failed: expected '{expected_text}' not found in response"
-            )
+    # executor.map 按提交顺序返回结果
+    with ThreadPoolExecutor(max_workers=min(workers, len(cases))) as executor:
+        return list(executor.map(run_api_case, cases))
+
+
+def run_api_case_stream(
+    cases: Iterable[Tuple[int, APITestCase]],
+    max_workers: Optional[int] = None
+) -> Iterator[Tuple[int, APITestResult]]:
+    """
+    流式并发执行大量用例（数据驱动执行），按完成顺序返回 (序号, 结果)
     
-    # 检查JSON响应字段
-    if "response_json" in assertions and isinstance(response_data, dict):
-        json_assertions = assertions["response_json"]
-        for key, expected_value in json_assertions.items():
-            # 支持嵌套字段，如 "data.id"
-            actual_value = _get_nested_value(response_data, key)
-            if actual_value != expected_value:
-                errors.append(
-                    f"JSON assertion failed for '{key}': expected {expected_value}, got {actual_value}"
-                )
+    cases 按需读取，同时最多有 2 * max_workers 个用例在执行或排队，
+    内存占用与用例总数无关；并发数默认取 API_DATASET_CONCURRENCY
+    """
+    workers = max_workers or settings.API_DATASET_CONCURRENCY
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for index, case in cases:
+            pending[executor.submit(run_api_case, case)] = index
+            if len(pending) >= workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+
+
+@contextmanager
+def _open_response(case: APITestCase):
+    """发送请求并返回 (状态码, 响应体数据块迭代器, 编码)，退出时关闭响应、归还连接"""
+    session = _get_session(case.url)
+    request = dict(
+        method=case.method.upper(),
+        url=case.url,
+        headers=case.headers or {},
+        params=case.params or {},
+        json=case.body if case.method.upper() in ["POST", "PUT", "PATCH"] else None,
+        timeout=30
+    )
     
-    return errors
+    if isinstance(session, requests.Session):
+        with session.request(stream=True, **request) as response:
+            yield response.status_code, response.iter_content(RESPONSE_CHUNK_SIZE), response.encoding
+    else:
+        # httpx.Client（API_HTTP2）
+        with session.stream(**request) as response:
+            yield response.status_code, response.iter_bytes(RESPONSE_CHUNK_SIZE), response.encoding
 
 
-def _get_nested_value(data: Dict[str, Any], key: str) -> Any:
-    """获取嵌套字典的值，支持点号分隔的键"""
-    keys = key.split(".")
-    value = data
-    for k in keys:
-        if isinstance(value, dict) and k in value:
-            value = value[k]
-        else:
-            return None
-    return value
+def _get_session(url: str):
+    """获取指定 URL 所属 scheme+host 的共享会话，不存在时创建"""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}".lower()
+    
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _create_session()
+                _sessions[key] = session
+    return session
+
 
+def _create_session():
+    """
+    创建带连接池的会话
+    
+    会话只用于复用连接：Cookie 策略拒绝所有 Cookie，
+    保证不同用例之间的请求与直接调用 requests.request 时一样互不影响
+    """
+    if settings.API_HTTP2:
+        try:
+            import httpx
+            return httpx.Client(
+                http2=True,
+                follow_redirects=True,
+                cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+                limits=httpx.Limits(
+                    max_connections=settings.API_HTTP_POOL_MAXSIZE,
+                    max_keepalive_connections=settings.API_HTTP_POOL_MAXSIZE
+                )
+            )
+        except ImportError:
+            logger.warning("API_HTTP2 is enabled but httpx[http2] is not installed, falling back to HTTP/1.1")
+    
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.API_HTTP_POOL_MAXSIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,361 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import jsonschema
+except ImportError:
+    jsonschema = None
+
+# 编译结果缓存的最大条目数（按断言内容缓存，数据驱动执行时每行的断言可能不同）
+EVALUATOR_CACHE_SIZE = 1024
+
+# json_schema 断言最多报告的错误数
+SCHEMA_ERROR_LIMIT = 3
+
+_KEY, _INDEX, _WILDCARD, _DESCEND = range(4)
+
+_UNSET = object()
+
+
+class JSONPath:
+    """
+    预编译的 JSONPath（常用子集）
+
+    支持 $.a.b、$['a']、$.items[0]、$.items[-1]、$.items[*].id、$..id，
+    不以 $ 开头的路径按 $. 处理，兼容旧的点号写法（data.id、items.0.id）。
+    路径不含通配符和 .. 时返回单个值（不存在时为 None），否则返回所有匹配值的列表
+    """
+
+    __slots__ = ("path", "steps", "definite", "_keys")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.steps = _parse_path(path)
+        self.definite = all(kind in (_KEY, _INDEX) for kind, _ in self.steps)
+        # 确定路径的每一步表示为 (键名, 数组下标)：键名为 None 时只能作为下标，下标为 None 时只能作为键名
+        self._keys = tuple(arg if kind == _KEY else (None, arg) for kind, arg in self.steps) if self.definite else ()
+
+    def value(self, data: Any) -> Any:
+        if not self.definite:
+            return self.find(data)
+        for name, index in self._keys:
+            if isinstance(data, dict):
+                if name is None or name not in data:
+                    return None
+                data = data[name]
+            elif index is not None and isinstance(data, list) and -len(data) <= index < len(data):
+                data = data[index]
+            else:
+                return None
+        return data
+
+    def find(self, data: Any) -> List[Any]:
+        nodes = [data]
+        for kind, arg in self.steps:
+            matches: List[Any] = []
+            for node in nodes:
+                _apply(kind, arg, node, matches)
+            nodes = matches
+            if not nodes:
+                break
+        return nodes
+
+
+def _apply(kind: int, arg: Any, node: Any, matches: List[Any]) -> None:
+    if kind == _KEY:
+        name, index = arg
+        if isinstance(node, dict):
+            if name in node:
+                matches.append(node[name])
+        elif index is not None and isinstance(node, list) and -len(node) <= index < len(node):
+            matches.append(node[index])
+    elif kind == _INDEX:
+        if isinstance(node, list) and -len(node) <= arg < len(node):
+            matches.append(node[arg])
+    elif kind == _WILDCARD:
+        if isinstance(node, dict):
+            matches.extend(node.values())
+        elif isinstance(node, list):
+            matches.extend(node)
+    else:
+        # ..step：在当前节点及其所有后代上应用 step
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            _apply(arg[0], arg[1], current, matches)
+            if isinstance(current, dict):
+                stack.extend(reversed(list(current.values())))
+            elif isinstance(current, list):
+                stack.extend(reversed(current))
+
+
+def _parse_path(path: str) -> Tuple[Tuple[int, Any], ...]:
+    text = path.strip()
+    if text.startswith("$"):
+        text = text[1:]
+    elif text and not text.startswith((".", "[")):
+        text = "." + text
+
+    steps = []
+    position = 0
+    while position < len(text):
+        descend = text.startswith("..", position)
+        if descend:
+            position += 2
+        elif text[position] == ".":
+            position += 1
+
+        if position < len(text) and text[position] == "[":
+            end = text.find("]", position)
+            if end < 0:
+                raise ValueError(f"Invalid JSONPath '{path}': missing ']'")
+            step = _bracket_step(path, text[position + 1:end].strip())
+            position = end + 1
+        else:
+            end = position
+            while end < len(text) and text[end] not in ".[":
+                end += 1
+            name = text[position:end]
+            if not name:
+                raise ValueError(f"Invalid JSONPath '{path}': empty name")
+            step = (_WILDCARD, None) if name == "*" else _key_step(name)
+            position = end
+
+        steps.append((_DESCEND, step) if descend else step)
+    return tuple(steps)
+
+
+def _bracket_step(path: str, content: str) -> Tuple[int, Any]:
+    if content == "*":
+        return _WILDCARD, None
+    if len(content) >= 2 and content[0] == content[-1] and content[0] in "'\"":
+        return _key_step(content[1:-1])
+    try:
+        return _INDEX, int(content)
+    except ValueError:
+        raise ValueError(f"Invalid JSONPath '{path}': unsupported selector [{content}]")
+
+
+def _key_step(name: str) -> Tuple[int, Any]:
+    # 兼容旧写法 items.0：名称为整数时也可以作为数组下标
+    index = int(name) if name.lstrip("-").isdigit() else None
+    return _KEY, (name, index)
+
+
+@lru_cache(maxsize=4096)
+def compile_path(path: str) -> JSONPath:
+    return JSONPath(path)
+
+
+@lru_cache(maxsize=1024)
+def compile_regex(pattern: str) -> "re.Pattern":
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise ValueError(f"Invalid regex '{pattern}': {e}")
+
+
+@lru_cache(maxsize=256)
+def _compile_schema(schema_json: str):
+    if jsonschema is None:
+        raise ValueError("json_schema assertion requires the jsonschema package")
+    schema = json.loads(schema_json)
+    validator_class = jsonschema.validators.validator_for(schema)
+    try:
+        validator_class.check_schema(schema)
+    except jsonschema.SchemaError as e:
+        raise ValueError(f"Invalid JSON schema: {e.message}")
+    return validator_class(schema)
+
+
+class CompiledAssertions:
+    """
+    预编译的断言规则，可以并发地对任意多个响应求值
+
+    assertions格式示例:
+    {
+        "status_code": 200,
+        "response_contains": "success",
+        "response_regex": "order-\\d+",
+        "response_json": {
+            "code": 0,
+            "data.id": 123,
+            "$.data.items[*].status": ["paid", "paid"]
+        },
+        "response_json_regex": {"$.data.order_no": "^NO\\d{8}$"},
+        "json_schema": {"type": "object", "required": ["code", "data"]},
+        "max_response_time": 500
+    }
+
+    response_json / response_json_regex 只在响应为 JSON 对象时检查，max_response_time 单位为毫秒。
+    响应体超过 API_RESPONSE_MAX_BYTES 时（response.text 为 None）只检查状态码、包含文本和响应时间，
+    其余规则直接报告失败
+    """
+
+    __slots__ = ("_status_code", "_contains", "_max_time", "_json_rules", "_checks", "needles", "needs_json")
+
+    def __init__(self, assertions: Dict[str, Any]):
+        # 状态码、包含文本、响应时间和 JSON 字段断言在 evaluate 中直接判断，其余需要响应体的规则编译为检查函数
+        # 状态码和响应时间可能来自 CSV 数据集的变量（文本），统一转换为数字
+        self._status_code = assertions.get("status_code", _UNSET)
+        if isinstance(self._status_code, str):
+            self._status_code = int(self._status_code.strip())
+        self._contains = assertions.get("response_contains", _UNSET)
+        self._max_time = float(assertions["max_response_time"]) if "max_response_time" in assertions else None
+        self._json_rules: Tuple[Tuple[str, JSONPath, Any], ...] = tuple(
+            (key, compile_path(key), expected)
+            for key, expected in (assertions.get("response_json") or {}).items()
+        )
+        self._checks: List[Callable[[Any, Any, float, List[str]], None]] = []
+
+        if "response_regex" in assertions:
+            patterns = assertions["response_regex"]
+            for pattern in patterns if isinstance(patterns, list) else [patterns]:
+                self._checks.append(_regex_check(str(pattern)))
+        if "response_json_regex" in assertions:
+            self._checks.append(_json_regex_check([
+                (key, compile_path(key), compile_regex(str(pattern)))
+                for key, pattern in assertions["response_json_regex"].items()
+            ]))
+        if "json_schema" in assertions:
+            self._checks.append(_schema_check(
+                _compile_schema(json.dumps(assertions["json_schema"], sort_keys=True))
+            ))
+
+        # 读取响应时需要逐块查找的文本，以及是否需要解析响应 JSON
+        self.needles: Tuple[str, ...] = (self._contains,) if self._contains is not _UNSET else ()
+        self.needs_json = bool(self._json_rules) or "response_json_regex" in assertions or "json_schema" in assertions
+
+    def evaluate(self, response: Any, response_data: Any, elapsed_ms: float) -> List[str]:
+        """返回断言失败信息列表，全部通过时为空列表"""
+        errors: List[str] = []
+        text = response.text
+
+        if self._status_code is not _UNSET and response.status_code != self._status_code:
+            errors.append(f"Status code assertion failed: expected {self._status_code}, got {response.status_code}")
+
+        if self._contains is not _UNSET and not (
+            self._contains in text if text is not None else response.contains(self._contains)
+        ):
+            errors.append(f"Response contains assertion failed: expected '{self._contains}' not found in response")
+
+        if self._max_time is not None and elapsed_ms > self._max_time:
+            errors.append(
+                f"Response time assertion failed: expected <= {self._max_time:g}ms, got {elapsed_ms:.0f}ms"
+            )
+
+        if text is None:
+            if self._json_rules or self._checks:
+                errors.append(
+                    f"Response body too large for assertions: {response.size} bytes exceeds API_RESPONSE_MAX_BYTES"
+                )
+            return errors
+
+        if self._json_rules and isinstance(response_data, dict):
+            for key, path, expected in self._json_rules:
+                actual = path.value(response_data)
+                if actual != expected:
+                    errors.append(f"JSON assertion failed for '{key}': expected {expected}, got {actual}")
+
+        for check in self._checks:
+            check(response, response_data, elapsed_ms, errors)
+        return errors
+
+
+class _InvalidAssertions:
+    """断言规则本身有误（如正则表达式不合法）时，每次求值都返回同一个错误"""
+
+    __slots__ = ("_error",)
+
+    needles: Tuple[str, ...] = ()
+    needs_json = False
+
+    def __init__(self, error: str):
+        self._error = error
+
+    def evaluate(self, response: Any, response_data: Any, elapsed_ms: float) -> List[str]:
+        return [self._error]
+
+
+_evaluators: "OrderedDict[str, Any]" = OrderedDict()
+# 按断言字典对象缓存：id -> (断言字典, 编译结果)，保留字典的引用以保证 id 不会被复用
+_evaluators_by_identity: "OrderedDict[int, Tuple[Dict[str, Any], Any]]" = OrderedDict()
+_evaluators_lock = threading.Lock()
+
+
+def compile_assertions(assertions: Dict[str, Any]):
+    """
+    返回断言的编译结果
+
+    同一个断言字典对象（如同一用例对象的多次执行）直接命中按对象的缓存；
+    内容相同的不同字典对象（如重新加载的用例）命中按内容的缓存，只编译一次。
+    调用方不应原地修改已经求值过的断言字典
+    """
+    cached = _evaluators_by_identity.get(id(assertions))
+    if cached is not None and cached[0] is assertions:
+        return cached[1]
+
+    key = json.dumps(assertions, sort_keys=True, default=str)
+    with _evaluators_lock:
+        evaluator = _evaluators.get(key)
+        if evaluator is not None:
+            _evaluators.move_to_end(key)
+
+    if evaluator is None:
+        try:
+            evaluator = CompiledAssertions(assertions)
+        except (ValueError, TypeError, AttributeError) as e:
+            evaluator = _InvalidAssertions(f"Invalid assertions: {e}")
+
+    with _evaluators_lock:
+        _evaluators[key] = evaluator
+        _evaluators_by_identity[id(assertions)] = (assertions, evaluator)
+        if len(_evaluators) > EVALUATOR_CACHE_SIZE:
+            _evaluators.popitem(last=False)
+        if len(_evaluators_by_identity) > EVALUATOR_CACHE_SIZE:
+            _evaluators_by_identity.popitem(last=False)
+    return evaluator
+
+
+def _regex_check(pattern: str):
+    regex = compile_regex(pattern)
+
+    def check(response, response_data, elapsed_ms, errors):
+        if regex.search(response.text) is None:
+            errors.append(f"Response regex assertion failed: pattern '{pattern}' not found in response")
+    return check
+
+
+def _json_regex_check(rules: List[Tuple[str, JSONPath, "re.Pattern"]]):
+    def check(response, response_data, elapsed_ms, errors):
+        if not isinstance(response_data, dict):
+            return
+        for key, path, regex in rules:
+            values = path.find(response_data)
+            if not values or any(regex.search(_as_text(value)) is None for value in values):
+                errors.append(
+                    f"JSON regex assertion failed for '{key}': "
+                    f"{values if values else 'no value'} does not match '{regex.pattern}'"
+                )
+    return check
+
+
+def _schema_check(validator):
+    def check(response, response_data, elapsed_ms, errors):
+        for index, error in enumerate(validator.iter_errors(response_data)):
+            if index >= SCHEMA_ERROR_LIMIT:
+                errors.append("JSON schema assertion failed: more errors omitted")
+                break
+            location = "$" + "".join(f"[{part}]" if isinstance(part, int) else f".{part}" for part in error.absolute_path)
+            errors.append(f"JSON schema assertion failed at '{location}': {error.message}")
+    return check
+
+
+def _as_text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
@@ -0,0 +1,237 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable, Optional
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "browser_pool_runner.py")
+
+
+class BrowserPool:
+    """
+    Worker 进程内常驻的浏览器池
+
+    池中每个执行进程（browser_pool_runner.py）启动时创建一次 Python 解释器和 Chromium，
+    之后用例脚本在已运行的浏览器中以独立的 browser context 执行。
+    执行进程使用 max_uses 次后回收重建，超时或崩溃的执行进程直接丢弃；
+    执行进程在独立的进程组中运行，丢弃时连同 Playwright driver 和 Chromium 子进程一起结束
+    """
+
+    def __init__(self, size: int, max_uses: int, startup_timeout: float = 60):
+        self.size = size
+        self.max_uses = max_uses
+        self.startup_timeout = startup_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: "queue.LifoQueue[_BrowserRunner]" = queue.LifoQueue()
+        self._runners = set()
+        self._lock = threading.Lock()
+
+    def run_script(
+        self,
+        script_path: str,
+        screenshot_dir: str,
+        timeout: float,
+        on_output: Optional[Callable[[str], None]] = None
+    ) -> dict:
+        """
+        在池中执行用例脚本，池满时等待空闲的执行进程
+
+        返回值与 _run_locally 相同：{"success", "error", "output"}
+        """
+        with self._slots:
+            runner = self._checkout()
+            keep = False
+            try:
+                result = runner.run(
+                    {"script_path": script_path, "screenshot_dir": screenshot_dir},
+                    timeout,
+                    on_output
+                )
+                keep = runner.alive and runner.uses < self.max_uses
+                return result
+            finally:
+                if keep:
+                    self._idle.put(runner)
+                else:
+                    self._discard(runner)
+
+    def shutdown(self) -> None:
+        """关闭所有执行进程"""
+        with self._lock:
+            runners = list(self._runners)
+        for runner in runners:
+            self._discard(runner)
+
+    def _checkout(self) -> "_BrowserRunner":
+        while True:
+            try:
+                runner = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if runner.alive:
+                return runner
+            self._discard(runner)
+
+        runner = _BrowserRunner()
+        with self._lock:
+            self._runners.add(runner)
+        try:
+            runner.wait_ready(self.startup_timeout)
+        except Exception:
+            self._discard(runner)
+            raise
+        return runner
+
+    def _discard(self, runner: "_BrowserRunner") -> None:
+        with self._lock:
+            self._runners.discard(runner)
+        runner.stop()
+
+
+class _BrowserRunner:
+    """一个常驻执行进程，后台线程持续读取其输出的协议消息"""
+
+    def __init__(self):
+        self.uses = 0
+        self.alive = True
+        # 新建进程组，结束时连同执行进程启动的 driver 和 Chromium 一起结束
+        if os.name == "nt":
+            group_options = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            group_options = {"start_new_session": True}
+        self.process = subprocess.Popen(
+            [sys.executable, RUNNER_PATH],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+            **group_options
+        )
+        self._messages: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def wait_ready(self, timeout: float) -> None:
+        message = self._next_message(time.time() + timeout)
+        if message is None or not message.get("ready"):
+            error = (message or {}).get("error") or "Browser pool runner failed to start"
+            raise RuntimeError(error)
+
+    def run(self, job: dict, timeout: float, on_output: Optional[Callable[[str], None]] = None) -> dict:
+        self.uses += 1
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+
+        deadline = time.time() + timeout
+        stdout_lines = []
+        stderr_lines = []
+        while True:
+            try:
+                message = self._next_message(deadline)
+            except TimeoutError:
+                self.kill()
+                return {
+                    "success": False,
+                    "error": f"Test execution timeout (exceeded {int(timeout)} seconds)",
+                    "output": "".join(stdout_lines + stderr_lines)
+                }
+
+            if message is None:
+                self.alive = False
+                return {
+                    "success": False,
+                    "error": "Browser pool runner exited unexpectedly\n" + "".join(stderr_lines),
+                    "output": "".join(stdout_lines + stderr_lines)
+                }
+
+            if message.get("done"):
+                break
+
+            if message.get("stream") == "stderr":
+                stderr_lines.append(message["line"])
+            else:
+                stdout_lines.append(message["line"])
+                if on_output:
+                    on_output(message["line"])
+
+        output = "".join(stdout_lines)
+        error_output = "".join(stderr_lines)
+        success = message["success"]
+        return {
+            "success": success,
+            "error": None if success else (error_output or message.get("error")),
+            "output": output + error_output
+        }
+
+    def stop(self) -> None:
+        """关闭标准输入让执行进程正常退出，超时未退出则强制结束整个进程组"""
+        self.alive = False
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+        self.kill()
+
+    def kill(self) -> None:
+        """强制结束执行进程及其进程组中残留的子进程"""
+        self.alive = False
+        if os.name == "nt":
+            if self.process.poll() is None:
+                subprocess.run(["taskkill", "/T", "/F", "/PID", str(self.process.pid)], capture_output=True)
+        else:
+            # 执行进程已退出时进程组中仍可能有残留的 driver / Chromium
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+    def _next_message(self, deadline: float) -> Optional[dict]:
+        """等待下一条协议消息，进程退出时返回 None，超过 deadline 抛出 TimeoutError"""
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise TimeoutError()
+        try:
+            return self._messages.get(timeout=remaining)
+        except queue.Empty:
+            raise TimeoutError()
+
+    def _read(self) -> None:
+        try:
+            for line in self.process.stdout:
+                try:
+                    self._messages.put(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"[Browser Pool] Unexpected runner output: {line.rstrip()}")
+        finally:
+            self.alive = False
+            self._messages.put(None)
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """获取当前 worker 进程的浏览器池，首次调用时创建"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool(settings.UI_BROWSER_POOL_SIZE, settings.UI_BROWSER_POOL_MAX_USES)
+                atexit.register(_pool.shutdown)
+    return _pool
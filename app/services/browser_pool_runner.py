@@ -0,0 +1,270 @@
+"""
+浏览器池的常驻执行进程
+
+由 app.services.browser_pool 启动，启动时只创建一次 Playwright 和 Chromium，
+之后从标准输入逐行读取任务（JSON），在同一个解释器中执行用例脚本。
+
+用例脚本照常调用 sync_playwright() 和 p.chromium.launch()，这里把 sync_playwright
+替换为共享实例：launch() 返回已启动的浏览器，脚本创建的 context 在用例结束后统一关闭，
+不同用例之间通过独立的 browser context 隔离。
+
+脚本的全局变量每次执行都是新的命名空间；执行结束后卸载脚本期间导入的、不属于 Python
+安装目录（标准库和 site-packages）的模块（例如与脚本放在一起的辅助模块），并恢复
+sys.path 和 sys.argv。标准库和第三方库的模块保留在解释器中（部分 C 扩展不能重复加载），
+它们的模块级状态会在之后的脚本间共享，直到执行进程达到使用次数被回收。
+
+与父进程的通信协议（标准输出，每行一个 JSON）：
+    {"ready": true}                                  浏览器启动完成
+    {"stream": "stdout" | "stderr", "line": "..."}   脚本输出
+    {"done": true, "success": bool, "error": str}    用例执行结束
+
+本文件作为独立脚本运行，不导入 app 包
+"""
+import json
+import os
+import runpy
+import site
+import sys
+import traceback
+
+# 协议使用原始标准输出，脚本或子进程直接写 fd 1 的内容转到标准错误
+_protocol = os.fdopen(os.dup(1), "w", encoding="utf-8", buffering=1)
+os.dup2(2, 1)
+
+
+def _send(message: dict) -> None:
+    _protocol.write(json.dumps(message, ensure_ascii=False) + "\n")
+    _protocol.flush()
+
+
+class _ProtocolWriter:
+    """替代 sys.stdout / sys.stderr，按行把脚本输出转发给父进程"""
+
+    def __init__(self, stream: str):
+        self.stream = stream
+        self._buffer = ""
+
+    def write(self, text: str) -> int:
+        self._buffer += text
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            _send({"stream": self.stream, "line": line + "\n"})
+        return len(text)
+
+    def flush(self) -> None:
+        if self._buffer:
+            _send({"stream": self.stream, "line": self._buffer})
+            self._buffer = ""
+
+    def isatty(self) -> bool:
+        return False
+
+
+class _SharedBrowser:
+    """包装常驻浏览器：close() 只关闭通过它创建的 context，不关闭浏览器本身"""
+
+    def __init__(self, owner: "_SharedPlaywright", browser):
+        self._owner = owner
+        self._browser = browser
+        self._contexts = []
+
+    @property
+    def contexts(self):
+        return list(self._contexts)
+
+    def new_context(self, **kwargs):
+        context = self._browser.new_context(**kwargs)
+        self._contexts.append(context)
+        self._owner.contexts.append(context)
+        return context
+
+    def new_page(self, **kwargs):
+        return self.new_context(**kwargs).new_page()
+
+    def close(self, **kwargs) -> None:
+        for context in self._contexts:
+            _close_quietly(context)
+        self._contexts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+class _SharedBrowserType:
+    """chromium 的 launch() 返回常驻浏览器，其他浏览器类型照常启动并在用例结束后关闭"""
+
+    def __init__(self, owner: "_SharedPlaywright", browser_type, browser=None):
+        self._owner = owner
+        self._browser_type = browser_type
+        self._browser = browser
+
+    def launch(self, **kwargs):
+        if self._browser is not None and self._browser.is_connected():
+            return _SharedBrowser(self._owner, self._browser)
+        browser = self._browser_type.launch(**kwargs)
+        self._owner.launched.append(browser)
+        return browser
+
+    def launch_persistent_context(self, *args, **kwargs):
+        context = self._browser_type.launch_persistent_context(*args, **kwargs)
+        self._owner.contexts.append(context)
+        return context
+
+    def __getattr__(self, name):
+        return getattr(self._browser_type, name)
+
+
+class _SharedPlaywright:
+    """替代 sync_playwright() 的返回值，既可用作上下文管理器，也支持 start()/stop()"""
+
+    def __init__(self, playwright, browser):
+        self._playwright = playwright
+        self._browser = browser
+        self.contexts = []
+        self.launched = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close_all()
+        return False
+
+    def start(self):
+        return self
+
+    def stop(self) -> None:
+        self.close_all()
+
+    @property
+    def chromium(self):
+        return _SharedBrowserType(self, self._playwright.chromium, self._browser)
+
+    @property
+    def firefox(self):
+        return _SharedBrowserType(self, self._playwright.firefox)
+
+    @property
+    def webkit(self):
+        return _SharedBrowserType(self, self._playwright.webkit)
+
+    def close_all(self) -> None:
+        for context in self.contexts:
+            _close_quietly(context)
+        for browser in self.launched:
+            _close_quietly(browser)
+        self.contexts = []
+        self.launched = []
+
+    def __getattr__(self, name):
+        return getattr(self._playwright, name)
+
+
+def _close_quietly(target) -> None:
+    try:
+        target.close()
+    except Exception:
+        pass
+
+
+# Python 安装目录（包括用户目录下的 site-packages），其中的模块不会被卸载
+_INSTALL_PREFIXES = tuple(
+    os.path.join(os.path.abspath(prefix), "")
+    for prefix in {
+        sys.prefix, sys.base_prefix, sys.exec_prefix, sys.base_exec_prefix,
+        site.getusersitepackages(), *site.getsitepackages()
+    }
+)
+
+
+def _is_library_module(path: str) -> bool:
+    path = os.path.abspath(path)
+    parts = path.split(os.sep)
+    return path.startswith(_INSTALL_PREFIXES) or "site-packages" in parts or "dist-packages" in parts
+
+
+def _unload_script_modules(before) -> None:
+    """卸载脚本执行期间导入的、位于 Python 安装目录之外的模块"""
+    for name, module in list(sys.modules.items()):
+        if name in before:
+            continue
+        path = getattr(module, "__file__", None)
+        if path and not _is_library_module(path):
+            del sys.modules[name]
+
+
+def _run_job(job: dict, playwright, browser, sync_api) -> dict:
+    """在当前解释器中执行一个用例脚本"""
+    shared = _SharedPlaywright(playwright, browser)
+    sync_api.sync_playwright = lambda: shared
+
+    script_path = job["script_path"]
+    modules_before = set(sys.modules)
+    path_before, argv_before = list(sys.path), list(sys.argv)
+    sys.argv = [script_path]
+    os.environ["SCREENSHOT_DIR"] = job["screenshot_dir"]
+    previous_cwd = os.getcwd()
+    os.chdir(os.path.dirname(script_path) or previous_cwd)
+
+    stdout, stderr = _ProtocolWriter("stdout"), _ProtocolWriter("stderr")
+    sys.stdout, sys.stderr = stdout, stderr
+    error = None
+    try:
+        runpy.run_path(script_path, run_name="__main__")
+        success = True
+    except SystemExit as e:
+        success = e.code in (None, 0)
+        if not success:
+            error = f"Script exited with code {e.code}"
+    except BaseException:
+        traceback.print_exc()
+        success = False
+        error = traceback.format_exc()
+    finally:
+        stdout.flush()
+        stderr.flush()
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        os.chdir(previous_cwd)
+        shared.close_all()
+        sys.path[:], sys.argv = path_before, argv_before
+        _unload_script_modules(modules_before)
+
+    return {"done": True, "success": success, "error": error}
+
+
+def main() -> None:
+    try:
+        import playwright.sync_api as sync_api
+
+        playwright = sync_api.sync_playwright().start()
+        browser = playwright.chromium.launch(
+            headless=True,
+            args=["--disable-blink-features=AutomationControlled", "--no-sandbox"]
+        )
+    except Exception:
+        _send({"ready": False, "error": traceback.format_exc()})
+        sys.exit(1)
+
+    _send({"ready": True})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        if not browser.is_connected():
+            _send({"done": True, "success": False, "error": "Pooled browser disconnected"})
+            sys.exit(1)
+        _send(_run_job(json.loads(line), playwright, browser, sync_api))
+
+    _close_quietly(browser)
+    playwright.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+import redis
+from sqlalchemy import inspect
+from app import models
+from app.services.assertions import compile_assertions
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# 用例修改后广播失效消息的 Redis 频道，消息为用例ID列表的 JSON
+INVALIDATION_CHANNEL = "api_case_cache:invalidate"
+
+
+class CaseCache:
+    """
+    worker 进程内的API用例定义缓存（LRU）
+
+    缓存不关联数据库会话的用例副本，并预先编译断言；每个条目带有用例的 updated_at，
+    取用前由调用方用一次只查询 (id, updated_at) 的批量查询确认版本没有变化。
+    用例被修改或删除时 API 进程广播失效消息，收到后立即淘汰对应条目
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[Any, models.APITestCase]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, case_id: int, version: Any) -> Optional[models.APITestCase]:
+        """版本一致时返回缓存的用例，否则返回 None"""
+        with self._lock:
+            entry = self._entries.get(case_id)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(case_id)
+            return entry[1]
+
+    def __contains__(self, case_id: int) -> bool:
+        return case_id in self._entries
+
+    def put(self, case: models.APITestCase) -> models.APITestCase:
+        """缓存从数据库加载的用例，返回可以跨任务、跨线程只读使用的副本"""
+        detached = _detach(case)
+        if detached.assertions:
+            compile_assertions(detached.assertions)
+        if self.max_size <= 0:
+            return detached
+        with self._lock:
+            self._entries[detached.id] = (detached.updated_at, detached)
+            self._entries.move_to_end(detached.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return detached
+
+    def invalidate(self, case_ids: Iterable[int]) -> None:
+        with self._lock:
+            for case_id in case_ids:
+                self._entries.pop(case_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+case_cache = CaseCache(settings.API_CASE_CACHE_SIZE)
+
+_listener_pid: Optional[int] = None
+_listener_lock = threading.Lock()
+_publisher: Optional[redis.Redis] = None
+
+
+def ensure_invalidation_listener() -> None:
+    """
+    在当前进程中启动订阅失效消息的后台线程（每个进程只启动一次）
+
+    fork 出的子进程不会继承父进程的线程，首次使用时清空继承来的缓存并重新启动
+    """
+    global _listener_pid
+    if _listener_pid == os.getpid() or case_cache.max_size <= 0:
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        case_cache.clear()
+        threading.Thread(target=_listen, name="case-cache-invalidation", daemon=True).start()
+        _listener_pid = os.getpid()
+
+
+def publish_case_invalidation(case_ids: List[int]) -> None:
+    """
+    广播用例失效消息（在修改用例的事务提交后调用）
+
+    发送失败只记录日志：worker 取用缓存前还会比对 updated_at
+    """
+    global _publisher
+    if not case_ids:
+        return
+    try:
+        if _publisher is None:
+            _publisher = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+        _publisher.publish(INVALIDATION_CHANNEL, json.dumps(case_ids))
+    except Exception as e:
+        logger.warning(f"[Case Cache] Failed to publish invalidation for {len(case_ids)} cases: {e}")
+
+
+def _listen() -> None:
+    while True:
+        try:
+            client = redis.Redis.from_url(settings.REDIS_URL)
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            # 订阅建立之前（或断线期间）的失效消息已经丢失
+            case_cache.clear()
+            for message in pubsub.listen():
+                try:
+                    case_cache.invalidate(json.loads(message["data"]))
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"[Case Cache] Ignoring malformed invalidation message: {e}")
+        except Exception as e:
+            logger.warning(f"[Case Cache] Redis pub/sub error, reconnecting: {e}")
+            time.sleep(1)
+
+
+def _detach(case: models.APITestCase) -> models.APITestCase:
+    return models.APITestCase(**{
+        attr.key: getattr(case, attr.key) for attr in inspect(models.APITestCase).column_attrs
+    })
@@ -0,0 +1,143 @@
+from typing import Dict, Any, Iterable, List, Optional
+
+
+class LatencyHistogram:
+    """
+    可合并的响应时间直方图（HDR Histogram 风格的对数-线性分桶）
+
+    小于 2^(precision_bits+1) 毫秒的值按 1 毫秒精确计数，更大的值按 2 的幂分段，
+    每段内再线性划分 2^precision_bits 个桶，相对误差不超过 1/2^(precision_bits+1)。
+    计数以稀疏字典保存，相同精度的直方图可以直接相加合并，
+    因此可以跨采样标签、时间窗口和多次报告计算任意百分位数
+    """
+
+    DEFAULT_PRECISION_BITS = 8
+
+    def __init__(self, precision_bits: int = DEFAULT_PRECISION_BITS):
+        self.precision_bits = precision_bits
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.counts: Dict[int, int] = {}
+        self._sub_count = 1 << precision_bits
+        self._linear_limit = 1 << (precision_bits + 1)
+
+    def record(self, value: float, count: int = 1) -> None:
+        """记录一个响应时间（毫秒）"""
+        if value < 0:
+            value = 0.0
+        index = self._index_for(int(round(value)))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """将另一个直方图合并到当前直方图"""
+        if other.precision_bits != self.precision_bits:
+            raise ValueError(
+                f"Cannot merge histograms with different precision: {self.precision_bits} != {other.precision_bits}"
+            )
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def percentile(self, fraction: float) -> float:
+        """
+        返回百分位数（fraction 取值 0-1）
+
+        与按排序列表取 int(n * fraction) 下标的方式保持一致
+        """
+        if self.count == 0:
+            return 0.0
+        rank = min(int(self.count * fraction), self.count - 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen > rank:
+                return self._clamp(self._value_for(index))
+        return self._clamp(self._value_for(max(self.counts)))
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可存入 JSON 列的紧凑结构（桶下标和计数分列存储）"""
+        indexes = sorted(self.counts)
+        return {
+            "precision_bits": self.precision_bits,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "indexes": indexes,
+            "counts": [self.counts[i] for i in indexes],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        histogram = cls(data.get("precision_bits", cls.DEFAULT_PRECISION_BITS))
+        histogram.count = data.get("count", 0)
+        histogram.total = data.get("total", 0.0)
+        histogram.min = data.get("min")
+        histogram.max = data.get("max")
+        histogram.counts = dict(zip(data.get("indexes", []), data.get("counts", [])))
+        return histogram
+
+    @classmethod
+    def merge_all(cls, histograms: Iterable["LatencyHistogram"]) -> "LatencyHistogram":
+        """合并多个直方图，返回新的直方图"""
+        merged = None
+        for histogram in histograms:
+            if merged is None:
+                merged = cls(histogram.precision_bits)
+            merged.merge(histogram)
+        return merged if merged is not None else cls()
+
+    def _index_for(self, value: int) -> int:
+        if value < self._linear_limit:
+            return value
+        shift = value.bit_length() - (self.precision_bits + 1)
+        return self._linear_limit + (shift - 1) * self._sub_count + ((value >> shift) - self._sub_count)
+
+    def _value_for(self, index: int) -> float:
+        """桶的代表值：线性区为精确值，对数区取桶的中点"""
+        if index < self._linear_limit:
+            return float(index)
+        shift = (index - self._linear_limit) // self._sub_count + 1
+        sub_index = (index - self._linear_limit) % self._sub_count + self._sub_count
+        lowest = sub_index << shift
+        return lowest + ((1 << shift) - 1) / 2
+
+    def _clamp(self, value: float) -> float:
+        if self.min is not None and value < self.min:
+            return self.min
+        if self.max is not None and value > self.max:
+            return self.max
+        return value
+
+
+def percentiles_from_dicts(
+    histograms: List[Dict[str, Any]],
+    percentiles: List[float]
+) -> Dict[str, Any]:
+    """合并多个序列化的直方图并计算百分位数（percentiles 取值 0-100）"""
+    merged = LatencyHistogram.merge_all(LatencyHistogram.from_dict(h) for h in histograms)
+    return {
+        "count": merged.count,
+        "average": merged.mean,
+        "min": merged.min or 0.0,
+        "max": merged.max or 0.0,
+        "percentiles": {f"p{p:g}": merged.percentile(p / 100) for p in percentiles},
+    }
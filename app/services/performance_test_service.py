@@ -1,18 +1,31 @@
 import subprocess
 import os
+import csv
+import io
+import time
+import shutil
+import signal
+import logging
 import xml.etree.ElementTree as ET
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 from app.models import PerformanceTest
 from app.schemas import PerformanceTestResult
+from app.services.latency_histogram import LatencyHistogram
 from config import settings
 
+logger = logging.getLogger(__name__)
 
-def run_performance_test(test: PerformanceTest) -> PerformanceTestResult:
+JMETER_TIMEOUT = 3600  # 1小时超时
+
+
+def run_performance_test(test: PerformanceTest, progress_callback=None) -> PerformanceTestResult:
     """
     执行性能测试
     
-    使用subprocess调用JMeter命令行执行JMX文件
-    然后解析JTL结果文件，提取关键性能指标
+    使用subprocess调用JMeter命令行执行JMX文件，运行期间持续增量读取JTL结果文件，
+    通过 progress_callback(progress, current_step, status, metrics) 推送滚动指标；
+    错误率或p99超过用例配置的阈值时提前终止JMeter。
+    运行结束后由已读取的采样得出关键性能指标
     """
     if not test.jmx_file_path or not os.path.exists(test.jmx_file_path):
         return PerformanceTestResult(
@@ -27,181 +40,880 @@ def run_performance_test(test: PerformanceTest) -> PerformanceTestResult:
     # 生成结果文件路径
     jtl_file = os.path.join(settings.JMETER_RESULTS_DIR, f"result_{test.id}.jtl")
     html_report_dir = os.path.join(settings.JMETER_RESULTS_DIR, f"report_{test.id}")
+    log_file = os.path.join(settings.JMETER_RESULTS_DIR, f"jmeter_{test.id}.log")
+    
+    thresholds = {
+        "error_rate": test.abort_error_rate,
+        "p99_response_time": test.abort_p99_response_time
+    }
     
     try:
-        # 执行JMeter命令
-        # jmeter -n -t [file.jmx] -l [result.jtl] -e -o [html_report_dir]
-        jmeter_cmd = [
-            "jmeter",
-            "-n",  # 非GUI模式
-            "-t", test.jmx_file_path,  # 测试计划文件
-            "-l", jtl_file,  # 结果文件
-            "-e",  # 生成HTML报告
-            "-o", html_report_dir  # HTML报告输出目录
-        ]
-        
-        # 检查JMeter是否可用
-        jmeter_path = os.getenv("JMETER_HOME")
-        if jmeter_path:
-            jmeter_cmd[0] = os.path.join(jmeter_path, "bin", "jmeter")
-        
-        result = subprocess.run(
-            jmeter_cmd,
-            capture_output=True,
-            text=True,
-            timeout=3600  # 1小时超时
+        return _run_jmeter(
+            test.jmx_file_path,
+            jtl_file,
+            html_report_dir,
+            log_file,
+            thresholds=thresholds,
+            progress_callback=progress_callback
         )
-        
-        if result.returncode != 0:
-            return PerformanceTestResult(
-                success=False,
-                duration=0,
-                error=f"JMeter execution failed: {result.stderr}"
+    except Exception as e:
+        return PerformanceTestResult(
+            success=False,
+            duration=0,
+            error=f"Error executing performance test: {str(e)}"
+        )
+
+
+def _run_jmeter(
+    jmx_file: str,
+    jtl_file: str,
+    html_report_dir: str,
+    log_file: str,
+    thresholds: Optional[Dict[str, Optional[float]]] = None,
+    progress_callback=None,
+    generate_report: bool = True
+) -> PerformanceTestResult:
+    """运行一次 JMeter 并在运行期间跟踪 JTL 文件"""
+    # JMeter 会追加写入已存在的JTL文件，且要求HTML报告目录为空
+    if os.path.exists(jtl_file):
+        os.remove(jtl_file)
+    shutil.rmtree(html_report_dir, ignore_errors=True)
+    
+    # 执行JMeter命令
+    # jmeter -n -t [file.jmx] -l [result.jtl] -e -o [html_report_dir]
+    jmeter_cmd = [
+        "jmeter",
+        "-n",  # 非GUI模式
+        "-t", jmx_file,  # 测试计划文件
+        "-l", jtl_file,  # 结果文件
+        "-e",  # 生成HTML报告
+        "-o", html_report_dir  # HTML报告输出目录
+    ]
+    if not generate_report:
+        jmeter_cmd = jmeter_cmd[:-3]
+    
+    # 检查JMeter是否可用
+    jmeter_path = os.getenv("JMETER_HOME")
+    if jmeter_path:
+        jmeter_cmd[0] = os.path.join(jmeter_path, "bin", "jmeter")
+    
+    stats = _LiveJtlStats(settings.PERF_LIVE_WINDOW_SECONDS)
+    tail = _JtlTail(jtl_file, stats)
+    abort_reason = None
+    start_time = time.time()
+    
+    # JMeter 会持续输出 summariser 日志，写入文件避免管道写满阻塞进程
+    with open(log_file, "wb") as log:
+        # 新建进程组，终止时连同 jmeter 启动脚本拉起的 java 进程一起结束
+        if os.name == "nt":
+            process = subprocess.Popen(
+                jmeter_cmd,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
             )
-        
-        # 解析JTL文件提取指标
+        else:
+            process = subprocess.Popen(jmeter_cmd, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        try:
+            while True:
+                try:
+                    process.wait(timeout=settings.PERF_LIVE_INTERVAL_SECONDS)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                
+                if time.time() - start_time > JMETER_TIMEOUT:
+                    _stop_process(process)
+                    return PerformanceTestResult(
+                        success=False,
+                        duration=0,
+                        error="Performance test execution timeout (exceeded 1 hour)"
+                    )
+                
+                # 跟踪出错时本次运行不再推送滚动指标、不再检查中止阈值，让 JMeter 正常跑完，
+                # 结束后再完整解析 JTL 文件
+                live_metrics = None
+                if tail is not None:
+                    try:
+                        tail.poll()
+                        live_metrics = stats.live_metrics()
+                    except Exception as e:
+                        logger.warning(f"Live JTL parsing failed, disabling live metrics for this run: {e}")
+                        tail = None
+                if live_metrics is not None:
+                    abort_reason = _check_abort_thresholds(live_metrics["rolling"], thresholds or {})
+                
+                if progress_callback:
+                    progress_callback(
+                        None,
+                        "执行中",
+                        f"已运行 {int(time.time() - start_time)} 秒" + (
+                            f"，已完成 {stats.total} 个采样" if live_metrics is not None else ""
+                        ),
+                        live_metrics
+                    )
+                
+                if abort_reason:
+                    logger.warning(f"Aborting JMeter run: {abort_reason}")
+                    _stop_process(process)
+                    break
+        except BaseException:
+            _stop_process(process)
+            raise
+    
+    # 读取剩余的采样；跟踪过程出错时退回到完整解析
+    metrics = None
+    if tail is not None:
+        try:
+            tail.poll()
+            metrics = stats.to_metrics()
+        except Exception as e:
+            logger.warning(f"Incremental JTL parsing failed, re-parsing {jtl_file}: {e}")
+    if metrics is None:
         metrics = _parse_jtl_file(jtl_file)
-        
-        # 获取HTML报告路径
-        html_report_path = html_report_dir if os.path.exists(html_report_dir) else None
-        
+    
+    if abort_reason:
         return PerformanceTestResult(
-            success=True,
+            success=False,
             duration=metrics.get("duration", 0),
             metrics=metrics,
-            html_report_path=html_report_path,
-            error=None
+            error=f"Performance test aborted: {abort_reason}"
         )
-        
-    except subprocess.TimeoutExpired:
+    
+    if process.returncode != 0:
         return PerformanceTestResult(
             success=False,
             duration=0,
-            error="Performance test execution timeout (exceeded 1 hour)"
+            error=f"JMeter execution failed: {_read_log_tail(log_file)}"
+        )
+    
+    # 获取HTML报告路径
+    html_report_path = html_report_dir if os.path.exists(html_report_dir) else None
+    
+    return PerformanceTestResult(
+        success=True,
+        duration=metrics.get("duration", 0),
+        metrics=metrics,
+        html_report_path=html_report_path,
+        error=None
+    )
+
+
+def _stop_process(process: subprocess.Popen) -> None:
+    """终止 JMeter 进程树，超时未退出则强制结束"""
+    if process.poll() is not None:
+        return
+    
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        if os.name != "nt":
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        process.kill()
+        process.wait()
+
+
+def _read_log_tail(log_file: str, max_bytes: int = 4096) -> str:
+    """读取 JMeter 日志末尾，用作错误信息"""
+    try:
+        with open(log_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - max_bytes))
+            return f.read().decode("utf-8", errors="replace")
+    except OSError:
+        return ""
+
+
+def _check_abort_thresholds(rolling: Dict[str, Any], thresholds: Dict[str, Optional[float]]) -> Optional[str]:
+    """滚动指标超过阈值时返回终止原因"""
+    if rolling["samples"] < settings.PERF_ABORT_MIN_SAMPLES:
+        return None
+    
+    max_error_rate = thresholds.get("error_rate")
+    if max_error_rate is not None and rolling["error_rate"] > max_error_rate:
+        return f"error rate {rolling['error_rate']:.2f}% exceeded threshold {max_error_rate}%"
+    
+    max_p99 = thresholds.get("p99_response_time")
+    if max_p99 is not None and rolling["p99_response_time"] > max_p99:
+        return f"p99 response time {rolling['p99_response_time']:.0f}ms exceeded threshold {max_p99}ms"
+    
+    return None
+
+
+def split_jmx_for_shards(jmx_file: str, shard_count: int) -> List[str]:
+    """
+    将测试计划拆分为 shard_count 份，返回每个分片的 JMX 内容
+    
+    启用的线程组数量不少于分片数时，按轮询方式把线程组分配到各分片（其余线程组在该分片中禁用）；
+    否则每个分片保留全部线程组，并把各线程组的线程数平均分配到各分片。
+    setUp/tearDown 线程组在每个分片中都会保留
+    
+    需要平分线程数但线程数不是数字（例如 ${__P(threads)}）时抛出 ValueError，
+    否则每个分片都会以完整线程数运行，总压力变为 shard_count 倍
+    """
+    groups = _load_thread_groups(jmx_file)[1]
+    if len(groups) >= shard_count:
+        mode = "groups"
+    else:
+        mode = "threads"
+        names = [group.get("testname", "") for group in groups if _get_num_threads(group) is None]
+        if names:
+            raise ValueError(
+                f"Thread count of thread group(s) {', '.join(names)} is not a number, "
+                f"cannot split threads across {shard_count} workers"
+            )
+    
+    shards = []
+    for shard_index in range(shard_count):
+        tree, groups = _load_thread_groups(jmx_file)
+        for group_index, group in enumerate(groups):
+            if mode == "groups":
+                if group_index % shard_count != shard_index:
+                    group.set("enabled", "false")
+                continue
+            
+            num_threads = _get_num_threads(group)
+            if num_threads is None:
+                continue
+            share = num_threads // shard_count + (1 if shard_index < num_threads % shard_count else 0)
+            if share == 0:
+                group.set("enabled", "false")
+            else:
+                _set_num_threads(group, share)
+        
+        shards.append(ET.tostring(tree.getroot(), encoding="unicode"))
+    return shards
+
+
+def run_performance_shard(
+    test: PerformanceTest,
+    shard_index: int,
+    jmx_content: str,
+    progress_callback=None
+) -> PerformanceTestResult:
+    """
+    在当前节点执行测试计划的一个分片
+    
+    分片 JMX 内容随任务消息下发，结果文件写在本节点的结果目录中，
+    只返回指标（包含可合并的直方图），不生成HTML报告
+    """
+    os.makedirs(settings.JMETER_RESULTS_DIR, exist_ok=True)
+    prefix = os.path.join(settings.JMETER_RESULTS_DIR, f"shard_{test.id}_{shard_index}")
+    jmx_file = f"{prefix}.jmx"
+    with open(jmx_file, "w", encoding="utf-8") as f:
+        f.write(jmx_content)
+    
+    try:
+        return _run_jmeter(
+            jmx_file,
+            f"{prefix}.jtl",
+            f"{prefix}_report",
+            f"{prefix}.log",
+            thresholds={
+                "error_rate": test.abort_error_rate,
+                "p99_response_time": test.abort_p99_response_time
+            },
+            progress_callback=progress_callback,
+            generate_report=False
         )
     except Exception as e:
         return PerformanceTestResult(
             success=False,
             duration=0,
-            error=f"Error executing performance test: {str(e)}"
+            error=f"Error executing performance test shard {shard_index}: {str(e)}"
         )
 
 
+def merge_metrics(metrics_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """合并多个节点的性能指标，百分位数由合并后的直方图计算"""
+    merged = _JtlStats()
+    for metrics in metrics_list:
+        merged.merge(_JtlStats.from_metrics(metrics))
+    return merged.to_metrics()
+
+
+_THREAD_NUM_PROPERTY = "ThreadGroup.num_threads"
+_SETUP_TEARDOWN_GROUPS = ("SetupThreadGroup", "PostThreadGroup")
+
+
+def _load_thread_groups(jmx_file: str):
+    """解析 JMX，返回 (tree, 启用的普通线程组列表)"""
+    tree = ET.parse(jmx_file)
+    groups = []
+    for elem in tree.iter():
+        test_class = elem.get("testclass", "")
+        if not test_class.endswith("ThreadGroup") or elem.tag in _SETUP_TEARDOWN_GROUPS:
+            continue
+        if elem.get("enabled", "true") != "true":
+            continue
+        groups.append(elem)
+    return tree, groups
+
+
+def _get_num_threads(group) -> Optional[int]:
+    for prop in group:
+        if prop.get("name") == _THREAD_NUM_PROPERTY:
+            try:
+                return int((prop.text or "").strip())
+            except ValueError:
+                return None
+    return None
+
+
+def _set_num_threads(group, value: int) -> None:
+    for prop in group:
+        if prop.get("name") == _THREAD_NUM_PROPERTY:
+            prop.text = str(value)
+
+
 def _parse_jtl_file(jtl_file: str) -> Dict[str, Any]:
     """
     解析JMeter的JTL结果文件
     
-    JTL文件格式通常是CSV或XML
-    这里提供XML格式的解析（JMeter默认XML格式）
+    JTL文件格式通常是CSV或XML，解析前根据文件开头判断格式。
+    两种格式都按采样逐条流式处理并增量聚合，内存占用与文件大小无关：
+    XML 使用 iterparse 并及时清理已处理的元素，CSV 使用 csv.reader 逐行读取
     """
-    metrics = {
-        "total_samples": 0,
-        "successful_samples": 0,
-        "failed_samples": 0,
-        "error_rate": 0.0,
-        "average_response_time": 0.0,
-        "min_response_time": 0.0,
-        "max_response_time": 0.0,
-        "p95_response_time": 0.0,
-        "p99_response_time": 0.0,
-        "throughput": 0.0,  # 请求/秒
-        "duration": 0.0
-    }
+    stats = _JtlStats()
     
     if not os.path.exists(jtl_file):
-        return metrics
+        return stats.to_metrics()
     
     try:
-        # 尝试解析为XML格式
-        tree = ET.parse(jtl_file)
-        root = tree.getroot()
-        
-        response_times = []
-        start_time = None
-        end_time = None
-        
-        # 解析每个HTTP采样结果
-        for sample in root.findall(".//httpSample"):
-            # 响应时间（毫秒）
-            elapsed = float(sample.get("t", 0))
-            response_times.append(elapsed)
-            
-            # 时间戳
-            ts = float(sample.get("ts", 0))
-            if start_time is None or ts < start_time:
-                start_time = ts
-            if end_time is None or ts > end_time:
-                end_time = ts
+        if _detect_jtl_format(jtl_file) == "xml":
+            _parse_xml_jtl(jtl_file, stats)
+        else:
+            _parse_csv_jtl(jtl_file, stats)
+    except Exception as e:
+        logger.error(f"Error parsing JTL file {jtl_file}: {e}")
+    
+    return stats.to_metrics()
+
+
+def _detect_jtl_format(jtl_file: str) -> str:
+    """根据文件开头的第一个非空白字符判断JTL格式（xml 或 csv）"""
+    with open(jtl_file, "rb") as f:
+        head = f.read(512)
+    head = head.lstrip(b"\xef\xbb\xbf").lstrip()
+    return "xml" if head.startswith(b"<") else "csv"
+
+
+def _parse_xml_jtl(jtl_file: str, stats: "_JtlStats") -> None:
+    """流式解析XML格式的JTL文件"""
+    _XmlSampleReader(stats).handle(ET.iterparse(jtl_file, events=("start", "end")))
+
+
+class _XmlSampleReader:
+    """处理 XML 解析事件，累加 httpSample 并清理已处理的元素"""
+    
+    def __init__(self, stats: "_JtlStats"):
+        self.stats = stats
+        self.depth = 0
+        self.root = None
+    
+    def handle(self, events) -> None:
+        for event, elem in events:
+            if event == "start":
+                if self.root is None:
+                    self.root = elem
+                self.depth += 1
+                continue
             
-            # 成功/失败
-            success = sample.get("s", "true").lower() == "true"
-            if success:
-                metrics["successful_samples"] += 1
+            self.depth -= 1
+            if elem.tag == "httpSample":
+                _add_xml_sample(self.stats, elem.attrib)
+            # 根节点的直接子元素处理完成后清空根节点，释放已解析的采样
+            if self.depth == 1:
+                self.root.clear()
+
+
+def _add_xml_sample(stats: "_JtlStats", attrib: Dict[str, str]) -> None:
+    """将一个 httpSample 元素的属性累加到统计结果中"""
+    stats.add(
+        elapsed=float(attrib.get("t", 0)),
+        timestamp=float(attrib.get("ts", 0)),
+        success=attrib.get("s", "true").lower() == "true",
+        label=attrib.get("lb", ""),
+        response_code=attrib.get("rc", ""),
+        size=int(attrib.get("by", 0) or 0)
+    )
+
+
+def _parse_csv_jtl(jtl_file: str, stats: "_JtlStats") -> None:
+    """流式解析CSV格式的JTL文件"""
+    with open(jtl_file, "r", encoding="utf-8", errors="replace", newline="", buffering=1024 * 1024) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        columns = _CsvColumns(header)
+        for row in reader:
+            _add_csv_row(stats, row, columns)
+
+
+class _CsvColumns:
+    """CSV 表头中各字段的列下标，避免 DictReader 为每行构造字典"""
+    
+    def __init__(self, header):
+        index = {name.strip(): i for i, name in enumerate(header)}
+        self.elapsed = index.get("elapsed")
+        self.timestamp = index.get("timeStamp")
+        self.success = index.get("success")
+        self.label = index.get("label")
+        self.response_code = index.get("responseCode")
+        self.bytes = index.get("bytes")
+        self.width = len(header)
+
+
+def _add_csv_row(stats: "_JtlStats", row, columns: _CsvColumns) -> None:
+    """将一行 CSV 采样累加到统计结果中"""
+    if len(row) < columns.width:
+        return
+    
+    elapsed = float(row[columns.elapsed]) if columns.elapsed is not None else 0.0
+    
+    timestamp = None
+    if columns.timestamp is not None:
+        try:
+            timestamp = float(row[columns.timestamp])
+        except ValueError:
+            # timeStamp 被配置为日期格式时无法计算持续时间
+            timestamp = None
+    
+    success = row[columns.success].lower() == "true" if columns.success is not None else True
+    label = row[columns.label] if columns.label is not None else ""
+    response_code = row[columns.response_code] if columns.response_code is not None else ""
+    size = int(row[columns.bytes] or 0) if columns.bytes is not None else 0
+    stats.add(
+        elapsed=elapsed,
+        timestamp=timestamp,
+        success=success,
+        label=label,
+        response_code=response_code,
+        size=size
+    )
+
+
+class _JtlTail:
+    """
+    增量读取运行中的 JMeter 正在写入的 JTL 文件
+    
+    每次 poll 只读取上次之后新增的字节：XML 交给 XMLPullParser，
+    CSV 只处理到最后一个引号之外的换行为止的完整记录（failureMessage 等字段可能带有
+    引号包裹的换行），未写完的部分留到下次
+    """
+    
+    def __init__(self, jtl_file: str, stats: "_JtlStats"):
+        self.jtl_file = jtl_file
+        self.stats = stats
+        self._offset = 0
+        self._format: Optional[str] = None
+        self._xml_parser = None
+        self._xml_reader = None
+        self._csv_pending = b""
+        self._csv_in_quotes = False
+        self._csv_columns: Optional[_CsvColumns] = None
+    
+    def poll(self) -> None:
+        if not os.path.exists(self.jtl_file):
+            return
+        
+        with open(self.jtl_file, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        if not data:
+            return
+        self._offset += len(data)
+        
+        if self._format is None:
+            head = data.lstrip(b"\xef\xbb\xbf").lstrip()
+            if not head:
+                return
+            self._format = "xml" if head.startswith(b"<") else "csv"
+            if self._format == "xml":
+                self._xml_parser = ET.XMLPullParser(events=("start", "end"))
+                self._xml_reader = _XmlSampleReader(self.stats)
+        
+        if self._format == "xml":
+            self._xml_parser.feed(data)
+            self._xml_reader.handle(self._xml_parser.read_events())
+        else:
+            self._feed_csv(data)
+    
+    def _feed_csv(self, data: bytes) -> None:
+        scanned = len(self._csv_pending)
+        data = self._csv_pending + data
+        end = self._last_record_end(data, scanned)
+        if end < 0:
+            self._csv_pending = data
+            return
+        self._csv_pending = data[end + 1:]
+        
+        text = data[:end + 1].decode("utf-8", errors="replace")
+        rows = csv.reader(io.StringIO(text, newline=""))
+        if self._csv_columns is None:
+            header = next(rows, None)
+            if not header:
+                return
+            self._csv_columns = _CsvColumns(header)
+        for row in rows:
+            _add_csv_row(self.stats, row, self._csv_columns)
+    
+    def _last_record_end(self, data: bytes, start: int) -> int:
+        """
+        返回 data 中最后一个位于引号之外的换行的位置，没有时返回 -1
+        
+        data[:start] 已在之前扫描过，其结尾的引号状态记录在 _csv_in_quotes 中；
+        转义的引号 "" 会切换两次状态，不影响结果。引号和换行都是单字节，可以直接扫描 UTF-8 字节
+        """
+        # 上次留下的部分中只有引号内的换行，只需扫描新读取的字节
+        in_quotes = self._csv_in_quotes
+        if not in_quotes and data.find(b'"', start) < 0:
+            return data.rfind(b"\n", start)
+        
+        end = -1
+        quote = data.find(b'"', start)
+        newline = data.find(b"\n", start)
+        while quote >= 0 or newline >= 0:
+            if newline < 0 or 0 <= quote < newline:
+                in_quotes = not in_quotes
+                quote = data.find(b'"', quote + 1)
             else:
-                metrics["failed_samples"] += 1
+                if not in_quotes:
+                    end = newline
+                newline = data.find(b"\n", newline + 1)
+        self._csv_in_quotes = in_quotes
+        return end
+
+
+class _LabelStats:
+    """单个采样标签的计数"""
+    
+    __slots__ = ("samples", "failed", "bytes", "histogram")
+    
+    def __init__(self):
+        self.samples = 0
+        self.failed = 0
+        self.bytes = 0
+        self.histogram = LatencyHistogram()
+
+
+class _JtlStats:
+    """
+    JTL 采样的增量统计
+    
+    单次遍历同时得到整体指标、按采样标签（lb）的指标、响应码分布和按秒的时间序列。
+    响应时间记录在可合并的 LatencyHistogram 中，除整体直方图外，
+    还按采样标签和时间窗口各保存一份，百分位数无需保存和排序全部响应时间
+    """
+    
+    def __init__(self, window_seconds: Optional[int] = None):
+        self.total = 0
+        self.successful = 0
+        self.failed = 0
+        self.bytes = 0
+        self.start_time: Optional[float] = None
+        self.end_time: Optional[float] = None
+        self.window_seconds = window_seconds or settings.PERF_SKETCH_WINDOW_SECONDS
+        self.histogram = LatencyHistogram()
+        self.labels: Dict[str, _LabelStats] = {}
+        self.response_codes: Dict[str, int] = {}
+        self.window_histograms: Dict[int, LatencyHistogram] = {}
+        # 每秒的 [采样数, 失败数, 响应时间总和, 最大响应时间, 字节数]
+        self.seconds: Dict[int, list] = {}
+    
+    def add(
+        self,
+        elapsed: float,
+        timestamp: Optional[float],
+        success: bool,
+        label: str = "",
+        response_code: str = "",
+        size: int = 0
+    ) -> None:
+        self.total += 1
+        if success:
+            self.successful += 1
+        else:
+            self.failed += 1
+        self.bytes += size
         
-        metrics["total_samples"] = len(response_times)
+        self.histogram.record(elapsed)
         
-        if response_times:
-            # 计算统计指标
-            response_times_sorted = sorted(response_times)
-            metrics["average_response_time"] = sum(response_times) / len(response_times)
-            metrics["min_response_time"] = min(response_times)
-            metrics["max_response_time"] = max(response_times)
-            
-            # 计算百分位数
-            if len(response_times_sorted) > 0:
-                p95_index = int(len(response_times_sorted) * 0.95)
-                p99_index = int(len(response_times_sorted) * 0.99)
-                metrics["p95_response_time"] = response_times_sorted[min(p95_index, len(response_times_sorted) - 1)]
-                metrics["p99_response_time"] = response_times_sorted[min(p99_index, len(response_times_sorted) - 1)]
+        label_stats = self.labels.get(label)
+        if label_stats is None:
+            label_stats = self.labels[label] = _LabelStats()
+        label_stats.samples += 1
+        label_stats.bytes += size
+        if not success:
+            label_stats.failed += 1
+        label_stats.histogram.record(elapsed)
+        
+        self.response_codes[response_code] = self.response_codes.get(response_code, 0) + 1
+        
+        if timestamp:
+            if self.start_time is None or timestamp < self.start_time:
+                self.start_time = timestamp
+            if self.end_time is None or timestamp > self.end_time:
+                self.end_time = timestamp
             
-            # 计算错误率
-            if metrics["total_samples"] > 0:
-                metrics["error_rate"] = (metrics["failed_samples"] / metrics["total_samples"]) * 100
+            second = int(timestamp // 1000)
+            point = self.seconds.get(second)
+            if point is None:
+                point = self.seconds[second] = [0, 0, 0.0, 0.0, 0]
+            point[0] += 1
+            if not success:
+                point[1] += 1
+            point[2] += elapsed
+            if elapsed > point[3]:
+                point[3] = elapsed
+            point[4] += size
             
-            # 计算吞吐量（请求/秒）
-            if start_time and end_time:
-                duration_seconds = (end_time - start_time) / 1000.0
-                metrics["duration"] = duration_seconds
-                if duration_seconds > 0:
-                    metrics["throughput"] = metrics["total_samples"] / duration_seconds
-        
-    except ET.ParseError:
-        # 如果不是XML格式，尝试CSV格式
-        try:
-            import csv
-            with open(jtl_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                response_times = []
-                
-                for row in reader:
-                    elapsed = float(row.get("elapsed", 0))
-                    response_times.append(elapsed)
-                    
-                    success = row.get("success", "true").lower() == "true"
-                    if success:
-                        metrics["successful_samples"] += 1
-                    else:
-                        metrics["failed_samples"] += 1
-                
-                metrics["total_samples"] = len(response_times)
-                
-                if response_times:
-                    response_times_sorted = sorted(response_times)
-                    metrics["average_response_time"] = sum(response_times) / len(response_times)
-                    metrics["min_response_time"] = min(response_times)
-                    metrics["max_response_time"] = max(response_times)
-                    
-                    p95_index = int(len(response_times_sorted) * 0.95)
-                    p99_index = int(len(response_times_sorted) * 0.99)
-                    metrics["p95_response_time"] = response_times_sorted[min(p95_index, len(response_times_sorted) - 1)]
-                    metrics["p99_response_time"] = response_times_sorted[min(p99_index, len(response_times_sorted) - 1)]
-                    
-                    if metrics["total_samples"] > 0:
-                        metrics["error_rate"] = (metrics["failed_samples"] / metrics["total_samples"]) * 100
-        except Exception as e:
-            print(f"Error parsing JTL file: {e}")
+            # 时间窗口以窗口起始的 Unix 秒为键
+            window = second // self.window_seconds * self.window_seconds
+            window_histogram = self.window_histograms.get(window)
+            if window_histogram is None:
+                window_histogram = self.window_histograms[window] = LatencyHistogram()
+            window_histogram.record(elapsed)
+    
+    def label_metrics(self, duration_seconds: float) -> Dict[str, Any]:
+        """按采样标签汇总的指标"""
+        result = {}
+        for label, label_stats in self.labels.items():
+            histogram = label_stats.histogram
+            result[label] = {
+                "samples": label_stats.samples,
+                "failed_samples": label_stats.failed,
+                "error_rate": label_stats.failed / label_stats.samples * 100,
+                "average_response_time": histogram.mean,
+                "min_response_time": histogram.min,
+                "max_response_time": histogram.max,
+                "p95_response_time": histogram.percentile(0.95),
+                "p99_response_time": histogram.percentile(0.99),
+                "throughput": label_stats.samples / duration_seconds if duration_seconds > 0 else 0.0,
+                "bytes": label_stats.bytes
+            }
+        return result
+    
+    def timeseries(self) -> Dict[str, list]:
+        """按秒的时间序列，以列数组形式保存，便于前端直接绘图"""
+        seconds = sorted(self.seconds)
+        points = [self.seconds[second] for second in seconds]
+        return {
+            "timestamps": seconds,
+            "samples": [p[0] for p in points],
+            "errors": [p[1] for p in points],
+            "average_response_time": [p[2] / p[0] for p in points],
+            "max_response_time": [p[3] for p in points],
+            "bytes": [p[4] for p in points]
+        }
     
-    return metrics
+    def sketches(self) -> Dict[str, Any]:
+        """序列化的直方图，随报告保存，供跨标签、时间窗口和报告合并计算百分位数"""
+        windows = sorted(self.window_histograms)
+        return {
+            "overall": self.histogram.to_dict(),
+            "labels": {label: stats.histogram.to_dict() for label, stats in self.labels.items()},
+            "window_seconds": self.window_seconds,
+            "windows": {
+                "starts": windows,
+                "histograms": [self.window_histograms[w].to_dict() for w in windows]
+            }
+        }
+    
+    def to_metrics(self) -> Dict[str, Any]:
+        metrics = {
+            "total_samples": self.total,
+            "successful_samples": self.successful,
+            "failed_samples": self.failed,
+            "error_rate": 0.0,
+            "average_response_time": 0.0,
+            "min_response_time": 0.0,
+            "max_response_time": 0.0,
+            "p95_response_time": 0.0,
+            "p99_response_time": 0.0,
+            "throughput": 0.0,  # 请求/秒
+            "bytes_total": 0,
+            "bytes_per_second": 0.0,
+            "duration": 0.0
+        }
+        
+        if self.total == 0:
+            return metrics
+        
+        metrics["average_response_time"] = self.histogram.mean
+        metrics["min_response_time"] = self.histogram.min
+        metrics["max_response_time"] = self.histogram.max
+        metrics["p95_response_time"] = self.histogram.percentile(0.95)
+        metrics["p99_response_time"] = self.histogram.percentile(0.99)
+        metrics["error_rate"] = (self.failed / self.total) * 100
+        
+        # 计算吞吐量（请求/秒）
+        if self.start_time and self.end_time:
+            duration_seconds = (self.end_time - self.start_time) / 1000.0
+            metrics["duration"] = duration_seconds
+            if duration_seconds > 0:
+                metrics["throughput"] = self.total / duration_seconds
+                metrics["bytes_per_second"] = self.bytes / duration_seconds
+        
+        metrics["bytes_total"] = self.bytes
+        metrics["start_timestamp"] = self.start_time
+        metrics["end_timestamp"] = self.end_time
+        metrics["labels"] = self.label_metrics(metrics["duration"])
+        metrics["response_codes"] = self.response_codes
+        metrics["timeseries"] = self.timeseries()
+        metrics["sketches"] = self.sketches()
+        return metrics
+    
+    @classmethod
+    def from_metrics(cls, metrics: Dict[str, Any]) -> "_JtlStats":
+        """由 to_metrics 的结果还原统计对象，用于合并多个 JMeter 节点的结果"""
+        sketches = metrics.get("sketches") or {}
+        stats = cls(sketches.get("window_seconds"))
+        stats.total = metrics.get("total_samples", 0)
+        stats.successful = metrics.get("successful_samples", 0)
+        stats.failed = metrics.get("failed_samples", 0)
+        stats.bytes = metrics.get("bytes_total", 0)
+        stats.start_time = metrics.get("start_timestamp")
+        stats.end_time = metrics.get("end_timestamp")
+        stats.response_codes = dict(metrics.get("response_codes") or {})
+        
+        if sketches:
+            stats.histogram = LatencyHistogram.from_dict(sketches["overall"])
+            windows = sketches["windows"]
+            stats.window_histograms = {
+                start: LatencyHistogram.from_dict(h) for start, h in zip(windows["starts"], windows["histograms"])
+            }
+        
+        for label, label_metrics in (metrics.get("labels") or {}).items():
+            label_stats = stats.labels[label] = _LabelStats()
+            label_stats.samples = label_metrics["samples"]
+            label_stats.failed = label_metrics["failed_samples"]
+            label_stats.bytes = label_metrics["bytes"]
+            if label in sketches.get("labels", {}):
+                label_stats.histogram = LatencyHistogram.from_dict(sketches["labels"][label])
+        
+        series = metrics.get("timeseries") or {}
+        for i, second in enumerate(series.get("timestamps", [])):
+            samples = series["samples"][i]
+            stats.seconds[second] = [
+                samples,
+                series["errors"][i],
+                series["average_response_time"][i] * samples,
+                series["max_response_time"][i],
+                series["bytes"][i]
+            ]
+        return stats
+    
+    def merge(self, other: "_JtlStats") -> "_JtlStats":
+        """合并另一份统计（例如分布式执行时其他节点的结果）"""
+        self.total += other.total
+        self.successful += other.successful
+        self.failed += other.failed
+        self.bytes += other.bytes
+        
+        if other.start_time is not None and (self.start_time is None or other.start_time < self.start_time):
+            self.start_time = other.start_time
+        if other.end_time is not None and (self.end_time is None or other.end_time > self.end_time):
+            self.end_time = other.end_time
+        
+        self.histogram.merge(other.histogram)
+        
+        for label, other_stats in other.labels.items():
+            label_stats = self.labels.get(label)
+            if label_stats is None:
+                label_stats = self.labels[label] = _LabelStats()
+            label_stats.samples += other_stats.samples
+            label_stats.failed += other_stats.failed
+            label_stats.bytes += other_stats.bytes
+            label_stats.histogram.merge(other_stats.histogram)
+        
+        for code, count in other.response_codes.items():
+            self.response_codes[code] = self.response_codes.get(code, 0) + count
+        
+        for window, histogram in other.window_histograms.items():
+            if window in self.window_histograms:
+                self.window_histograms[window].merge(histogram)
+            else:
+                self.window_histograms[window] = LatencyHistogram.from_dict(histogram.to_dict())
+        
+        for second, point in other.seconds.items():
+            mine = self.seconds.get(second)
+            if mine is None:
+                self.seconds[second] = list(point)
+            else:
+                mine[0] += point[0]
+                mine[1] += point[1]
+                mine[2] += point[2]
+                mine[3] = max(mine[3], point[3])
+                mine[4] += point[4]
+        return self
 
+
+class _LiveJtlStats(_JtlStats):
+    """
+    运行中的统计
+    
+    在完整统计之外保留最近 rolling_seconds 秒的每秒直方图，用于计算滚动的吞吐量、错误率和百分位数
+    """
+    
+    def __init__(self, rolling_seconds: int):
+        super().__init__()
+        self.rolling_seconds = rolling_seconds
+        self.recent: Dict[int, LatencyHistogram] = {}
+    
+    def add(self, elapsed, timestamp, success, label="", response_code="", size=0) -> None:
+        super().add(elapsed, timestamp, success, label, response_code, size)
+        if timestamp:
+            second = int(timestamp // 1000)
+            histogram = self.recent.get(second)
+            if histogram is None:
+                histogram = self.recent[second] = LatencyHistogram()
+            histogram.record(elapsed)
+    
+    def live_metrics(self) -> Dict[str, Any]:
+        """累计计数和最近时间窗口内的滚动指标"""
+        rolling = {
+            "window_seconds": self.rolling_seconds,
+            "samples": 0,
+            "error_rate": 0.0,
+            "throughput": 0.0,
+            "average_response_time": 0.0,
+            "p95_response_time": 0.0,
+            "p99_response_time": 0.0
+        }
+        
+        if self.recent:
+            latest = max(self.recent)
+            for second in [s for s in self.recent if s <= latest - self.rolling_seconds]:
+                del self.recent[second]
+            
+            histogram = LatencyHistogram.merge_all(self.recent.values())
+            errors = sum(self.seconds[second][1] for second in self.recent)
+            span = min(self.rolling_seconds, latest - min(self.recent) + 1)
+            rolling.update({
+                "samples": histogram.count,
+                "error_rate": errors / histogram.count * 100 if histogram.count else 0.0,
+                "throughput": histogram.count / span,
+                "average_response_time": histogram.mean,
+                "p95_response_time": histogram.percentile(0.95),
+                "p99_response_time": histogram.percentile(0.99)
+            })
+        
+        return {
+            "total_samples": self.total,
+            "failed_samples": self.failed,
+            "error_rate": self.failed / self.total * 100 if self.total else 0.0,
+            "rolling": rolling
+        }
@@ -0,0 +1,294 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models
+from app.services.latency_histogram import LatencyHistogram
+
+# 单次 IN 查询的最大参数个数（SQL Server 限制为 2100）
+IN_CHUNK_SIZE = 500
+
+
+def update_report_rollups(db: Session, reports: List[models.TestReport]) -> None:
+    """把一批新报告累加到各自 (project_id, type, 小时) 的汇总行，每个汇总行只查询和更新一次"""
+    groups: "OrderedDict[Tuple[int, str, datetime], List[models.TestReport]]" = OrderedDict()
+    for report in reports:
+        bucket_start = truncate_time(report.start_time or datetime.now(), "hour")
+        groups.setdefault((report.project_id, report.type, bucket_start), []).append(report)
+
+    for (project_id, report_type, bucket_start), group in groups.items():
+        keys = {"project_id": project_id, "type": report_type, "bucket_start": bucket_start}
+        rollup = _locked_query(db, models.ReportRollup, keys).first()
+        if rollup is None:
+            rollup = _insert_rollup(db, models.ReportRollup(
+                **keys, report_count=0, passed_reports=0, pass_rate_sum=0.0, duration_histogram=None
+            ), keys)
+
+        durations = []
+        for report in group:
+            rollup.report_count += 1
+            if report.pass_rate is not None:
+                rollup.pass_rate_sum += report.pass_rate
+                if report.pass_rate >= 100:
+                    rollup.passed_reports += 1
+            if report.duration is not None:
+                durations.append(report.duration)
+        if durations:
+            rollup.duration_histogram = _record(rollup.duration_histogram, *durations)
+
+
+def update_case_rollups(
+    db: Session,
+    project_id: int,
+    case_type: str,
+    case_results: List[Tuple[int, Any]],
+    executed_at: Optional[datetime] = None
+) -> None:
+    """
+    把一次执行中各用例的结果累加到 (case_type, case_id, 天) 的汇总行
+
+    flips 统计相邻两次执行结果在成功/失败之间翻转的次数，用于衡量用例是否不稳定；
+    汇总行上保存最近一次的结果，新的一天第一次执行时从之前最近的汇总行继承
+    """
+    bucket_start = truncate_time(executed_at or datetime.now(), "day")
+    case_ids = list(dict.fromkeys(case_id for case_id, _ in case_results))
+
+    rollups = {}
+    for offset in range(0, len(case_ids), IN_CHUNK_SIZE):
+        chunk = case_ids[offset:offset + IN_CHUNK_SIZE]
+        rollups.update(_load_case_rollups(db, project_id, case_type, chunk, bucket_start))
+
+    for case_id, result in case_results:
+        rollup = rollups[case_id]
+        rollup.runs += 1
+        if not result.success:
+            rollup.failures += 1
+        if rollup.last_success is not None and rollup.last_success != result.success:
+            rollup.flips += 1
+        rollup.last_success = result.success
+        rollup.duration_histogram = _record(rollup.duration_histogram, result.duration)
+
+
+def get_trend(
+    db: Session,
+    project_id: int,
+    report_type: Optional[str],
+    bucket: str,
+    start: datetime,
+    end: datetime
+) -> List[Dict[str, Any]]:
+    """按时间桶返回报告数量、平均通过率和耗时百分位数"""
+    query = db.query(models.ReportRollup).filter(
+        models.ReportRollup.project_id == project_id,
+        models.ReportRollup.bucket_start >= truncate_time(start, "hour"),
+        models.ReportRollup.bucket_start < end
+    )
+    if report_type:
+        query = query.filter(models.ReportRollup.type == report_type)
+
+    points: "OrderedDict[datetime, Dict[str, Any]]" = OrderedDict()
+    for rollup in query.order_by(models.ReportRollup.bucket_start).all():
+        point = points.setdefault(truncate_time(rollup.bucket_start, bucket), {
+            "report_count": 0,
+            "passed_reports": 0,
+            "pass_rate_sum": 0.0,
+            "histograms": [],
+        })
+        point["report_count"] += rollup.report_count
+        point["passed_reports"] += rollup.passed_reports
+        point["pass_rate_sum"] += rollup.pass_rate_sum
+        if rollup.duration_histogram:
+            point["histograms"].append(LatencyHistogram.from_dict(rollup.duration_histogram))
+
+    trend = []
+    for bucket_start, point in points.items():
+        durations = LatencyHistogram.merge_all(point["histograms"])
+        trend.append({
+            "bucket_start": bucket_start,
+            "report_count": point["report_count"],
+            "passed_reports": point["passed_reports"],
+            "average_pass_rate": point["pass_rate_sum"] / point["report_count"] if point["report_count"] else 0.0,
+            **_duration_stats(durations),
+        })
+    return trend
+
+
+def get_flaky_cases(
+    db: Session,
+    project_id: int,
+    case_type: Optional[str],
+    since: datetime,
+    min_runs: int,
+    limit: int
+) -> List[Dict[str, Any]]:
+    """按结果翻转率对用例排序，翻转率相同时按失败率排序"""
+    query = db.query(
+        models.CaseRollup.case_type,
+        models.CaseRollup.case_id,
+        func.sum(models.CaseRollup.runs).label("runs"),
+        func.sum(models.CaseRollup.failures).label("failures"),
+        func.sum(models.CaseRollup.flips).label("flips"),
+    ).filter(
+        models.CaseRollup.project_id == project_id,
+        models.CaseRollup.bucket_start >= truncate_time(since, "day")
+    )
+    if case_type:
+        query = query.filter(models.CaseRollup.case_type == case_type)
+
+    rows = query.group_by(
+        models.CaseRollup.case_type, models.CaseRollup.case_id
+    ).having(
+        func.sum(models.CaseRollup.runs) >= min_runs,
+        func.sum(models.CaseRollup.flips) > 0
+    ).all()
+
+    ranked = sorted(
+        (
+            {
+                "case_type": row.case_type,
+                "case_id": row.case_id,
+                "runs": int(row.runs),
+                "failures": int(row.failures),
+                "flips": int(row.flips),
+                "failure_rate": row.failures / row.runs * 100,
+                # n 次执行最多翻转 n-1 次
+                "flip_rate": row.flips / (row.runs - 1) * 100 if row.runs > 1 else 0.0,
+            }
+            for row in rows
+        ),
+        key=lambda item: (item["flip_rate"], item["failure_rate"]),
+        reverse=True
+    )[:limit]
+
+    _attach_case_durations(db, ranked, since)
+    _attach_case_names(db, ranked)
+    return ranked
+
+
+def truncate_time(value: datetime, bucket: str) -> datetime:
+    """把时间截断到所在时间桶的起点（week 以周一为起点）"""
+    if bucket == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown bucket: {bucket}")
+
+
+def _load_case_rollups(
+    db: Session,
+    project_id: int,
+    case_type: str,
+    case_ids: List[int],
+    bucket_start: datetime
+) -> Dict[int, models.CaseRollup]:
+    rollups = {
+        rollup.case_id: rollup
+        for rollup in db.query(models.CaseRollup).filter(
+            models.CaseRollup.case_type == case_type,
+            models.CaseRollup.case_id.in_(case_ids),
+            models.CaseRollup.bucket_start == bucket_start
+        ).with_for_update().all()
+    }
+    missing = [case_id for case_id in case_ids if case_id not in rollups]
+    if not missing:
+        return rollups
+
+    # 从之前最近的汇总行继承最近一次执行结果
+    latest = db.query(
+        models.CaseRollup.case_id,
+        func.max(models.CaseRollup.bucket_start).label("bucket_start")
+    ).filter(
+        models.CaseRollup.case_type == case_type,
+        models.CaseRollup.case_id.in_(missing),
+        models.CaseRollup.bucket_start < bucket_start
+    ).group_by(models.CaseRollup.case_id).subquery()
+    previous = dict(
+        db.query(models.CaseRollup.case_id, models.CaseRollup.last_success).join(
+            latest,
+            (models.CaseRollup.case_id == latest.c.case_id)
+            & (models.CaseRollup.bucket_start == latest.c.bucket_start)
+        ).filter(models.CaseRollup.case_type == case_type).all()
+    )
+
+    for case_id in missing:
+        keys = {"case_type": case_type, "case_id": case_id, "bucket_start": bucket_start}
+        rollups[case_id] = _insert_rollup(db, models.CaseRollup(
+            **keys,
+            project_id=project_id,
+            runs=0,
+            failures=0,
+            flips=0,
+            last_success=previous.get(case_id),
+            duration_histogram=None
+        ), keys)
+    return rollups
+
+
+def _locked_query(db: Session, model, keys: Dict[str, Any]):
+    return db.query(model).filter_by(**keys).with_for_update()
+
+
+def _insert_rollup(db: Session, rollup, keys: Dict[str, Any]):
+    """插入新的汇总行；并发插入同一行时唯一约束冲突，改为读取并锁定已存在的行"""
+    try:
+        with db.begin_nested():
+            db.add(rollup)
+        return rollup
+    except IntegrityError:
+        return _locked_query(db, type(rollup), keys).one()
+
+
+def _record(histogram: Optional[Dict[str, Any]], *seconds: float) -> Dict[str, Any]:
+    """把耗时（秒）以毫秒记录到序列化的直方图中，返回新的字典以便 JSON 列检测到变化"""
+    merged = LatencyHistogram.from_dict(histogram) if histogram else LatencyHistogram()
+    for value in seconds:
+        merged.record(value * 1000)
+    return merged.to_dict()
+
+
+def _duration_stats(histogram: LatencyHistogram) -> Dict[str, float]:
+    """耗时统计（秒）"""
+    return {
+        "average_duration": histogram.mean / 1000,
+        "p50_duration": histogram.percentile(0.5) / 1000,
+        "p95_duration": histogram.percentile(0.95) / 1000,
+        "p99_duration": histogram.percentile(0.99) / 1000,
+    }
+
+
+def _attach_case_durations(db: Session, cases: List[Dict[str, Any]], since: datetime) -> None:
+    histograms: Dict[tuple, List[LatencyHistogram]] = {}
+    for case_type in dict.fromkeys(case["case_type"] for case in cases):
+        ids = [case["case_id"] for case in cases if case["case_type"] == case_type]
+        for offset in range(0, len(ids), IN_CHUNK_SIZE):
+            rows = db.query(models.CaseRollup.case_id, models.CaseRollup.duration_histogram).filter(
+                models.CaseRollup.case_type == case_type,
+                models.CaseRollup.case_id.in_(ids[offset:offset + IN_CHUNK_SIZE]),
+                models.CaseRollup.bucket_start >= truncate_time(since, "day")
+            ).all()
+            for row in rows:
+                if row.duration_histogram:
+                    histograms.setdefault((case_type, row.case_id), []).append(
+                        LatencyHistogram.from_dict(row.duration_histogram)
+                    )
+
+    for case in cases:
+        durations = LatencyHistogram.merge_all(histograms.get((case["case_type"], case["case_id"]), []))
+        case.update(_duration_stats(durations))
+
+
+def _attach_case_names(db: Session, cases: List[Dict[str, Any]]) -> None:
+    case_models = {"api": models.APITestCase, "ui": models.UITestCase}
+    for case_type, model in case_models.items():
+        ids = [case["case_id"] for case in cases if case["case_type"] == case_type]
+        if not ids:
+            continue
+        names = dict(db.query(model.id, model.name).filter(model.id.in_(ids)).all())
+        for case in cases:
+            if case["case_type"] == case_type:
+                case["case_name"] = names.get(case["case_id"])
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models
+from app.services.report_analytics import truncate_time, update_case_rollups, update_report_rollups
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+ERROR_SUMMARY_LENGTH = 500  # test_case_results.error 的长度
+SWEEP_BATCH_SIZE = 500  # 清理 report_blobs 时每个事务处理的 blob 数
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def save_report(db: Session, report: models.TestReport) -> models.TestReport:
+    """
+    保存测试报告
+
+    序列化后超过 REPORT_BLOB_THRESHOLD_BYTES 的 result_data 压缩后存入 report_blobs 表，
+    以内容的 SHA-256 作为键（相同内容只存一份），报告行只保留 result_ref 和摘要字段。
+    同一事务中累加报告的汇总统计
+    """
+    save_reports(db, [report])
+    return report
+
+
+def save_reports(db: Session, reports: List[models.TestReport]) -> None:
+    """批量保存测试报告（同 save_report），同一汇总行只查询和更新一次"""
+    for report in reports:
+        result_data = report.result_data
+        if result_data is not None:
+            raw = json.dumps(result_data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+            if len(raw) > settings.REPORT_BLOB_THRESHOLD_BYTES:
+                report.result_ref = _store_blob(db, raw)
+                report.result_data = _summarize(result_data)
+        db.add(report)
+    update_report_rollups(db, reports)
+
+
+def save_case_results(
+    db: Session,
+    report: models.TestReport,
+    case_type: str,
+    case_results: List[Tuple[int, Any]]
+) -> None:
+    """
+    把报告中每个用例的结果写入 test_case_results 表（一次批量插入），并累加用例的汇总统计
+
+    case_results 为 (case_id, APITestResult | UITestResult) 列表，需在 save_report 之后调用
+    """
+    save_report_case_results(db, case_type, [(report, case_id, result) for case_id, result in case_results])
+
+
+def save_report_case_results(
+    db: Session,
+    case_type: str,
+    entries: List[Tuple[models.TestReport, int, Any]]
+) -> None:
+    """
+    批量写入多份报告的用例结果：entries 为 (报告, case_id, 结果) 列表，需在 save_reports 之后调用
+
+    所有行一次批量插入，用例汇总统计按 (项目, 天) 分组累加
+    """
+    if not entries:
+        return
+    db.flush()  # 获取报告ID
+    db.bulk_insert_mappings(models.TestCaseResult, [
+        {
+            "report_id": report.id,
+            "project_id": report.project_id,
+            "case_type": case_type,
+            "case_id": case_id,
+            "success": result.success,
+            "status_code": getattr(result, "status_code", None),
+            "duration": result.duration,
+            "error": _error_summary(result),
+        }
+        for report, case_id, result in entries
+    ])
+
+    groups: Dict[Tuple[int, datetime], List[Tuple[int, Any]]] = {}
+    for report, case_id, result in entries:
+        day = truncate_time(report.start_time or datetime.now(), "day")
+        groups.setdefault((report.project_id, day), []).append((case_id, result))
+    for (project_id, day), case_results in groups.items():
+        update_case_rollups(db, project_id, case_type, case_results, day)
+
+
+def load_result_data(db: Session, report: models.TestReport) -> Optional[Dict[str, Any]]:
+    """读取报告的完整 result_data，存放在 report_blobs 中时解压后返回"""
+    if not report.result_ref:
+        return report.result_data
+
+    blob = db.query(models.ReportBlob).filter(models.ReportBlob.digest == report.result_ref).first()
+    if not blob:
+        logger.warning(f"[Report Storage] Blob {report.result_ref} of report {report.id} is missing")
+        return report.result_data
+    return json.loads(_decompress(blob.codec, blob.data))
+
+
+def sweep_report_blobs(db: Session) -> int:
+    """
+    删除没有任何报告引用的 report_blobs，返回删除的数量
+
+    blob 不记录引用计数：报告可能被直接删除或随项目级联删除，因此定期扫描
+    test_reports.result_ref 清理。每批 blob 先加锁再确认没有引用后删除，
+    与复用同一 blob 的 _store_blob 互斥，不会删掉正在被新报告引用的 blob
+    """
+    deleted = 0
+    while True:
+        digests = [row.digest for row in db.query(models.ReportBlob.digest).filter(
+            ~exists().where(models.TestReport.result_ref == models.ReportBlob.digest)
+        ).limit(SWEEP_BATCH_SIZE).all()]
+        if not digests:
+            break
+
+        locked = [row.digest for row in _locked_blobs(db, digests).all()]
+        referenced = {
+            row.result_ref for row in db.query(models.TestReport.result_ref).filter(
+                models.TestReport.result_ref.in_(locked)
+            ).distinct()
+        }
+        orphans = [digest for digest in locked if digest not in referenced]
+        if orphans:
+            deleted += db.query(models.ReportBlob).filter(
+                models.ReportBlob.digest.in_(orphans)
+            ).delete(synchronize_session=False)
+        db.commit()
+        # 这一批都在加锁后被重新引用时停止，避免反复扫描同一批 blob
+        if not orphans:
+            break
+    return deleted
+
+
+def _locked_blobs(db: Session, digests: List[str]):
+    """查询并锁定 blob 直到事务结束（SQL Server 不支持 FOR UPDATE，使用 UPDLOCK 提示）"""
+    return db.query(models.ReportBlob.digest).filter(
+        models.ReportBlob.digest.in_(digests)
+    ).with_for_update().with_hint(models.ReportBlob, "WITH (UPDLOCK, ROWLOCK)", "mssql")
+
+
+def _store_blob(db: Session, raw: bytes) -> str:
+    digest = hashlib.sha256(raw).hexdigest()
+    # 复用已有的 blob 时加锁到事务提交，避免在报告写入前被 sweep_report_blobs 删除
+    if _locked_blobs(db, [digest]).first():
+        return digest
+
+    codec, data = _compress(raw)
+    try:
+        # 并发写入相同内容时主键冲突，说明 blob 已由其他进程写入
+        with db.begin_nested():
+            db.add(models.ReportBlob(digest=digest, codec=codec, size=len(raw), data=data))
+    except IntegrityError:
+        pass
+    return digest
+
+
+def _compress(raw: bytes):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=settings.REPORT_BLOB_ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Report blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown report blob codec: {codec}")
+
+
+def _error_summary(result) -> Optional[str]:
+    if result.success:
+        return None
+    # API 用例的错误为断言错误列表，UI 用例为错误日志
+    errors = getattr(result, "assertion_errors", None)
+    error = "; ".join(errors) if errors else getattr(result, "error_log", None)
+    return error[:ERROR_SUMMARY_LENGTH] if error else None
+
+
+def _summarize(result_data: Dict[str, Any]) -> Dict[str, Any]:
+    """报告行上保留的摘要：顶层的标量字段，以及性能指标中的标量字段"""
+    summary = {
+        key: value for key, value in result_data.items()
+        if not isinstance(value, (dict, list))
+    }
+    metrics = result_data.get("metrics")
+    if isinstance(metrics, dict):
+        summary["metrics"] = {
+            key: value for key, value in metrics.items()
+            if not isinstance(value, (dict, list))
+        }
+    return summary
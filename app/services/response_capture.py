@@ -0,0 +1,149 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional, Sequence
+from config import settings
+
+# 读取响应体时每次读取的字节数
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+
+class CapturedResponse:
+    """
+    流式读取后的响应
+
+    响应体不超过 API_RESPONSE_MAX_BYTES 时 text 为解码后的全文（断言和 JSON 解析共用这一份），
+    超过时 text 为 None，只保留开头和结尾各 API_RESPONSE_CAPTURE_BYTES / 2 字节，
+    response_contains 的文本在读取过程中逐块查找
+    """
+
+    __slots__ = ("status_code", "text", "size", "sha256", "head", "tail", "_found")
+
+    def __init__(self, status_code: int, text: Optional[str], size: int, sha256: str,
+                 head: str, tail: str, found: Dict[str, bool]):
+        self.status_code = status_code
+        self.text = text
+        self.size = size
+        self.sha256 = sha256
+        self.head = head
+        self.tail = tail
+        self._found = found
+
+    def contains(self, needle: str) -> bool:
+        if self.text is not None:
+            return needle in self.text
+        return self._found.get(needle, False)
+
+    @property
+    def truncated(self) -> bool:
+        return self.size > settings.API_RESPONSE_CAPTURE_BYTES
+
+    def summary(self, parsed: Any = None) -> Dict[str, Any]:
+        """
+        保存到测试结果中的响应内容
+
+        不超过 API_RESPONSE_CAPTURE_BYTES 时保存完整的 JSON 对象或文本，
+        否则只保存开头和结尾（大小和 SHA-256 见结果的 response_size / response_sha256）
+        """
+        if self.truncated:
+            return {"truncated": True, "head": self.head, "tail": self.tail}
+        if isinstance(parsed, dict):
+            return parsed
+        return {"text": self.text}
+
+
+def capture_response(
+    status_code: int,
+    chunks: Iterable[bytes],
+    encoding: Optional[str],
+    needles: Sequence[str] = ()
+) -> CapturedResponse:
+    """
+    逐块读取响应体，同时计算大小和 SHA-256
+
+    needles 为需要在响应中查找的文本（response_contains），响应体超过
+    API_RESPONSE_MAX_BYTES 不再缓存全文后，在剩余的数据块中继续查找
+    """
+    encoding = encoding or "utf-8"
+    max_bytes = settings.API_RESPONSE_MAX_BYTES
+    half = settings.API_RESPONSE_CAPTURE_BYTES // 2
+
+    digest = hashlib.sha256()
+    size = 0
+    body: Optional[bytearray] = bytearray()
+    head = b""
+    tail = bytearray()
+    search = _NeedleSearch(needles, encoding)
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        digest.update(chunk)
+        size += len(chunk)
+
+        if body is not None:
+            body.extend(chunk)
+            if size <= max_bytes:
+                continue
+            # 超过上限：只保留开头和结尾，已缓存的部分查找一次后释放
+            head = bytes(body[:half])
+            tail = body[-half:] if half else bytearray()
+            search.feed(body)
+            body = None
+            continue
+
+        search.feed(chunk)
+        if half:
+            tail.extend(chunk)
+            del tail[:-half]
+
+    if body is not None:
+        text = body.decode(encoding, errors="replace")
+        head_text = body[:half].decode(encoding, errors="ignore")
+        tail_text = body[-half:].decode(encoding, errors="ignore") if half else ""
+        del body
+    else:
+        text = None
+        head_text = head.decode(encoding, errors="ignore")
+        tail_text = bytes(tail).decode(encoding, errors="ignore")
+
+    return CapturedResponse(status_code, text, size, digest.hexdigest(), head_text, tail_text, search.found)
+
+
+def parse_json(captured: CapturedResponse) -> Any:
+    """解析完整缓存的响应体，不是 JSON 或响应体过大时返回 None"""
+    if captured.text is None:
+        return None
+    try:
+        return json.loads(captured.text)
+    except ValueError:
+        return None
+
+
+class _NeedleSearch:
+    """跨数据块查找文本：每块与上一块结尾的 len(needle) - 1 个字节拼接后查找"""
+
+    def __init__(self, needles: Sequence[str], encoding: str):
+        self.found: Dict[str, bool] = {}
+        self._pending: Dict[str, bytes] = {}
+        for needle in needles:
+            try:
+                encoded = needle.encode(encoding)
+            except UnicodeEncodeError:
+                # 无法用响应的编码表示的文本不可能出现在响应中
+                self.found[needle] = False
+                continue
+            self.found[needle] = not encoded
+            if encoded:
+                self._pending[needle] = encoded
+        self._overlap = max((len(encoded) for encoded in self._pending.values()), default=1) - 1
+        self._carry = b""
+
+    def feed(self, chunk) -> None:
+        if not self._pending:
+            return
+        window = self._carry + chunk
+        for needle, encoded in list(self._pending.items()):
+            if window.find(encoded) >= 0:
+                self.found[needle] = True
+                del self._pending[needle]
+        self._carry = window[-self._overlap:] if self._overlap else b""
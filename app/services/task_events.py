@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, Optional, Set
+import redis.asyncio as aioredis
+from app.celery_app import celery_app
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TaskEventHub:
+    """
+    任务状态变化的进程内分发中心
+
+    Celery 的 Redis 结果后端每次写入任务状态（update_state、成功、失败）时，
+    都会把同样的内容 PUBLISH 到与结果键同名的频道（celery-task-meta-<task_id>）。
+    整个进程只使用一个 Redis pub/sub 连接订阅所有连接关心的任务频道，
+    收到消息后解码为任务元数据，分发到订阅了该任务的每个队列
+    """
+
+    def __init__(self, redis_url: str):
+        self.redis_url = redis_url
+        self.loop = asyncio.get_running_loop()
+        prefix = celery_app.backend.task_keyprefix
+        self._prefix = prefix.decode() if isinstance(prefix, bytes) else prefix
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+        self._client: Optional[aioredis.Redis] = None
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def subscribe(self, queue: asyncio.Queue, task_ids: Iterable[str]) -> None:
+        """订阅任务状态，之后的状态变化以 (task_id, meta) 的形式放入 queue"""
+        async with self._lock:
+            await self._ensure_started()
+            channels = []
+            for task_id in task_ids:
+                queues = self._subscribers.setdefault(task_id, set())
+                if not queues:
+                    channels.append(self._prefix + task_id)
+                queues.add(queue)
+            if channels:
+                await self._pubsub.subscribe(*channels)
+
+    async def unsubscribe(self, queue: asyncio.Queue, task_ids: Optional[Iterable[str]] = None) -> None:
+        """取消订阅，task_ids 为 None 时取消该队列的全部订阅"""
+        async with self._lock:
+            if task_ids is None:
+                task_ids = [task_id for task_id, queues in self._subscribers.items() if queue in queues]
+            channels = []
+            for task_id in task_ids:
+                queues = self._subscribers.get(task_id)
+                if not queues:
+                    continue
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[task_id]
+                    channels.append(self._prefix + task_id)
+            if channels and self._pubsub is not None:
+                await self._pubsub.unsubscribe(*channels)
+
+    async def _ensure_started(self) -> None:
+        if self._reader is not None and not self._reader.done():
+            return
+        self._client = aioredis.from_url(self.redis_url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        channels = [self._prefix + task_id for task_id in self._subscribers]
+        if channels:
+            await self._pubsub.subscribe(*channels)
+        self._reader = asyncio.ensure_future(self._read())
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                self._dispatch(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 连接断开时重建连接并重新订阅，期间的状态变化由订阅时的快照补齐
+                logger.warning(f"[Task Events] Redis pub/sub error, reconnecting: {e}")
+                await asyncio.sleep(1)
+                async with self._lock:
+                    await self._reconnect()
+
+    async def _reconnect(self) -> None:
+        try:
+            await self._pubsub.close()
+        except Exception:
+            pass
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        channels = [self._prefix + task_id for task_id in self._subscribers]
+        if channels:
+            await self._pubsub.subscribe(*channels)
+
+    def _dispatch(self, message: dict) -> None:
+        channel = message["channel"]
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        task_id = channel[len(self._prefix):]
+        queues = self._subscribers.get(task_id)
+        if not queues:
+            return
+        try:
+            meta = celery_app.backend.decode_result(message["data"])
+        except Exception as e:
+            logger.warning(f"[Task Events] Failed to decode task meta for {task_id}: {e}")
+            return
+        for queue in list(queues):
+            queue.put_nowait((task_id, meta))
+
+
+_hub: Optional[TaskEventHub] = None
+
+
+def get_task_event_hub() -> TaskEventHub:
+    """获取当前事件循环的任务状态分发中心，首次调用时创建（只能在协程中调用）"""
+    global _hub
+    if _hub is None or _hub.loop is not asyncio.get_running_loop():
+        _hub = TaskEventHub(settings.CELERY_RESULT_BACKEND)
+    return _hub
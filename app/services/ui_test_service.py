@@ -1,14 +1,23 @@
+import asyncio
+import locale
 import subprocess
 import tempfile
 import os
 import time
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Iterable, List, Optional
 from app.models import UITestCase
 from app.schemas import UITestResult, UITestStepResult
+from app.services.browser_pool import get_browser_pool
 from config import settings
 
+UI_SCRIPT_TIMEOUT = 300  # 5分钟超时
+UI_PROGRESS_HEARTBEAT_SECONDS = 5  # 无输出时按时间更新进度的间隔
+UI_OUTPUT_LINE_LIMIT = 16 * 1024 * 1024  # 单行输出上限（脚本最后输出的 JSON 结果可能很长）
+
 
 def run_ui_case(case: UITestCase, progress_callback=None) -> UITestResult:
     """
@@ -78,6 +87,8 @@ def run_ui_case(case: UITestCase, progress_callback=None) -> UITestResult:
         
         if use_docker:
             result = _run_in_docker(script_path, screenshot_dir, progress_callback)
+        elif settings.UI_BROWSER_POOL_ENABLED:
+            result = _run_in_browser_pool(script_path, screenshot_dir, progress_callback)
         else:
             result = _run_locally(script_path, screenshot_dir, progress_callback)
         
@@ -190,6 +201,46 @@ def run_ui_case(case: UITestCase, progress_callback=None) -> UITestResult:
             os.remove(script_path)
 
 
+def run_ui_cases(
+    cases: Iterable[UITestCase],
+    max_workers: Optional[int] = None,
+    progress_callback=None
+) -> List[UITestResult]:
+    """
+    批量执行UI测试用例，返回结果的顺序与传入用例的顺序一致
+    
+    使用有界线程池并发执行，并发数默认取 UI_SUITE_CONCURRENCY；
+    启用浏览器池时实际并发同时受浏览器池大小限制。
+    每完成一个用例按已完成数量回调一次进度
+    """
+    cases = list(cases)
+    workers = max_workers or settings.UI_SUITE_CONCURRENCY
+    total = len(cases)
+    results: List[Optional[UITestResult]] = [None] * total
+    
+    def report(completed: int, case: UITestCase, result: UITestResult):
+        if progress_callback:
+            progress_callback(
+                int(completed / total * 100),
+                f"已完成 {completed}/{total} 个用例",
+                f"{case.name}: {'成功' if result.success else '失败'}"
+            )
+    
+    if workers <= 1 or total <= 1:
+        for index, case in enumerate(cases):
+            results[index] = run_ui_case(case)
+            report(index + 1, case, results[index])
+        return results
+    
+    with ThreadPoolExecutor(max_workers=min(workers, total)) as executor:
+        futures = {executor.submit(run_ui_case, case): index for index, case in enumerate(cases)}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            results[index] = future.result()
+            report(completed, cases[index], results[index])
+    return results
+
+
 def _run_locally(script_path: str, screenshot_dir: str, progress_callback=None) -> dict:
     """在本地执行测试脚本"""
     import logging
@@ -205,171 +256,192 @@ def _run_locally(script_path: str, screenshot_dir: str, progress_callback=None)
         env = os.environ.copy()
         env["SCREENSHOT_DIR"] = screenshot_dir
         
-        # 使用python直接执行，实时读取输出以更新进度
-        import threading
-        import queue
+        # 使用python直接执行，由事件循环实时处理输出和进程退出
+        tracker = _StepProgressTracker(progress_callback, UI_SCRIPT_TIMEOUT)
+        returncode, output, error_output = asyncio.run(_run_script_async(script_path, env, tracker))
         
-        process = subprocess.Popen(
-            ["python", script_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            env=env,
-            cwd=os.path.dirname(script_path) or None,
-            bufsize=1
-        )
-        
-        output_lines = []
-        error_lines = []
-        output_queue = queue.Queue()
-        error_queue = queue.Queue()
-        
-        def read_output():
-            """读取标准输出"""
-            try:
-                for line in iter(process.stdout.readline, ''):
-                    if not line:
-                        break
-                    output_lines.append(line)
-                    output_queue.put(('stdout', line))
-            except Exception as e:
-                print(f"Error reading stdout: {e}")
+        if returncode is None:
+            return {
+                "success": False,
+                "error": "Test execution timeout (exceeded 5 minutes)",
+                "output": ""
+            }
         
-        def read_error():
-            """读取标准错误"""
-            try:
-                for line in iter(process.stderr.readline, ''):
-                    if not line:
-                        break
-                    error_lines.append(line)
-                    error_queue.put(('stderr', line))
-            except Exception as e:
-                print(f"Error reading stderr: {e}")
-        
-        # 启动读取线程
-        output_thread = threading.Thread(target=read_output, daemon=True)
-        error_thread = threading.Thread(target=read_error, daemon=True)
-        output_thread.start()
-        error_thread.start()
-        
-        # 实时处理输出并更新进度
-        start_time = time.time()
-        last_progress = 30
-        step_count = 0
-        max_wait_time = 300  # 5分钟超时
-        
-        try:
-            while process.poll() is None:
-                # 检查超时
-                elapsed = time.time() - start_time
-                if elapsed > max_wait_time:
-                    process.kill()
-                    return {
-                        "success": False,
-                        "error": "Test execution timeout (exceeded 5 minutes)",
-                        "output": ""
-                    }
-                # 处理输出队列
-                try:
-                    while True:
-                        stream_type, line = output_queue.get_nowait()
-                        # 检测步骤执行（匹配 [STEP X] 格式）
-                        if "[STEP" in line or "步骤" in line or "step_" in line.lower() or "take_screenshot" in line.lower():
-                            # 尝试从输出中提取步骤编号
-                            import re
-                            step_match = re.search(r'\[STEP\s+(\d+)\]', line)
-                            if step_match:
-                                new_step_count = int(step_match.group(1)) + 1
-                                if new_step_count > step_count:
-                                    step_count = new_step_count
-                            else:
-                                step_count += 1
-                            
-                            # 根据步骤数更新进度（30% - 75%）
-                            # 假设最多20个步骤，如果超过则按时间计算
-                            if step_count <= 20:
-                                last_progress = min(30 + int((step_count / 20) * 45), 75)
-                            else:
-                                # 超过20步，按时间比例计算
-                                time_progress = min(30 + int((elapsed / max_wait_time) * 45), 75)
-                                last_progress = max(last_progress, time_progress)
-                            
-                            if progress_callback:
-                                logger.info(f"[UI Test Service] 检测到步骤 {step_count}，更新进度: {last_progress}%")
-                                progress_callback(
-                                    last_progress,
-                                    f"执行步骤 {step_count}",
-                                    f"已执行 {step_count} 个步骤"
-                                )
-                except queue.Empty:
-                    pass
-                
-                # 处理错误队列
-                try:
-                    while True:
-                        stream_type, line = error_queue.get_nowait()
-                        # 错误信息也计入输出
-                        pass
-                except queue.Empty:
-                    pass
-                
-                # 根据时间更新进度（防止长时间无输出，每5秒更新一次）
-                elapsed = time.time() - start_time
-                if elapsed > 5 and int(elapsed) % 5 == 0:  # 每5秒更新一次
-                    time_progress = min(30 + int((elapsed / max_wait_time) * 45), 75)
-                    if time_progress > last_progress and progress_callback:
-                        logger.info(f"[UI Test Service] 时间进度更新: {time_progress}% (已运行 {int(elapsed)} 秒)")
-                        progress_callback(
-                            time_progress,
-                            "执行中...",
-                            f"已运行 {int(elapsed)} 秒"
-                        )
-                        last_progress = time_progress
-                
-                time.sleep(0.5)  # 每0.5秒检查一次
-            
-            # 等待线程完成
-            output_thread.join(timeout=2)
-            error_thread.join(timeout=2)
-            
-            output = ''.join(output_lines)
-            error_output = ''.join(error_lines)
-            
-            # 更新进度：执行完成
-            if progress_callback:
-                progress_callback(75, "测试执行完成", "正在处理结果..." if process.returncode == 0 else "测试执行失败")
-            
-            result = type('obj', (object,), {
-                'returncode': process.returncode,
-                'stdout': output,
-                'stderr': error_output
-            })()
-            
-        except Exception as e:
-            # 如果出错，尝试终止进程
-            try:
-                process.kill()
-            except:
-                pass
-            raise
+        # 更新进度：执行完成
+        if progress_callback:
+            progress_callback(75, "测试执行完成", "正在处理结果..." if returncode == 0 else "测试执行失败")
         
         return {
-            "success": result.returncode == 0,
-            "error": error_output if result.returncode != 0 else None,
+            "success": returncode == 0,
+            "error": error_output if returncode != 0 else None,
             "output": output + error_output
         }
-    except subprocess.TimeoutExpired:
+    except Exception as e:
         return {
             "success": False,
-            "error": "Test execution timeout (exceeded 5 minutes)",
+            "error": str(e),
             "output": ""
         }
+
+
+async def _run_script_async(script_path: str, env: dict, tracker: "_StepProgressTracker"):
+    """
+    以 asyncio 子进程执行脚本
+    
+    标准输出逐行交给 tracker 更新步骤进度，进程退出后立即返回，不再轮询；
+    超时返回 (None, 已读输出, 已读错误输出)
+    """
+    encoding = locale.getpreferredencoding(False)
+    process = await asyncio.create_subprocess_exec(
+        "python", script_path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env,
+        cwd=os.path.dirname(script_path) or None,
+        limit=UI_OUTPUT_LINE_LIMIT
+    )
+    
+    output_lines = []
+    error_lines = []
+    
+    async def read_stream(stream, lines, on_line=None):
+        while True:
+            raw = await stream.readline()
+            if not raw:
+                break
+            line = raw.decode(encoding, errors="replace")
+            lines.append(line)
+            if on_line:
+                on_line(line)
+    
+    async def heartbeat():
+        # 长时间无输出时按已运行时间更新进度
+        while True:
+            await asyncio.sleep(UI_PROGRESS_HEARTBEAT_SECONDS)
+            tracker.on_tick()
+    
+    heartbeat_task = asyncio.ensure_future(heartbeat())
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                read_stream(process.stdout, output_lines, tracker.on_output),
+                read_stream(process.stderr, error_lines),
+                process.wait()
+            ),
+            timeout=UI_SCRIPT_TIMEOUT
+        )
+        return process.returncode, ''.join(output_lines), ''.join(error_lines)
+    except asyncio.TimeoutError:
+        return None, ''.join(output_lines), ''.join(error_lines)
+    finally:
+        heartbeat_task.cancel()
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+
+def _run_in_browser_pool(script_path: str, screenshot_dir: str, progress_callback=None) -> dict:
+    """在 worker 常驻的浏览器池中执行测试脚本，省去每个用例启动解释器和浏览器的开销"""
+    import logging
+    logger = logging.getLogger(__name__)
+    
+    if progress_callback:
+        logger.info("[UI Test Service] 进度: 30% - 执行测试脚本（浏览器池）")
+        progress_callback(30, "执行测试脚本", "正在复用已启动的浏览器运行 Playwright 脚本...")
+    
+    tracker = _StepProgressTracker(progress_callback, UI_SCRIPT_TIMEOUT)
+    try:
+        result = get_browser_pool().run_script(
+            script_path,
+            screenshot_dir,
+            timeout=UI_SCRIPT_TIMEOUT,
+            on_output=tracker.on_output
+        )
     except Exception as e:
         return {
             "success": False,
-            "error": str(e),
+            "error": f"Browser pool error: {str(e)}",
             "output": ""
         }
+    
+    if progress_callback:
+        progress_callback(75, "测试执行完成", "正在处理结果..." if result["success"] else "测试执行失败")
+    
+    return result
+
+
+class _StepProgressTracker:
+    """
+    根据脚本输出推算执行进度（30% - 75%）
+    
+    检测到步骤输出（如 [STEP X]）时按步骤数更新进度，长时间无输出时按已运行时间更新
+    """
+    
+    def __init__(self, progress_callback, max_wait_time: float):
+        self.progress_callback = progress_callback
+        self.max_wait_time = max_wait_time
+        self.start_time = time.time()
+        self.last_progress = 30
+        self.step_count = 0
+    
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.start_time
+    
+    def on_output(self, line: str) -> None:
+        """处理一行标准输出"""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        # 检测步骤执行（匹配 [STEP X] 格式）
+        if not ("[STEP" in line or "步骤" in line or "step_" in line.lower() or "take_screenshot" in line.lower()):
+            return
+        
+        # 尝试从输出中提取步骤编号
+        step_match = re.search(r'\[STEP\s+(\d+)\]', line)
+        if step_match:
+            new_step_count = int(step_match.group(1)) + 1
+            if new_step_count > self.step_count:
+                self.step_count = new_step_count
+        else:
+            self.step_count += 1
+        
+        # 根据步骤数更新进度（30% - 75%）
+        # 假设最多20个步骤，如果超过则按时间计算
+        if self.step_count <= 20:
+            self.last_progress = min(30 + int((self.step_count / 20) * 45), 75)
+        else:
+            # 超过20步，按时间比例计算
+            time_progress = min(30 + int((self.elapsed / self.max_wait_time) * 45), 75)
+            self.last_progress = max(self.last_progress, time_progress)
+        
+        if self.progress_callback:
+            logger.info(f"[UI Test Service] 检测到步骤 {self.step_count}，更新进度: {self.last_progress}%")
+            self.progress_callback(
+                self.last_progress,
+                f"执行步骤 {self.step_count}",
+                f"已执行 {self.step_count} 个步骤"
+            )
+    
+    def on_tick(self) -> None:
+        """根据已运行时间更新进度（由调用方每隔几秒调用一次）"""
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        elapsed = self.elapsed
+        if elapsed > 5:
+            time_progress = min(30 + int((elapsed / self.max_wait_time) * 45), 75)
+            if time_progress > self.last_progress and self.progress_callback:
+                logger.info(f"[UI Test Service] 时间进度更新: {time_progress}% (已运行 {int(elapsed)} 秒)")
+                self.progress_callback(
+                    time_progress,
+                    "执行中...",
+                    f"已运行 {int(elapsed)} 秒"
+                )
+                self.last_progress = time_progress
 
 
 def _run_in_docker(script_path: str, screenshot_dir: str, progress_callback=None) -> dict:
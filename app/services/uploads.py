@@ -0,0 +1,17 @@
+import os
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 上传文件每次读写的字节数
+
+
+async def save_upload_file(file: UploadFile, file_path: str) -> int:
+    """把上传的文件分块异步写入磁盘（不阻塞事件循环），返回写入的字节数"""
+    await aiofiles.os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    size = 0
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await buffer.write(chunk)
+            size += len(chunk)
+    return size
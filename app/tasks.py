@@ -3,19 +3,28 @@ from sqlalchemy.orm import Session
 from app.celery_app import celery_app
 from app.database import SessionLocal
 from app import models, schemas
-from app.services.api_test_service import run_api_case
-from app.services.ui_test_service import run_ui_case
-from app.services.performance_test_service import run_performance_test
+from app.services.api_test_service import run_api_case, run_api_cases, run_api_case_stream
+from app.services.api_dataset import DatasetRunSummary, case_template, iter_dataset_rows, render_case
+from app.services.ui_test_service import run_ui_case, run_ui_cases
+from app.services.performance_test_service import run_performance_test, run_performance_shard, merge_metrics
+from app.services.report_storage import (
+    save_report, save_reports, save_case_results, save_report_case_results, sweep_report_blobs
+)
+from app.services.case_cache import case_cache, ensure_invalidation_listener
+from config import settings
 from datetime import datetime
+import time
 import traceback
 
+DATASET_PROGRESS_INTERVAL = 1.0  # 数据驱动执行时更新任务进度的最小间隔（秒）
+
 
 @celery_app.task(bind=True)
 def run_api_case_task(self: Task, case_id: int):
     """执行API测试用例的Celery任务"""
     db: Session = SessionLocal()
     try:
-        case = db.query(models.APITestCase).filter(models.APITestCase.id == case_id).first()
+        case = _load_api_case(db, case_id)
         if not case:
             raise ValueError(f"API test case {case_id} not found")
         
@@ -33,7 +42,8 @@ def run_api_case_task(self: Task, case_id: int):
             start_time=datetime.now(),
             duration=result.duration
         )
-        db.add(report)
+        save_report(db, report)
+        save_case_results(db, report, "api", [(case.id, result)])
         db.commit()
         
         return result.dict()
@@ -55,30 +65,26 @@ def run_api_suite_task(self: Task, suite_id: int):
         if not suite:
             raise ValueError(f"API test suite {suite_id} not found")
         
-        # 获取套件中的所有用例（按顺序）
-        suite_cases = sorted(suite.suite_cases, key=lambda x: x.order)
-        case_ids = [sc.case_id for sc in suite_cases]
-        
-        if not case_ids:
+        # 按顺序加载套件中的所有用例（优先使用 worker 内的用例缓存），执行期间不再访问数据库会话
+        cases = _load_api_suite_cases(db, suite_id)
+        if not cases:
             raise ValueError("Test suite is empty")
         
-        # 执行所有用例
+        # 执行所有用例（默认并发执行，sequential 套件按顺序执行）
         start_time = datetime.now()
         results = []
-        total_cases = len(case_ids)
+        total_cases = len(cases)
         passed_cases = 0
         
-        for case_id in case_ids:
-            case = db.query(models.APITestCase).filter(models.APITestCase.id == case_id).first()
-            if case:
-                result = run_api_case(case)
-                results.append({
-                    "case_id": case_id,
-                    "case_name": case.name,
-                    "result": result.dict()
-                })
-                if result.success:
-                    passed_cases += 1
+        case_results = run_api_cases(cases, sequential=suite.sequential)
+        for case, result in zip(cases, case_results):
+            results.append({
+                "case_id": case.id,
+                "case_name": case.name,
+                "result": result.dict()
+            })
+            if result.success:
+                passed_cases += 1
         
         duration = (datetime.now() - start_time).total_seconds()
         pass_rate = (passed_cases / total_cases * 100) if total_cases > 0 else 0
@@ -92,6 +98,7 @@ def run_api_suite_task(self: Task, suite_id: int):
             result_data={
                 "suite_id": suite_id,
                 "suite_name": suite.name,
+                "sequential": suite.sequential,
                 "total_cases": total_cases,
                 "passed_cases": passed_cases,
                 "results": results
@@ -100,7 +107,8 @@ def run_api_suite_task(self: Task, suite_id: int):
             start_time=start_time,
             duration=duration
         )
-        db.add(report)
+        save_report(db, report)
+        save_case_results(db, report, "api", [(case.id, result) for case, result in zip(cases, case_results)])
         db.commit()
         
         return {
@@ -119,6 +127,162 @@ def run_api_suite_task(self: Task, suite_id: int):
         db.close()
 
 
+@celery_app.task(bind=True)
+def run_api_case_batch_task(self: Task, case_ids: list):
+    """
+    批量执行一组API用例的Celery任务（批量执行接口按 API_BULK_RUN_CHUNK_SIZE 分组提交）
+    
+    组内用例并发执行，每个用例仍生成一份独立的测试报告，
+    所有报告和用例结果在一个事务中批量写入；返回每个用例的结果摘要（不含响应内容）
+    """
+    db: Session = SessionLocal()
+    try:
+        cases_by_id = _load_api_cases(db, case_ids)
+        cases = [cases_by_id[case_id] for case_id in case_ids if case_id in cases_by_id]
+        
+        start_time = datetime.now()
+        case_results = run_api_cases(cases)
+        
+        reports = [
+            models.TestReport(
+                project_id=case.project_id,
+                name=f"API Test: {case.name}",
+                type="api",
+                task_id=self.request.id,
+                result_data=result.dict(),
+                pass_rate=100.0 if result.success else 0.0,
+                start_time=start_time,
+                duration=result.duration
+            )
+            for case, result in zip(cases, case_results)
+        ]
+        save_reports(db, reports)
+        save_report_case_results(db, "api", [
+            (report, case.id, result) for report, case, result in zip(reports, cases, case_results)
+        ])
+        # 提交前读取报告ID（提交后属性过期，逐个读取会再查询每一行）
+        report_ids = [report.id for report in reports]
+        db.commit()
+        
+        return {
+            "total_cases": len(cases),
+            "passed_cases": sum(1 for result in case_results if result.success),
+            "missing_case_ids": [case_id for case_id in case_ids if case_id not in cases_by_id],
+            "results": [
+                {
+                    "case_id": case.id,
+                    "report_id": report_id,
+                    "success": result.success,
+                    "status_code": result.status_code,
+                    "duration": result.duration
+                }
+                for case, report_id, result in zip(cases, report_ids, case_results)
+            ]
+        }
+    except Exception as e:
+        db.rollback()
+        error_msg = f"Error executing API test case batch: {str(e)}\n{traceback.format_exc()}"
+        self.update_state(state="FAILURE", meta={"error": error_msg})
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def run_api_dataset_task(self: Task, case_id: int, dataset_id: int):
+    """
+    数据驱动执行API测试用例的Celery任务
+    
+    逐行读取数据集，用每行的变量渲染用例后并发执行，
+    所有行的结果汇总为一份紧凑的测试报告
+    """
+    db: Session = SessionLocal()
+    try:
+        dataset = db.query(models.APITestDataset).filter(
+            models.APITestDataset.id == dataset_id,
+            models.APITestDataset.case_id == case_id
+        ).first()
+        if not dataset:
+            raise ValueError(f"Dataset {dataset_id} of API test case {case_id} not found")
+        case = dataset.test_case
+        case_name, project_id = case.name, case.project_id
+        dataset_name, dataset_path, dataset_format = dataset.name, dataset.file_path, dataset.format
+        template = case_template(case)
+        summary = DatasetRunSummary(dataset.row_count)
+        # 执行期间不需要数据库，结束读事务以便把连接归还连接池
+        db.rollback()
+        
+        in_flight = {}  # 正在执行的行的变量，用于记录失败详情
+        
+        def rendered_cases():
+            for index, variables in enumerate(iter_dataset_rows(dataset_path, dataset_format)):
+                try:
+                    rendered = render_case(template, variables)
+                except ValueError as e:
+                    summary.add(index, schemas.APITestResult(
+                        success=False, duration=0.0, assertion_errors=[str(e)]
+                    ), variables)
+                    continue
+                in_flight[index] = variables
+                yield index, rendered
+        
+        start_time = datetime.now()
+        last_progress = 0.0
+        for index, result in run_api_case_stream(rendered_cases()):
+            summary.add(index, result, in_flight.pop(index))
+            if time.monotonic() - last_progress >= DATASET_PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                self.update_state(
+                    state="PROGRESS",
+                    meta={
+                        "progress": min(int(summary.executed_rows * 100 / summary.total_rows), 100),
+                        "current_step": f"{summary.executed_rows}/{summary.total_rows}",
+                        "total_steps": summary.total_rows,
+                        "status": f"已执行 {summary.executed_rows}/{summary.total_rows} 行，"
+                                  f"通过 {summary.passed_rows} 行"
+                    }
+                )
+        
+        duration = (datetime.now() - start_time).total_seconds()
+        result_data = {
+            "case_id": case_id,
+            "case_name": case_name,
+            "dataset_id": dataset_id,
+            "dataset_name": dataset_name,
+            **summary.to_dict()
+        }
+        
+        # 创建测试报告
+        report = models.TestReport(
+            project_id=project_id,
+            name=f"API Dataset Test: {case_name} ({dataset_name})",
+            type="api",
+            task_id=self.request.id,
+            result_data=result_data,
+            pass_rate=summary.pass_rate,
+            start_time=start_time,
+            duration=duration
+        )
+        save_report(db, report)
+        # 用例结果表中整个数据集记为该用例的一次执行
+        failed_rows = summary.executed_rows - summary.passed_rows
+        save_case_results(db, report, "api", [(case_id, schemas.APITestResult(
+            success=failed_rows == 0,
+            duration=duration,
+            assertion_errors=[f"{failed_rows} of {summary.executed_rows} dataset rows failed"] if failed_rows else []
+        ))])
+        db.commit()
+        
+        return result_data
+    except Exception as e:
+        db.rollback()
+        error_msg = f"Error executing API dataset test: {str(e)}\n{traceback.format_exc()}"
+        self.update_state(state="FAILURE", meta={"error": error_msg})
+        raise
+    finally:
+        db.close()
+
+
 @celery_app.task(bind=True)
 def run_ui_case_task(self: Task, case_id: int):
     """执行UI测试用例的Celery任务"""
@@ -192,7 +356,8 @@ def run_ui_case_task(self: Task, case_id: int):
             start_time=datetime.now(),
             duration=result.duration
         )
-        db.add(report)
+        save_report(db, report)
+        save_case_results(db, report, "ui", [(case.id, result)])
         db.commit()
         
         return result.dict()
@@ -218,7 +383,7 @@ def run_ui_case_task(self: Task, case_id: int):
                     start_time=datetime.now(),
                     duration=0.0
                 )
-                db.add(report)
+                save_report(db, report)
                 db.commit()
         except Exception as report_error:
             # 忽略报告创建错误，避免掩盖原始错误
@@ -230,6 +395,248 @@ def run_ui_case_task(self: Task, case_id: int):
         db.close()
 
 
+@celery_app.task(bind=True)
+def run_ui_suite_task(self: Task, suite_id: int):
+    """执行UI测试套件的Celery任务（单个 worker 内按并发上限执行全部用例）"""
+    db: Session = SessionLocal()
+    try:
+        suite = db.query(models.UITestSuite).filter(models.UITestSuite.id == suite_id).first()
+        if not suite:
+            raise ValueError(f"UI test suite {suite_id} not found")
+        
+        case_ids = [sc.case_id for sc in suite.suite_cases]
+        if not case_ids:
+            raise ValueError("Test suite is empty")
+        
+        start_time = datetime.now()
+        results = _run_ui_suite_cases(self, db, case_ids)
+        return _save_ui_suite_report(db, self, suite, results, start_time, shard_count=1)
+    except Exception as e:
+        db.rollback()
+        error_msg = f"Error executing UI test suite: {str(e)}\n{traceback.format_exc()}"
+        self.update_state(state="FAILURE", meta={"error": error_msg})
+        raise
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def run_ui_suite_shard_task(self: Task, suite_id: int, shard_index: int, case_ids: list):
+    """
+    执行UI测试套件的一个分片
+    
+    出错时返回失败结果而不是抛出异常，保证 chord 的合并任务总能执行
+    """
+    db: Session = SessionLocal()
+    try:
+        results = _run_ui_suite_cases(self, db, case_ids)
+        return {"shard_index": shard_index, "results": results, "error": None}
+    except Exception as e:
+        error_msg = f"Error executing UI test suite shard: {str(e)}\n{traceback.format_exc()}"
+        return {"shard_index": shard_index, "results": [], "case_ids": case_ids, "error": error_msg}
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def merge_ui_suite_shards_task(self: Task, shard_results: list, suite_id: int, start_time: str):
+    """合并UI测试套件各分片的结果，按套件中的用例顺序生成一份测试报告"""
+    db: Session = SessionLocal()
+    try:
+        suite = db.query(models.UITestSuite).filter(models.UITestSuite.id == suite_id).first()
+        if not suite:
+            raise ValueError(f"UI test suite {suite_id} not found")
+        
+        results = []
+        for shard in shard_results:
+            results.extend(shard["results"])
+            # 整个分片失败时，分片内的每个用例都记为失败
+            if shard["error"]:
+                for case_id in shard.get("case_ids", []):
+                    results.append({
+                        "case_id": case_id,
+                        "case_name": None,
+                        "result": schemas.UITestResult(
+                            success=False,
+                            duration=0.0,
+                            error_log=shard["error"]
+                        ).dict()
+                    })
+        
+        order = {sc.case_id: sc.order for sc in suite.suite_cases}
+        results.sort(key=lambda r: order.get(r["case_id"], len(order)))
+        
+        return _save_ui_suite_report(
+            db, self, suite, results, datetime.fromisoformat(start_time), shard_count=len(shard_results)
+        )
+    except Exception as e:
+        db.rollback()
+        error_msg = f"Error merging UI test suite shards: {str(e)}\n{traceback.format_exc()}"
+        self.update_state(state="FAILURE", meta={"error": error_msg})
+        raise
+    finally:
+        db.close()
+
+
+def _load_api_case(db: Session, case_id: int):
+    """
+    加载单个API用例，优先使用 worker 内的用例缓存
+
+    已缓存时只查询 updated_at 确认版本，版本一致则不再加载整行（含 headers/body/assertions 等 JSON 列）
+    """
+    ensure_invalidation_listener()
+    if case_id in case_cache:
+        row = db.query(models.APITestCase.updated_at).filter(models.APITestCase.id == case_id).first()
+        if row is None:
+            case_cache.invalidate([case_id])
+            return None
+        cached = case_cache.get(case_id, row.updated_at)
+        if cached is not None:
+            return cached
+    
+    case = db.query(models.APITestCase).filter(models.APITestCase.id == case_id).first()
+    return case_cache.put(case) if case else None
+
+
+def _load_api_suite_cases(db: Session, suite_id: int) -> list:
+    """
+    按套件中的顺序加载API用例，同一用例在套件中出现多次时重复返回
+    
+    先通过关联表一次 JOIN 查询套件中所有用例的 (id, updated_at)，缓存中版本一致的用例直接复用，
+    其余用例按ID分批加载后放入缓存
+    """
+    ensure_invalidation_listener()
+    versions = db.query(models.APITestCase.id, models.APITestCase.updated_at).join(
+        models.APITestSuiteCase, models.APITestSuiteCase.case_id == models.APITestCase.id
+    ).filter(
+        models.APITestSuiteCase.suite_id == suite_id
+    ).order_by(models.APITestSuiteCase.order, models.APITestSuiteCase.id).all()
+    
+    cases_by_id = {}
+    for case_id, updated_at in versions:
+        if case_id not in cases_by_id:
+            cases_by_id[case_id] = case_cache.get(case_id, updated_at)
+    
+    missing = [case_id for case_id, case in cases_by_id.items() if case is None]
+    if len(missing) == len(cases_by_id):
+        # 都未缓存时（如 worker 刚启动）通过关联表一次 JOIN 加载，不受 IN 参数个数限制
+        for case in db.query(models.APITestCase).join(
+            models.APITestSuiteCase, models.APITestSuiteCase.case_id == models.APITestCase.id
+        ).filter(models.APITestSuiteCase.suite_id == suite_id):
+            cases_by_id[case.id] = case_cache.put(case)
+    else:
+        _load_uncached_cases(db, missing, cases_by_id)
+    
+    return [cases_by_id[case_id] for case_id, _ in versions if cases_by_id.get(case_id) is not None]
+
+
+def _load_api_cases(db: Session, case_ids: list) -> dict:
+    """按ID批量加载API用例（优先使用 worker 内的用例缓存），返回 {case_id: 用例}，不存在的用例不在其中"""
+    ensure_invalidation_listener()
+    chunk_size = settings.API_CASE_BULK_CHUNK_SIZE
+    unique_ids = list(dict.fromkeys(case_ids))
+    
+    cases_by_id = {}
+    for offset in range(0, len(unique_ids), chunk_size):
+        chunk = unique_ids[offset:offset + chunk_size]
+        for case_id, updated_at in db.query(models.APITestCase.id, models.APITestCase.updated_at).filter(
+            models.APITestCase.id.in_(chunk)
+        ):
+            cases_by_id[case_id] = case_cache.get(case_id, updated_at)
+    
+    _load_uncached_cases(db, [case_id for case_id, case in cases_by_id.items() if case is None], cases_by_id)
+    # 查询版本之后被删除的用例
+    return {case_id: case for case_id, case in cases_by_id.items() if case is not None}
+
+
+def _load_uncached_cases(db: Session, case_ids: list, cases_by_id: dict) -> None:
+    """按ID分批加载缓存中没有（或版本已变化）的用例并放入缓存"""
+    chunk_size = settings.API_CASE_BULK_CHUNK_SIZE
+    for offset in range(0, len(case_ids), chunk_size):
+        chunk = case_ids[offset:offset + chunk_size]
+        for case in db.query(models.APITestCase).filter(models.APITestCase.id.in_(chunk)):
+            cases_by_id[case.id] = case_cache.put(case)
+
+
+def _run_ui_suite_cases(task: Task, db: Session, case_ids: list) -> list:
+    """一次性加载用例并在当前 worker 内并发执行，执行进度写入任务状态"""
+    cases_by_id = {
+        case.id: case
+        for case in db.query(models.UITestCase).filter(models.UITestCase.id.in_(case_ids)).all()
+    }
+    cases = [cases_by_id[case_id] for case_id in case_ids if case_id in cases_by_id]
+    
+    def progress_callback(progress, current_step, status):
+        try:
+            task.update_state(
+                state="PROGRESS",
+                meta={
+                    "progress": progress,
+                    "current_step": current_step,
+                    "total_steps": len(cases),
+                    "status": status
+                }
+            )
+        except Exception as callback_error:
+            # 如果回调失败，记录但不中断执行
+            import logging
+            logging.getLogger(__name__).warning(f"Warning: Failed to update progress: {callback_error}")
+    
+    case_results = run_ui_cases(cases, progress_callback=progress_callback)
+    return [
+        {
+            "case_id": case.id,
+            "case_name": case.name,
+            "result": result.dict()
+        }
+        for case, result in zip(cases, case_results)
+    ]
+
+
+def _save_ui_suite_report(
+    db: Session,
+    task: Task,
+    suite: models.UITestSuite,
+    results: list,
+    start_time: datetime,
+    shard_count: int
+) -> dict:
+    """创建UI测试套件报告，每个用例的结果中保留各自的步骤和截图"""
+    total_cases = len(results)
+    passed_cases = sum(1 for r in results if r["result"]["success"])
+    duration = (datetime.now() - start_time).total_seconds()
+    pass_rate = (passed_cases / total_cases * 100) if total_cases > 0 else 0
+    
+    report = models.TestReport(
+        project_id=suite.project_id,
+        name=f"UI Test Suite: {suite.name}",
+        type="ui",
+        task_id=task.request.id,
+        result_data={
+            "suite_id": suite.id,
+            "suite_name": suite.name,
+            "shards": shard_count,
+            "total_cases": total_cases,
+            "passed_cases": passed_cases,
+            "results": results
+        },
+        pass_rate=pass_rate,
+        start_time=start_time,
+        duration=duration
+    )
+    save_report(db, report)
+    save_case_results(db, report, "ui", [(r["case_id"], schemas.UITestResult(**r["result"])) for r in results])
+    db.commit()
+    
+    return {
+        "suite_id": suite.id,
+        "total_cases": total_cases,
+        "passed_cases": passed_cases,
+        "pass_rate": pass_rate,
+        "results": results
+    }
+
+
 @celery_app.task(bind=True)
 def run_performance_test_task(self: Task, test_id: int):
     """执行性能测试的Celery任务"""
@@ -239,9 +646,9 @@ def run_performance_test_task(self: Task, test_id: int):
         if not test:
             raise ValueError(f"Performance test {test_id} not found")
         
-        # 执行测试
+        # 执行测试（运行期间推送实时指标）
         start_time = datetime.now()
-        result = run_performance_test(test)
+        result = run_performance_test(test, progress_callback=_performance_progress_callback(self))
         duration = (datetime.now() - start_time).total_seconds()
         
         # 更新测试状态
@@ -259,7 +666,7 @@ def run_performance_test_task(self: Task, test_id: int):
             start_time=start_time,
             duration=duration
         )
-        db.add(report)
+        save_report(db, report)
         db.commit()
         
         return result.dict()
@@ -277,3 +684,130 @@ def run_performance_test_task(self: Task, test_id: int):
     finally:
         db.close()
 
+
+@celery_app.task(bind=True)
+def run_performance_shard_task(self: Task, test_id: int, shard_index: int, jmx_content: str):
+    """
+    执行分布式性能测试中的一个分片
+    
+    出错时返回失败结果而不是抛出异常，保证 chord 的合并任务总能执行
+    """
+    db: Session = SessionLocal()
+    try:
+        test = db.query(models.PerformanceTest).filter(models.PerformanceTest.id == test_id).first()
+        if not test:
+            raise ValueError(f"Performance test {test_id} not found")
+        
+        result = run_performance_shard(
+            test,
+            shard_index,
+            jmx_content,
+            progress_callback=_performance_progress_callback(self)
+        )
+        return {"shard_index": shard_index, **result.dict()}
+    except Exception as e:
+        error_msg = f"Error executing performance test shard: {str(e)}\n{traceback.format_exc()}"
+        return {"shard_index": shard_index, "success": False, "duration": 0, "metrics": None, "error": error_msg}
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True)
+def merge_performance_shards_task(self: Task, shard_results: list, test_id: int, start_time: str):
+    """合并分布式性能测试各分片的指标，生成一份测试报告"""
+    db: Session = SessionLocal()
+    try:
+        test = db.query(models.PerformanceTest).filter(models.PerformanceTest.id == test_id).first()
+        if not test:
+            raise ValueError(f"Performance test {test_id} not found")
+        
+        start = datetime.fromisoformat(start_time)
+        duration = (datetime.now() - start).total_seconds()
+        
+        shard_results = sorted(shard_results, key=lambda r: r["shard_index"])
+        metrics_list = [r["metrics"] for r in shard_results if r.get("metrics")]
+        metrics = merge_metrics(metrics_list) if metrics_list else None
+        errors = [f"Shard {r['shard_index']}: {r['error']}" for r in shard_results if not r["success"]]
+        
+        result = schemas.PerformanceTestResult(
+            success=not errors,
+            duration=metrics.get("duration", 0) if metrics else 0,
+            metrics=metrics,
+            error="\n".join(errors) if errors else None
+        )
+        result_data = result.dict()
+        result_data["shards"] = [
+            {
+                "shard_index": r["shard_index"],
+                "success": r["success"],
+                "total_samples": (r.get("metrics") or {}).get("total_samples", 0),
+                "error": r.get("error")
+            }
+            for r in shard_results
+        ]
+        
+        # 更新测试状态
+        test.status = "completed" if result.success else "failed"
+        db.commit()
+        
+        # 创建测试报告
+        report = models.TestReport(
+            project_id=test.project_id,
+            name=f"Performance Test: {test.name} ({len(shard_results)} workers)",
+            type="performance",
+            task_id=self.request.id,
+            result_data=result_data,
+            pass_rate=100.0 if result.success else 0.0,
+            start_time=start,
+            duration=duration
+        )
+        save_report(db, report)
+        db.commit()
+        
+        return result_data
+    except Exception as e:
+        db.rollback()
+        test = db.query(models.PerformanceTest).filter(models.PerformanceTest.id == test_id).first()
+        if test:
+            test.status = "failed"
+            db.commit()
+        
+        error_msg = f"Error merging performance test shards: {str(e)}\n{traceback.format_exc()}"
+        self.update_state(state="FAILURE", meta={"error": error_msg})
+        raise
+    finally:
+        db.close()
+
+
+def _performance_progress_callback(task: Task):
+    """生成把性能测试实时指标写入任务状态的进度回调"""
+    def progress_callback(progress, current_step, status, metrics=None):
+        try:
+            task.update_state(
+                state="PROGRESS",
+                meta={
+                    "progress": progress,
+                    "current_step": current_step,
+                    "status": status,
+                    "metrics": metrics
+                }
+            )
+        except Exception as callback_error:
+            # 如果回调失败，记录但不中断执行
+            import logging
+            logging.getLogger(__name__).warning(f"Warning: Failed to update progress: {callback_error}")
+    return progress_callback
+
+
+@celery_app.task
+def sweep_report_blobs_task():
+    """定时清理没有报告引用的 report_blobs（由 celery beat 按 REPORT_BLOB_SWEEP_INTERVAL_HOURS 调度）"""
+    db = SessionLocal()
+    try:
+        deleted = sweep_report_blobs(db)
+        if deleted:
+            import logging
+            logging.getLogger(__name__).info(f"[Report Storage] Deleted {deleted} unreferenced report blobs")
+        return {"deleted": deleted}
+    finally:
+        db.close()
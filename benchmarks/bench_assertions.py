@@ -0,0 +1,162 @@
+"""
+断言求值性能基准
+
+对同一批模拟响应分别用旧的逐次解释方式和预编译的断言求值，比较每次求值的耗时。
+
+使用命令:
+    python benchmarks/bench_assertions.py --responses 1000000
+    python benchmarks/bench_assertions.py --responses 20000 --rules extended
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 基准测试不需要连接真实数据库
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.assertions import CompiledAssertions, compile_assertions, jsonschema  # noqa: E402
+
+BASIC_RULES = {
+    "status_code": 200,
+    "response_contains": "success",
+    "response_json": {
+        "code": 0,
+        "data.id": 123,
+        "data.user.name": "alice",
+    },
+}
+
+EXTENDED_RULES = {
+    "status_code": 200,
+    "response_regex": r"order-\d+",
+    "response_json": {
+        "code": 0,
+        "$.data.items[0].sku": "A-1",
+        "$.data.items[*].status": ["paid", "paid", "paid"],
+    },
+    "response_json_regex": {"$.data.order_no": r"^order-\d{6}$"},
+    "max_response_time": 500,
+}
+
+SCHEMA = {
+    "type": "object",
+    "required": ["code", "data"],
+    "properties": {
+        "code": {"type": "integer"},
+        "data": {"type": "object", "required": ["id", "items"]},
+    },
+}
+
+
+class FakeResponse:
+    __slots__ = ("status_code", "text")
+
+    def __init__(self, status_code: int, text: str):
+        self.status_code = status_code
+        self.text = text
+
+
+def generate_responses(count: int) -> List[tuple]:
+    """生成模拟响应（少量不同的响应体循环使用，避免基准主要测量 JSON 解析）"""
+    rng = random.Random(42)
+    bodies = []
+    for i in range(64):
+        data = {
+            "code": 0 if i % 16 else 1,
+            "message": "success",
+            "data": {
+                "id": 123,
+                "order_no": f"order-{rng.randrange(10 ** 6):06d}",
+                "user": {"name": "alice", "roles": ["admin"]},
+                "items": [{"sku": f"A-{n + 1}", "status": "paid"} for n in range(3)],
+            },
+        }
+        bodies.append((FakeResponse(200, json.dumps(data)), data, float(rng.randrange(50, 800))))
+    return [bodies[i % len(bodies)] for i in range(count)]
+
+
+def legacy_execute_assertions(assertions: Dict[str, Any], response: Any, response_data: Any) -> List[str]:
+    """旧的实现：每次求值都重新解释断言字典，点号路径每次都重新拆分"""
+    errors = []
+    if "status_code" in assertions:
+        expected_status = assertions["status_code"]
+        if response.status_code != expected_status:
+            errors.append(f"Status code assertion failed: expected {expected_status}, got {response.status_code}")
+    if "response_contains" in assertions:
+        expected_text = assertions["response_contains"]
+        if expected_text not in response.text:
+            errors.append(f"Response contains assertion failed: expected '{expected_text}' not found in response")
+    if "response_json" in assertions and isinstance(response_data, dict):
+        for key, expected_value in assertions["response_json"].items():
+            value = response_data
+            for k in key.split("."):
+                if isinstance(value, dict) and k in value:
+                    value = value[k]
+                else:
+                    value = None
+                    break
+            if value != expected_value:
+                errors.append(f"JSON assertion failed for '{key}': expected {expected_value}, got {value}")
+    return errors
+
+
+def naive_execute_assertions(assertions: Dict[str, Any], response: Any, response_data: Any, elapsed_ms: float) -> List[str]:
+    """不使用预编译时的做法：每次求值都解析路径、编译正则"""
+    return CompiledAssertions(assertions).evaluate(response, response_data, elapsed_ms)
+
+
+def measure(name: str, func, responses: List[tuple]) -> float:
+    started = time.perf_counter()
+    failures = 0
+    for response, data, elapsed_ms in responses:
+        if func(response, data, elapsed_ms):
+            failures += 1
+    elapsed = time.perf_counter() - started
+    per_call = elapsed / len(responses) * 1_000_000
+    print(f"[RESULT] {name:<36} {elapsed:6.2f}s  {per_call:6.2f}us/次  ({len(responses) / elapsed:,.0f} 次/秒, 失败 {failures})")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="断言求值性能基准")
+    parser.add_argument("--responses", type=int, default=1_000_000, help="求值次数")
+    parser.add_argument("--rules", choices=["basic", "extended"], default="basic",
+                        help="basic: 旧实现也支持的规则；extended: JSONPath/正则/Schema/响应时间")
+    args = parser.parse_args()
+
+    responses = generate_responses(args.responses)
+    print(f"[INFO] {args.responses} 次求值, 规则: {args.rules}")
+
+    if args.rules == "basic":
+        rules = BASIC_RULES
+        baseline = measure("旧实现（每次解释断言）", lambda r, d, t: legacy_execute_assertions(rules, r, d), responses)
+    else:
+        rules = dict(EXTENDED_RULES)
+        if jsonschema is not None:
+            rules["json_schema"] = SCHEMA
+        else:
+            print("[INFO] 未安装 jsonschema，跳过 json_schema 规则")
+        # 路径和正则的编译结果有模块级缓存，这里清空以模拟没有预编译的实现
+        from app.services import assertions as module
+
+        def uncached(r, d, t):
+            module.compile_path.cache_clear()
+            module.compile_regex.cache_clear()
+            module._compile_schema.cache_clear()
+            return naive_execute_assertions(rules, r, d, t)
+
+        baseline = measure("每次编译", uncached, responses)
+
+    measure("compile_assertions（按内容查缓存）", lambda r, d, t: compile_assertions(rules).evaluate(r, d, t), responses)
+    evaluator = compile_assertions(rules)
+    elapsed = measure("预编译的求值器", evaluator.evaluate, responses)
+    print(f"[RESULT] 预编译求值器相对基线加速 {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
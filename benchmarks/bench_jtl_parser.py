@@ -0,0 +1,104 @@
+"""
+JTL 解析性能基准
+
+生成指定数量采样的 JTL 文件（CSV 或 XML），测量 _parse_jtl_file 的耗时和内存峰值。
+
+使用命令:
+    python benchmarks/bench_jtl_parser.py --samples 10000000 --format csv
+    python benchmarks/bench_jtl_parser.py --samples 10000000 --format xml --keep
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 基准测试不需要连接真实数据库
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.services.performance_test_service import _parse_jtl_file  # noqa: E402
+
+LABELS = ["登录", "查询订单", "创建订单", "支付", "首页"]
+RESPONSE_CODES = ["200", "200", "200", "200", "201", "302", "404", "500"]
+
+
+def generate_jtl(path: str, samples: int, fmt: str) -> None:
+    """生成模拟的 JTL 文件"""
+    rng = random.Random(42)
+    start_ts = int(time.time() * 1000)
+    with open(path, "w", encoding="utf-8", buffering=4 * 1024 * 1024) as f:
+        if fmt == "xml":
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<testResults version="1.2">\n')
+        else:
+            f.write("timeStamp,elapsed,label,responseCode,responseMessage,threadName,success,bytes,sentBytes,Latency\n")
+        
+        for i in range(samples):
+            ts = start_ts + i // 50
+            elapsed = int(rng.lognormvariate(4.5, 0.6))
+            label = LABELS[i % len(LABELS)]
+            rc = RESPONSE_CODES[rng.randrange(len(RESPONSE_CODES))]
+            success = "true" if rc[0] in "23" else "false"
+            size = rng.randint(200, 20000)
+            if fmt == "xml":
+                f.write(
+                    f'<httpSample t="{elapsed}" lt="{elapsed // 2}" ts="{ts}" s="{success}" '
+                    f'lb="{label}" rc="{rc}" rm="OK" tn="Thread Group 1-{i % 100}" by="{size}"/>\n'
+                )
+            else:
+                f.write(f"{ts},{elapsed},{label},{rc},OK,Thread Group 1-{i % 100},{success},{size},120,{elapsed // 2}\n")
+        
+        if fmt == "xml":
+            f.write("</testResults>\n")
+
+
+def _peak_rss_mb() -> float:
+    """当前进程的常驻内存峰值（MB），不支持的平台返回 0"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JTL 解析性能基准")
+    parser.add_argument("--samples", type=int, default=10_000_000, help="采样数量")
+    parser.add_argument("--format", choices=["csv", "xml"], default="csv", help="JTL 文件格式")
+    parser.add_argument("--file", help="使用已有的 JTL 文件，不再生成")
+    parser.add_argument("--keep", action="store_true", help="保留生成的 JTL 文件")
+    args = parser.parse_args()
+    
+    path = args.file
+    if not path:
+        fd, path = tempfile.mkstemp(suffix=f".{args.format}.jtl")
+        os.close(fd)
+        print(f"[INFO] 生成 {args.samples} 条采样: {path}")
+        started = time.perf_counter()
+        generate_jtl(path, args.samples, args.format)
+        print(f"[INFO] 生成耗时 {time.perf_counter() - started:.1f}s, 文件大小 {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+    
+    try:
+        rss_before = _peak_rss_mb()
+        started = time.perf_counter()
+        metrics = _parse_jtl_file(path)
+        elapsed = time.perf_counter() - started
+        
+        total = metrics["total_samples"]
+        print(f"[RESULT] 解析 {total} 条采样耗时 {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} 条/秒)")
+        print(f"[RESULT] 进程内存峰值 {_peak_rss_mb():.1f} MB（解析前 {rss_before:.1f} MB）")
+        print(f"[RESULT] p95={metrics['p95_response_time']}ms p99={metrics['p99_response_time']}ms "
+              f"error_rate={metrics['error_rate']:.2f}% throughput={metrics['throughput']:.1f}/s")
+    finally:
+        if not args.file and not args.keep:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,15 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "mssql+pyodbc://(local)/test_platform?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes"
     DATABASE_ECHO: bool = False
+    # 异步接口使用的连接串，为空时由 DATABASE_URL 推导（mssql+pyodbc -> mssql+aioodbc，sqlite -> sqlite+aiosqlite）
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # 连接池（每个进程一个池，Celery prefork 子进程各自独立；SQLite 使用默认连接池）
+    DB_POOL_SIZE: int = 10  # 常驻连接数
+    DB_MAX_OVERFLOW: int = 20  # 池满时允许临时创建的额外连接数
+    DB_POOL_TIMEOUT: int = 30  # 等待空闲连接的最长秒数，超时抛出 TimeoutError
+    DB_POOL_RECYCLE: int = 3600  # 连接存活超过该秒数后重建
+    DB_SLOW_QUERY_MS: int = 500  # 超过该耗时的 SQL 记录警告日志
+    DB_QUERY_COUNT_WARN: int = 100  # 单个请求/任务的 SQL 数超过该值时记录警告日志（通常意味着 N+1 查询）
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -14,10 +23,43 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
     
+    # API Test Execution
+    API_SUITE_CONCURRENCY: int = 8  # 套件并发执行的最大用例数
+    API_HTTP_POOL_MAXSIZE: int = 16  # 每个 scheme+host 保持的最大 keep-alive 连接数
+    API_HTTP2: bool = False  # 使用 httpx 发送 HTTP/2 请求（需安装 httpx[http2]）
+    API_CASE_BULK_CHUNK_SIZE: int = 500  # 批量创建/更新/导入用例时每个事务处理的行数
+    API_DATASET_CONCURRENCY: int = 16  # 数据驱动执行时同时发送的最大请求数（不宜超过 API_HTTP_POOL_MAXSIZE）
+    API_DATASET_MAX_FAILURE_DETAILS: int = 100  # 数据驱动报告中保留详情的失败行数
+    API_RESPONSE_MAX_BYTES: int = 10485760  # 响应体超过该大小时不再缓存全文，只能检查状态码、包含文本和响应时间
+    API_RESPONSE_CAPTURE_BYTES: int = 65536  # 结果中保存的响应体上限，超过时只保存开头和结尾各一半
+    API_CASE_CACHE_SIZE: int = 4096  # 每个 worker 进程缓存的API用例定义数，0 表示不缓存
+    API_BULK_RUN_CHUNK_SIZE: int = 100  # 批量执行时每个 Celery 任务执行的用例数（报告在同一事务中写入）
+    API_BULK_RUN_MAX_CASES: int = 10000  # 单次批量执行的最大用例数
+    
     # File Storage
     UPLOAD_DIR: str = "./uploads"
     JMETER_RESULTS_DIR: str = "./jmeter_results"
     
+    # UI Test
+    UI_BROWSER_POOL_ENABLED: bool = False  # 在 worker 常驻的浏览器池中执行 UI 用例
+    UI_BROWSER_POOL_SIZE: int = 2  # 每个 worker 进程的常驻浏览器数量
+    UI_BROWSER_POOL_MAX_USES: int = 50  # 常驻浏览器执行多少个用例后回收重建
+    UI_SUITE_CONCURRENCY: int = 2  # 每个 worker 上 UI 套件分片并发执行的最大用例数
+    UI_SUITE_MAX_SHARDS: int = 16  # UI 套件最多拆分的分片（worker）数量
+    
+    # Performance Test
+    PERF_SKETCH_WINDOW_SECONDS: int = 60  # 响应时间直方图的时间窗口（秒）
+    PERF_LIVE_INTERVAL_SECONDS: float = 5.0  # 运行中读取JTL并推送实时指标的间隔（秒）
+    PERF_LIVE_WINDOW_SECONDS: int = 30  # 实时滚动指标的统计窗口（秒）
+    PERF_ABORT_MIN_SAMPLES: int = 100  # 滚动窗口内采样数达到该值后才判断终止阈值
+    PERF_MAX_WORKERS: int = 16  # 分布式执行时最多拆分的节点数
+    PERF_SHARD_QUEUE: Optional[str] = None  # 分布式分片任务使用的队列，建议由 concurrency=1 的专用 Worker 消费
+    
+    # Report Storage
+    REPORT_BLOB_THRESHOLD_BYTES: int = 16384  # result_data 超过该大小时压缩后单独存储，报告行只保留摘要
+    REPORT_BLOB_ZSTD_LEVEL: int = 3  # zstd 压缩级别（未安装 zstandard 时使用 zlib）
+    REPORT_BLOB_SWEEP_INTERVAL_HOURS: float = 24  # celery beat 清理无报告引用的 report_blobs 的间隔，0 表示不定时清理
+    
     # Application
     APP_NAME: str = "Test Platform API"
     DEBUG: bool = True
@@ -22,6 +22,11 @@ api.interceptors.request.use(
 // 响应拦截器
 api.interceptors.response.use(
   response => {
+    // 需要读取响应头（如分页的 X-Next-Cursor）的请求返回完整响应
+    if (response.config.rawResponse) {
+      return response
+    }
+    
     const data = response.data
     
     // 只处理明显错误的数据格式（数字键对象转数组）
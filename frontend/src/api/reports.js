@@ -1,8 +1,9 @@
 import api from './index'
 
 export const reportApi = {
+  // 返回完整响应：data 为当前页报告，headers['x-next-cursor'] 存在时还有下一页
   getReports(params) {
-    return api.get('/reports', { params })
+    return api.get('/reports', { params, rawResponse: true })
   },
   getReport(id) {
     return api.get(`/reports/${id}`)